@@ -40,6 +40,7 @@ from . import unordered_containers
 from . import intrusive_1_55
 from . import intrusive_1_40
 from . import multi_index_1_42
-from .utils import register_printers, add_trivial_printer, options, last_supported_boost_version
+from .utils import register_printers, add_trivial_printer, options, last_supported_boost_version, \
+    iter_addresses, iter_items
 from . import datetime
 from . import variant
@@ -27,6 +27,79 @@
 from .utils import *
 
 
+def sorted_find(start, size, key, key_of, key_type, compare_type):
+    """
+    Find the index of the element with key `key` in a sorted array.
+
+    The array holds `size` elements starting at pointer `start`; `key_of` extracts the key
+    from an element. If the ordering of `compare_type` is understood (std::less or std::greater),
+    binary search is used, reading O(log(size)) keys from the inferior. Otherwise, all keys are
+    compared in order. Returns None if no element matches.
+    """
+    decode = key_decoder(key_type)
+    if decode is None:
+        # opaque keys: rely on gdb's equality comparison
+        match = lambda v: v == key
+    else:
+        key = decode(key)
+        match = lambda v: decode(v) == key
+    compare_name = template_name(compare_type)
+    if decode is not None and compare_name in ['std::less', 'std::greater']:
+        descending = compare_name == 'std::greater'
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = decode(key_of((start + mid).dereference()))
+            if (mid_key > key) if descending else (mid_key < key):
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < size and match(key_of((start + lo).dereference())):
+            return lo
+        return None
+    for idx in xrange(size):
+        if match(key_of((start + idx).dereference())):
+            return idx
+    return None
+
+
+class FlatTree(object):
+    """
+    Access to the vector holding the elements of a flat container.
+
+    Subclasses give the path of fields leading from the container to the vector's holder.
+    The offsets of the holder's start, size and capacity fields are resolved once per
+    container type; each container is then decoded from a single memory read.
+    """
+    holder_path = ()
+    plans = type_cache()
+
+    def build_plan(self, t):
+        return Access_Plan(t, [('start', self.holder_path + ('m_start',)),
+                               ('size', self.holder_path + ('m_size',)),
+                               ('capacity', self.holder_path + ('m_capacity',))],
+                           args=[t.template_argument(i) for i in range(3)])
+
+    def read_holder(self):
+        self.plan = access_plan(self.plans, self.val.basic_type, self.build_plan)
+        self.holder = self.plan.read(self.val)
+
+    def get_pointer(self):
+        if 'start' not in self.holder:
+            # not a raw pointer
+            return self.plan.field(self.val, 'start')
+        return gdb.Value(self.holder['start']).cast(self.plan.type('start'))
+
+    def get_size(self):
+        return self.holder['size']
+
+    def get_capacity(self):
+        return self.holder['capacity']
+
+    def element_spans(self):
+        return pointer_spans(self.get_pointer(), (0, self.get_size()))
+
+
 class FlatSetBase:
     """Pretty Printer for boost::container::flat_set"""
     printer_name = 'boost::container::flat_set'
@@ -34,15 +107,29 @@ class FlatSetBase:
 
     def __init__(self, value):
         self.val = value
-        self.element_type = get_basic_type(value.type).template_argument(0)
+        self.read_holder()
+        self.element_type = self.plan.args[0]
 
     def to_string(self):
         return 'boost::container::flat_set<{}> size={} capacity={}'.format(
-            self.element_type, self.get_size(), self.get_capacity())
+            abbreviate_type_name(str(self.element_type)), self.get_size(), self.get_capacity())
 
     def children(self):
-        for idx in xrange(self.get_size()):
-            yield '[{}]'.format(idx), (self.get_pointer() + idx).dereference()
+        read = element_reader(self.get_pointer())
+        return Indexed_Children(int(self.get_size()), lambda idx: [('[{}]'.format(idx), read(idx))])
+
+    def at(self, idx):
+        check_index(idx, self.get_size())
+        return (self.get_pointer() + idx).dereference()
+
+    def element_count(self):
+        return int(self.get_size())
+
+    def find(self, key):
+        start = self.get_pointer()
+        idx = sorted_find(start, self.get_size(), key, lambda elem: elem, self.element_type,
+                          self.plan.args[1])
+        return None if idx is None else (start + idx).dereference()
 
     def display_hint(self):
         return 'array'
@@ -55,54 +142,50 @@ class FlatMapBase:
 
     def __init__(self, value):
         self.val = value
-        self.key_type = get_basic_type(value.type).template_argument(0)
-        self.value_type = get_basic_type(value.type).template_argument(1)
+        self.read_holder()
+        self.key_type = self.plan.args[0]
+        self.value_type = self.plan.args[1]
 
     def to_string(self):
         return 'boost::container::flat_map<{}, {}> size={} capacity={}'.format(
-            self.key_type, self.value_type, self.get_size(), self.get_capacity())
+            abbreviate_type_name(str(self.key_type)), abbreviate_type_name(str(self.value_type)),
+            self.get_size(), self.get_capacity())
 
     def children(self):
-        for idx in xrange(self.get_size()):
-            pair = (self.get_pointer() + idx).dereference()
-            yield '[{}]'.format(idx), pair["first"]
-            yield '[{}]'.format(idx), pair["second"]
+        read = element_reader(self.get_pointer())
+        def element_children(idx):
+            pair = read(idx)
+            return [('[{}]'.format(idx), pair["first"]), ('[{}]'.format(idx), pair["second"])]
+        return Indexed_Children(int(self.get_size()), element_children)
+
+    def at(self, idx):
+        check_index(idx, self.get_size())
+        pair = (self.get_pointer() + idx).dereference()
+        return pair["first"], pair["second"]
+
+    def element_count(self):
+        return int(self.get_size())
+
+    def find(self, key):
+        start = self.get_pointer()
+        idx = sorted_find(start, self.get_size(), key, lambda pair: pair["first"], self.key_type,
+                          self.plan.args[2])
+        return None if idx is None else (start + idx).dereference()["second"]
 
     def display_hint(self):
         return 'map'
 
 
-class FlatTree152:
-    def get_pointer(self):
-        return self.val["m_flat_tree"]["m_data"]["m_vect"]["members_"]["m_start"]
+class FlatTree152(FlatTree):
+    holder_path = ('m_flat_tree', 'm_data', 'm_vect', 'members_')
 
-    def get_size(self):
-        return int(self.val["m_flat_tree"]["m_data"]["m_vect"]["members_"]["m_size"])
 
-    def get_capacity(self):
-        return int(self.val["m_flat_tree"]["m_data"]["m_vect"]["members_"]["m_capacity"])
+class FlatTree154(FlatTree):
+    holder_path = ('m_flat_tree', 'm_data', 'm_vect', 'm_holder')
 
 
-class FlatTree154:
-    def get_pointer(self):
-        return self.val["m_flat_tree"]["m_data"]["m_vect"]["m_holder"]["m_start"]
-
-    def get_size(self):
-        return int(self.val["m_flat_tree"]["m_data"]["m_vect"]["m_holder"]["m_size"])
-
-    def get_capacity(self):
-        return int(self.val["m_flat_tree"]["m_data"]["m_vect"]["m_holder"]["m_capacity"])
-
-
-class FlatTree158:
-    def get_pointer(self):
-        return self.val["m_data"]["m_vect"]["m_holder"]["m_start"]
-
-    def get_size(self):
-        return int(self.val["m_data"]["m_vect"]["m_holder"]["m_size"])
-
-    def get_capacity(self):
-        return int(self.val["m_data"]["m_vect"]["m_holder"]["m_capacity"])
+class FlatTree158(FlatTree):
+    holder_path = ('m_data', 'm_vect', 'm_holder')
 
 
 @add_printer
@@ -133,22 +216,14 @@ class FlatSet158Printer(FlatSetBase, FlatTree158):
 
 
 @add_printer
-class FlatSet165Printer(FlatSetBase):
+class FlatSet165Printer(FlatSetBase, FlatTree):
     min_supported_version = (1, 65, 0)
     max_supported_version = last_supported_boost_version
+    holder_path = ('m_data', 'm_seq', 'm_holder')
 
     def __init__(self, value):
         FlatSetBase.__init__(self, value)
 
-    def get_pointer(self):
-        return self.val["m_data"]["m_seq"]["m_holder"]["m_start"]
-
-    def get_size(self):
-        return int(self.val["m_data"]["m_seq"]["m_holder"]["m_size"])
-
-    def get_capacity(self):
-        return int(self.val["m_data"]["m_seq"]["m_holder"]["m_capacity"])
-
 
 @add_printer
 class FlatMap152Printer(FlatMapBase, FlatTree152):
@@ -169,22 +244,14 @@ class FlatMap154Printer(FlatMapBase, FlatTree154):
 
 
 @add_printer
-class FlatMap165Printer(FlatMapBase):
+class FlatMap165Printer(FlatMapBase, FlatTree):
     min_supported_version = (1, 65, 0)
     max_supported_version = last_supported_boost_version
+    holder_path = ('m_flat_tree', 'm_data', 'm_seq', 'm_holder')
 
     def __init__(self, value):
         FlatMapBase.__init__(self, value)
 
-    def get_pointer(self):
-        return self.val["m_flat_tree"]["m_data"]["m_seq"]["m_holder"]["m_start"]
-
-    def get_size(self):
-        return int(self.val["m_flat_tree"]["m_data"]["m_seq"]["m_holder"]["m_size"])
-
-    def get_capacity(self):
-        return int(self.val["m_flat_tree"]["m_data"]["m_seq"]["m_holder"]["m_capacity"])
-
 
 # Iterator used for flat_set/flat_map
 @add_printer
@@ -7,15 +7,11 @@
 from .utils import *
 
 def get_named_template_argument(gdb_type, arg_name):
-    n = 0
-    while True:
-        try:
-            arg = gdb_type.strip_typedefs().template_argument(n)
-            if (str(arg).startswith(arg_name)):
-                return arg
-            n += 1
-        except RuntimeError:
-            return None
+    t = gdb_type.strip_typedefs()
+    for n, arg in enumerate(parse_type_name(str(t)).arg_names):
+        if arg.startswith(arg_name):
+            return t.template_argument(n)
+    return None
 
 def intrusive_container_has_size_member(intrusive_container_type):
     constant_size_arg = get_named_template_argument(intrusive_container_type, "boost::intrusive::constant_time_size")
@@ -206,22 +206,34 @@ class List_Printer:
 
         def __iter__(self):
             self.count = 0
+            self.guard = Traversal_Guard()
             self.crt_node_rptr = get_raw_ptr(call_static_method(
                 self.node_traits_t, 'get_next', self.root_node_rptr))
             return self
 
-        def __next__(self):
-            if self.crt_node_rptr == self.root_node_rptr or is_null(self.crt_node_rptr):
+        def next_value_ptr(self):
+            if (self.crt_node_rptr == self.root_node_rptr or is_null(self.crt_node_rptr)
+                    or not self.guard.check(self.crt_node_rptr)):
                 raise StopIteration
             val_rptr = get_raw_ptr(call_static_method(
                 self.value_traits_t, 'to_value_ptr', self.crt_node_rptr))
-            index_str = '[%d @%s]' % (self.count, print_ptr(val_rptr))
-            result = index_str, val_rptr.referenced_value()
-
             self.count += 1
             self.crt_node_rptr = get_raw_ptr(call_static_method(
                 self.node_traits_t, 'get_next', self.crt_node_rptr))
-            return result
+            return val_rptr
+
+        @property
+        def position(self):
+            return intptr(self.crt_node_rptr)
+
+        def seek(self, position, index):
+            self.crt_node_rptr = gdb.Value(position).cast(self.crt_node_rptr.type)
+            self.count = index
+
+        def __next__(self):
+            count = self.count
+            val_rptr = self.next_value_ptr()
+            return '[%d @%s]' % (count, print_ptr(val_rptr)), val_rptr.referenced_value()
 
         def next(self):
             return self.__next__()
@@ -237,7 +249,13 @@ class List_Printer:
         return None
 
     def children(self):
-        return self.Iterator(self.v)
+        it = iter(self.Iterator(self.v))
+        return guarded_children(it, it.guard)
+
+    def element_addresses(self):
+        it = iter(self.Iterator(self.v))
+        addresses = (intptr(val_rptr) for val_rptr in iter(it.next_value_ptr, None))
+        return self.v.value_t, guarded_addresses(addresses, it.guard)
 
     def display_hint(self):
         return 'array'
@@ -287,31 +305,57 @@ class Tree_Printer:
 
         def __iter__(self):
             self.count = 0
+            self.guard = Traversal_Guard()
             self.crt_node_rptr = get_raw_ptr(call_static_method(
                 self.node_traits_t, 'get_left', self.header_node_rptr))
             return self
 
-        def __next__(self):
-            if self.crt_node_rptr == self.header_node_rptr:
+        def next_value_ptr(self):
+            if (self.guard.reason is not None or self.crt_node_rptr == self.header_node_rptr
+                    or not self.guard.check(self.crt_node_rptr)):
                 raise StopIteration
             val_rptr = get_raw_ptr(call_static_method(
                 self.value_traits_t, 'to_value_ptr', self.crt_node_rptr))
-            index_str = '[%d @%s]' % (self.count, print_ptr(val_rptr))
-            result = index_str, val_rptr.referenced_value()
             self.count += 1
             self.advance()
-            return result
+            return val_rptr
+
+        @property
+        def position(self):
+            return intptr(self.crt_node_rptr)
+
+        def seek(self, position, index):
+            self.crt_node_rptr = gdb.Value(position).cast(self.crt_node_rptr.type)
+            self.count = index
+
+        def __next__(self):
+            count = self.count
+            val_rptr = self.next_value_ptr()
+            return '[%d @%s]' % (count, print_ptr(val_rptr)), val_rptr.referenced_value()
 
         def next(self):
             return self.__next__()
 
+        def get_parent(self, node_rptr):
+            n = get_raw_ptr(call_static_method(self.node_traits_t, 'get_parent', node_rptr))
+            if self.optimize_size:
+                n = parse_and_eval('(' + str(get_basic_type(n.type)) + ')(((size_t)' + str(n).split()[0] + ') & (~(size_t)3))')
+            return n
+
+        def get_children(self, node_rptr):
+            l = get_raw_ptr(call_static_method(self.node_traits_t, 'get_left', node_rptr))
+            r = get_raw_ptr(call_static_method(self.node_traits_t, 'get_right', node_rptr))
+            return [n for n in (l, r) if not is_null(n)]
+
         def advance(self):
+            # nodes on a path between a node and its successor are all distinct
+            path_guard = Traversal_Guard()
             n = get_raw_ptr(call_static_method(
                 self.node_traits_t, 'get_right', self.crt_node_rptr))
             if not is_null(n):
                 # if right subtree is not empty, find leftmost node in it
                 self.crt_node_rptr = n
-                while True:
+                while path_guard.check(self.crt_node_rptr):
                     n = get_raw_ptr(call_static_method(self.node_traits_t, 'get_left', self.crt_node_rptr))
                     if is_null(n):
                         break
@@ -320,14 +364,13 @@ class Tree_Printer:
                 # if right subtree is empty, find first ancestor in whose left subtree we are
                 while True:
                     old_n = self.crt_node_rptr
-                    self.crt_node_rptr = get_raw_ptr(call_static_method(self.node_traits_t, 'get_parent', self.crt_node_rptr))
-                    if self.optimize_size:
-                        self.crt_node_rptr = parse_and_eval('(' + str(get_basic_type(self.crt_node_rptr.type)) + ')(((size_t)' + str(self.crt_node_rptr).split()[0] + ') & (~(size_t)3))')
-                    if self.crt_node_rptr == self.header_node_rptr:
+                    self.crt_node_rptr = self.get_parent(self.crt_node_rptr)
+                    if self.crt_node_rptr == self.header_node_rptr or not path_guard.check(self.crt_node_rptr):
                         break
                     n = get_raw_ptr(call_static_method(self.node_traits_t, 'get_left', self.crt_node_rptr))
                     if n == old_n:
                         break
+            self.guard.reason = self.guard.reason or path_guard.reason
 
     def __init__(self, v):
         self.v = v
@@ -341,7 +384,18 @@ class Tree_Printer:
         return None
 
     def children(self):
-        return self.Iterator(self.v)
+        it = iter(self.Iterator(self.v))
+        return guarded_children(it, it.guard)
+
+    def element_addresses(self):
+        it = iter(self.Iterator(self.v))
+        addresses = (intptr(val_rptr) for val_rptr in iter(it.next_value_ptr, None))
+        return self.v.value_t, guarded_addresses(addresses, it.guard)
+
+    def tree_shape_accessors(self):
+        it = self.Iterator(self.v)
+        root = it.get_parent(it.header_node_rptr)
+        return (None if is_null(root) else root), it.get_children
 
     def display_hint(self):
         return 'array'
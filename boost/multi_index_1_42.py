@@ -6,43 +6,6 @@ from .utils import *
 # Some utility methods.
 #
 
-def _paren_split(s, target_paren = '<'):
-    "Split the given string at commas (,) at the first paranthesis sublevel of target_paren, ignoring commas within other paranthesized blocks. This can be used to extract template arguments."
-    open_parens = '([{<'
-    close_parens = ')]}>'
-    end_paren = {}
-    end_paren['('] = ')'
-    end_paren['['] = ']'
-    end_paren['{'] = '}'
-    end_paren['<'] = '>'
-    if target_paren not in open_parens:
-        message('error: _paren_split: target_paren [' + target_paren + '] must be one of [' + open_parens + ']')
-        return None
-    paren_stack = []
-    res = []
-    st = 0
-    for i in xrange(len(s)):
-        if s[i] in open_parens:
-            if len(paren_stack) == 0 and s[i] == target_paren:
-                st = i + 1
-            paren_stack.append(s[i])
-        elif s[i] in close_parens:
-            if len(paren_stack) == 0 or s[i] != end_paren[paren_stack[-1]]:
-                # mismatched parens
-                return None
-            if len(paren_stack) == 1 and paren_stack[0] == target_paren:
-                res += [[st, i]]
-                st = i + 1
-            del paren_stack[-1]
-        elif s[i] == ',':
-            if len(paren_stack) == 0:
-                # comma among primary identifiers
-                return None
-            if len(paren_stack) == 1 and paren_stack[0] == target_paren:
-                res += [[st, i]]
-                st = i + 1
-    return res
-
 def _strip_inheritance_qual(s):
     if s.startswith('public '):
         return s[7:]
@@ -52,34 +15,86 @@ def _strip_inheritance_qual(s):
         return s[10:]
     return s
 
+# The parsed (main_args, indexes) of every multi_index_container type seen so far.
+_boost_multi_index_types = dict()
+
+def _parse_multi_index_type(type_name):
+    t = parse_type_name(type_name)
+    if len(t.arg_names) != 3:
+        message('error parsing: ' + type_name)
+        return None
+    arg2_args = t.args[1].args # the args of the 2nd template arg
+    if len(arg2_args) == 0:
+        message('error parsing arg2 of: ' + type_name)
+        return None
+    return t.arg_names, [arg.name for arg in arg2_args]
+
 def _boost_multi_index_get_indexes(v):
     "Save the index types of a multi_index_container in v.indexes."
-    v.main_args = _paren_split(str(v.basic_type))
-    if len(v.main_args) != 3:
-        message('error parsing: ' + str(v.basic_type))
+    if v.type_name not in _boost_multi_index_types:
+        _boost_multi_index_types[v.type_name] = _parse_multi_index_type(v.type_name)
+    parsed = _boost_multi_index_types[v.type_name]
+    if parsed is None:
         return False
-    arg2_str = str(v.basic_type)[v.main_args[1][0]:v.main_args[1][1]] # the 2nd template arg
-    arg2_args = _paren_split(arg2_str)
-    if len(arg2_args) == 0:
-        message('error parsing arg2 of: ' + str(v.basic_type))
-        return False
-    v.indexes = []
-    for r in arg2_args:
-        v.indexes.append(arg2_str[r[0]:r[1]].split('<')[0].strip())
+    v.main_args, v.indexes = parsed
+    return True
+
+def _boost_multi_index_selected(v):
+    """
+    Return the list of indexes selected for printing multi_index_container `v`:
+    the ones selected for its address (with boost-multi-index EXPRESSION, or by
+    setting multi_index_selector), else the ones selected for its type (with
+    boost-multi-index -type), else the first index.
+    """
+    addr = intptr(v.address) if v.address is not None else None
+    idxs = multi_index_selector.get((addr, v.type_name), multi_index_selector.get(addr))
+    if idxs is None:
+        for pattern, pattern_idxs in multi_index_type_selector:
+            if pattern.search(v.type_name):
+                idxs = pattern_idxs
+                break
+        else:
+            idxs = 0
+    return list(idxs) if isinstance(idxs, (list, tuple)) else [idxs]
 
-# The size in pointers of the index fields for all index types.
+# The size in pointers of the index fields for all index types (for hashed
+# indexes, since boost 1.56; see _boost_multi_index_fields_size).
 _boost_multi_index_index_size = {}
 _boost_multi_index_index_size['boost::multi_index::ordered_unique'] = 3
 _boost_multi_index_index_size['boost::multi_index::ordered_non_unique'] = 3
-_boost_multi_index_index_size['boost::multi_index::hashed_unique'] = 1
-_boost_multi_index_index_size['boost::multi_index::hashed_non_unique'] = 1
+_boost_multi_index_index_size['boost::multi_index::ranked_unique'] = 4
+_boost_multi_index_index_size['boost::multi_index::ranked_non_unique'] = 4
+_boost_multi_index_index_size['boost::multi_index::hashed_unique'] = 2
+_boost_multi_index_index_size['boost::multi_index::hashed_non_unique'] = 2
 _boost_multi_index_index_size['boost::multi_index::sequenced'] = 2
 _boost_multi_index_index_size['boost::multi_index::random_access'] = 1
 
+_boost_multi_index_ordered = ('boost::multi_index::ordered_unique',
+                              'boost::multi_index::ordered_non_unique',
+                              'boost::multi_index::ranked_unique',
+                              'boost::multi_index::ranked_non_unique')
+_boost_multi_index_hashed = ('boost::multi_index::hashed_unique',
+                             'boost::multi_index::hashed_non_unique')
+
+# Before boost 1.56, hashed index nodes only hold a next pointer.
+_boost_multi_index_hashed_prior_version = (1, 56, 0)
+
+
+def _boost_multi_index_hashed_has_prior():
+    boost_version = registered_boost_version()
+    return boost_version is None or boost_version >= _boost_multi_index_hashed_prior_version
+
+
+def _boost_multi_index_fields_size(index_type):
+    """The size in pointers of the index fields of `index_type`, for the registered boost version."""
+    if index_type in _boost_multi_index_hashed and not _boost_multi_index_hashed_has_prior():
+        return 1
+    return _boost_multi_index_index_size[index_type]
+
 #
 # The following is an experimental printer for boost::multi_index_container
-# using ordered unique/nonunique or sequenced index. This might not always
-# work for various reasons.
+# using ordered, ranked, hashed, sequenced or random access indexes. This might
+# not always work for various reasons.
 #
 # 1. I did not fully decode the templated construction of these containers.
 # For further hacks, here are the assumptions made by the current code:
@@ -112,6 +127,23 @@ _boost_multi_index_index_size['boost::multi_index::random_access'] = 1
 #   - The index field contains: previous@0 and next@1.
 #   - To traverse the container, keep following next pointers until returning
 #     back to the head node.
+# - For ranked indexes:
+#   - The index fields are those of an ordered index, followed by the size of
+#     the subtree rooted at the node; they are traversed as ordered indexes.
+# - For hashed indexes:
+#   - The index field contains: prior@0 and next@1.
+#   - Before boost 1.56, it only contains next@0; such indexes are not traversed
+#     and are printed as not supported.
+# - For random access indexes:
+#   - The index field contains a single pointer, up, to the node's slot in an
+#     array of pointers to the index fields of all nodes, in index order.
+#   - The up pointer of the head node points to the end of that array, so the
+#     array starts node_count pointers before it; it is read lazily, in chunks.
+#
+# Several indexes can be selected at once (see boost-multi-index); their
+# children are then listed one index after the other. Node links are read
+# through the read-ahead cache and, when several indexes are selected, elements
+# are read once per print, so the node memory is shared by all of them.
 #
 # 2. The python framework in gdb is limited. To cast a
 # boost::multi_index_container to one of its super classes, I use an awkward
@@ -127,31 +159,32 @@ class Boost_Multi_Index:
     template_name = 'boost::multi_index::multi_index_container'
 
     #
-    # Not supported indexes (hashes and random-access) are captured and printed
+    # Not supported indexes (e.g. custom index types) are captured and printed
     # by this subprinter. To disable this, set this to False. This can be set in
     # the source code, in .gdbinit where the printers are loaded, or dynamically
     # from inside gdb.
     #
     print_not_supported = True
 
+    supported_indexes = (_boost_multi_index_ordered + _boost_multi_index_hashed
+                         + ('boost::multi_index::sequenced', 'boost::multi_index::random_access'))
+
     @classmethod
     def supports(self_type, v):
-        _boost_multi_index_get_indexes(v)
-        #message('address=' + str(intptr(v.address)) + ' multi_index_selector=' + str(multi_index_selector))
-        if intptr(v.address) in multi_index_selector:
-            v.idx = multi_index_selector[intptr(v.address)]
-            #message('address found')
-        else:
-            v.idx = 0
-            #message('address not found')
-        if v.idx >= len(v.indexes):
+        if not _boost_multi_index_get_indexes(v):
+            return False
+        v.idxs = _boost_multi_index_selected(v)
+        v.idx = v.idxs[0]
+        if max(v.idxs) >= len(v.indexes):
             return False
         return (self_type.print_not_supported
-                or v.indexes[v.idx] == 'boost::multi_index::ordered_unique'
-                or v.indexes[v.idx] == 'boost::multi_index::ordered_non_unique'
-                or v.indexes[v.idx] == 'boost::multi_index::hashed_unique'
-                or v.indexes[v.idx] == 'boost::multi_index::hashed_non_unique'
-                or v.indexes[v.idx] == 'boost::multi_index::sequenced')
+                or all(self_type.index_supported(v.indexes[idx]) for idx in v.idxs))
+
+    @classmethod
+    def index_supported(self_type, index_type):
+        if index_type in _boost_multi_index_hashed and not _boost_multi_index_hashed_has_prior():
+            return False
+        return index_type in self_type.supported_indexes
 
     @staticmethod
     def get_val_ptr(node_ptr, index_offset):
@@ -160,13 +193,9 @@ class Boost_Multi_Index:
     def __init__(self, v):
         # clear up the type_name:
         # pick template name
-        self.type_name = v.type_name[0:v.main_args[0][0]].strip()[:-1]
+        self.type_name = parse_type_name(v.type_name).name
         # add 2 args only (omit allocator)
-        self.type_name += ('<'
-                           + v.type_name[v.main_args[0][0]:v.main_args[0][1]].strip()
-                           + ', '
-                           + v.type_name[v.main_args[1][0]:v.main_args[1][1]].strip()
-                           + '>')
+        self.type_name = abbreviate_type_name(self.type_name + '<' + v.main_args[0] + ', ' + v.main_args[1] + '>')
         # remove bulk
         self.type_name = ''.join(self.type_name.split('boost::multi_index::detail::'))
         self.type_name = ''.join(self.type_name.split('boost::multi_index::'))
@@ -177,11 +206,11 @@ class Boost_Multi_Index:
         self.type_name = '<>'.join(self.type_name.split('< >'))
         self.type_name = 'boost::' + self.type_name
         # add index specifier
-        self.type_name += '[idx=' + str(v.idx) + ']'
+        self.type_name += '[idx=' + ','.join(str(idx) for idx in v.idxs) + ']'
         #message('type_name: ' + self.type_name)
 
-        # index type
-        self.index_type = v.indexes[v.idx]
+        self.indexes = v.indexes
+        self.idxs = v.idxs
 
         # node count
         self.node_count = int(v['node_count'])
@@ -191,7 +220,8 @@ class Boost_Multi_Index:
         #message('elem_type: ' + str(self.elem_type))
 
         # next, we compute the element size and round it up to the pointer size
-        ptr_size = gdb.lookup_type('void').pointer().sizeof
+        ptr_size = pointer_size()
+        self.ptr_size = ptr_size
         self.elem_size = ((self.elem_type.sizeof - 1) / ptr_size + 1) * ptr_size
         #message('elem_size: ' + str(self.elem_size))
 
@@ -208,25 +238,46 @@ class Boost_Multi_Index:
         head_node = v.cast(header_holder_subtype)['member'].dereference()
         #message('head_node.type.sizeof: ' + str(head_node.type.sizeof))
 
-        # finally, we compute the offset from the element address
+        self.head_node_addr = intptr(head_node.address)
+        self.head_node_size = head_node.type.sizeof
+
+        # elements printed so far, shared by the iterators of all selected indexes;
+        # with a single index, each element is printed once and nothing is kept
+        self.elements = dict() if len(v.idxs) > 1 else None
+
+        self.index_type, self.index_offset, self.head_index_ptr = self.index_layout(v.idx)
+
+    def index_layout(self, idx):
+        """
+        Return (index_type, index_offset, head_index_ptr) for index `idx`.
+        """
+        index_type = self.indexes[idx]
+        # we compute the offset from the element address
         # to the index field address, as well as the address of the parent_ptr
         # inside the head node
         # to do that, we compute the size of all indexes prior to the current one
-        self.index_offset = head_node.type.sizeof
-        for i in xrange(v.idx + 1):
-            self.index_offset -= _boost_multi_index_index_size[v.indexes[i]] * ptr_size
-        #message('index_offset: ' +  str(self.index_offset))
-
-        self.head_index_ptr = intptr(head_node.address) + self.index_offset
-        #message('head_index_ptr: ' + hex(self.head_index_ptr))
-
-        # offset for hashed_index
-        self.index_offset_for_hash = head_node.type.sizeof - (v.idx + 1) * ptr_size * 2
-        self.head_index_ptr_for_hash = intptr(head_node.address) + self.index_offset_for_hash
+        index_offset = self.head_node_size
+        for i in xrange(idx + 1):
+            index_offset -= _boost_multi_index_fields_size(self.indexes[i]) * self.ptr_size
+        #message('index_offset: ' +  str(index_offset))
+        return index_type, index_offset, self.head_node_addr + index_offset
+
+    def element(self, val_ptr):
+        if self.elements is None:
+            return str(parse_and_eval('*(' + str(self.elem_type) + '*)' + str(val_ptr)))
+        if val_ptr not in self.elements:
+            self.elements[val_ptr] = str(parse_and_eval('*(' + str(self.elem_type) + '*)' + str(val_ptr)))
+        return self.elements[val_ptr]
 
     def empty_cont(self):
         return self.node_count == 0
 
+    def element_count(self):
+        # one child per element and selected index, or a message for unsupported indexes
+        if self.empty_cont():
+            return 0
+        return sum(self.node_count if self.index_supported(self.indexes[idx]) else 1 for idx in self.idxs)
+
     class empty_iterator:
         def __init__(self):
             pass
@@ -254,40 +305,53 @@ class Boost_Multi_Index:
     class ordered_iterator:
         @staticmethod
         def get_parent_ptr(node_ptr):
-            return intptr(str(parse_and_eval('*((void**)' + str(node_ptr) + ')')), 16) & (~intptr(1))
+            return read_pointer(node_ptr) & (~intptr(1))
 
         @staticmethod
         def get_left_ptr(node_ptr):
-            return intptr(str(parse_and_eval('*((void**)' + str(node_ptr) + ' + 1)')), 16)
+            return read_pointer(node_ptr + pointer_size())
 
         @staticmethod
         def get_right_ptr(node_ptr):
-            return intptr(str(parse_and_eval('*((void**)' + str(node_ptr) + ' + 2)')), 16)
+            return read_pointer(node_ptr + 2 * pointer_size())
 
-        def __init__(self, elem_type, index_offset, first, last):
-            self.elem_type = elem_type
+        def __init__(self, element, index_offset, first, last):
+            self.element = element
             self.index_offset = index_offset
             self.crt = first
             self.last = last
             self.saw_last = False
             self.count = 0
+            self.guard = Traversal_Guard()
 
         def __iter__(self):
             return self
 
+        @property
+        def position(self):
+            return None if self.saw_last else self.crt
+
+        def seek(self, position, index):
+            self.crt = position
+            self.saw_last = False
+            self.count = index
+
         def __next__(self):
-            if self.crt == self.last and self.saw_last:
+            if ((self.crt == self.last and self.saw_last) or self.guard.reason is not None
+                    or not self.guard.check(self.crt)):
                 raise StopIteration
             crt = self.crt
             #message('crt: ' + hex(crt))
             if self.crt == self.last:
                 self.saw_last = True
             else:
+                # nodes on a path between a node and its successor are all distinct
+                path_guard = Traversal_Guard()
                 if self.get_right_ptr(self.crt) != 0:
                     # next is leftmost node in right subtree
                     #message('next is in right subtree')
                     self.crt = self.get_right_ptr(self.crt)
-                    while self.get_left_ptr(self.crt) != 0:
+                    while path_guard.check(self.crt) and self.get_left_ptr(self.crt) != 0:
                         self.crt = self.get_left_ptr(self.crt)
                 else:
                     # next is first ancestor from which crt is in left subtree
@@ -295,15 +359,14 @@ class Boost_Multi_Index:
                     while True:
                         old_crt = self.crt
                         self.crt = self.get_parent_ptr(self.crt)
-                        if self.get_left_ptr(self.crt) == old_crt:
+                        if not path_guard.check(self.crt) or self.get_left_ptr(self.crt) == old_crt:
                             break
+                self.guard.reason = path_guard.reason
                 #message('next: ' + hex(self.crt))
             count = self.count
             self.count = self.count + 1
             val_ptr = Boost_Multi_Index.get_val_ptr(crt, self.index_offset)
-            return ('[%s]' % hex(int(val_ptr)),
-                    str(parse_and_eval('*(' + str(self.elem_type) + '*)'
-                                       + str(val_ptr))))
+            return ('[%s]' % hex(int(val_ptr)), self.element(val_ptr))
 
         def next(self):
             return self.__next__()
@@ -311,25 +374,26 @@ class Boost_Multi_Index:
     class hashed_iterator:
         @staticmethod
         def get_prev_ptr(node_ptr):
-            return intptr(str(parse_and_eval('*((void**)' + str(node_ptr) + ')')), 16)
+            return read_pointer(node_ptr)
 
         @staticmethod
         def get_next_ptr(node_ptr):
-            return intptr(str(parse_and_eval('*((void**)' + str(node_ptr) + ' + 1)')), 16)
+            return read_pointer(node_ptr + pointer_size())
 
-        def __init__(self, elem_type, index_offset, begin, end):
-            self.elem_type = elem_type
+        def __init__(self, element, index_offset, begin, end):
+            self.element = element
             self.index_offset = index_offset
             self.crt = begin
             self.end = end
             self.count = 0
+            self.guard = Traversal_Guard()
             self.trace = set()
 
         def __iter__(self):
             return self
 
         def __next__(self):
-            if self.crt == self.end:
+            if self.crt == self.end or not self.guard.check(self.crt):
                 raise StopIteration
             crt = self.crt
             self.trace.add(crt)
@@ -341,9 +405,7 @@ class Boost_Multi_Index:
             count = self.count
             self.count = self.count + 1
             val_ptr = Boost_Multi_Index.get_val_ptr(crt, self.index_offset)
-            return ('[%s]' % hex(int(val_ptr)),
-                    str(parse_and_eval('*(' + str(self.elem_type) + '*)'
-                                       + str(val_ptr))))
+            return ('[%s]' % hex(int(val_ptr)), self.element(val_ptr))
 
         def next(self):
             return self.__next__()
@@ -351,63 +413,248 @@ class Boost_Multi_Index:
     class sequenced_iterator:
         @staticmethod
         def get_prev_ptr(node_ptr):
-            return intptr(str(parse_and_eval('*((void**)' + str(node_ptr) + ')')), 16)
+            return read_pointer(node_ptr)
 
         @staticmethod
         def get_next_ptr(node_ptr):
-            return intptr(str(parse_and_eval('*((void**)' + str(node_ptr) + ' + 1)')), 16)
+            return read_pointer(node_ptr + pointer_size())
 
-        def __init__(self, elem_type, index_offset, begin, end):
-            self.elem_type = elem_type
+        def __init__(self, element, index_offset, begin, end):
+            self.element = element
             self.index_offset = index_offset
             self.crt = begin
             self.end = end
             self.count = 0
+            self.guard = Traversal_Guard()
 
         def __iter__(self):
             return self
 
+        @property
+        def position(self):
+            return self.crt
+
+        def seek(self, position, index):
+            self.crt = position
+            self.count = index
+
         def __next__(self):
-            if self.crt == self.end:
+            if self.crt == self.end or not self.guard.check(self.crt):
                 raise StopIteration
             crt = self.crt
             self.crt = self.get_next_ptr(self.crt)
             count = self.count
             self.count = self.count + 1
             val_ptr = Boost_Multi_Index.get_val_ptr(crt, self.index_offset)
-            return ('[%s]' % hex(int(val_ptr)),
-                    str(parse_and_eval('*(' + str(self.elem_type) + '*)'
-                                       + str(val_ptr))))
+            return ('[%s]' % hex(int(val_ptr)), self.element(val_ptr))
 
         def next(self):
             return self.__next__()
 
-    def children(self):
-        if self.empty_cont():
-            return self.empty_iterator()
-        if (self.index_type == 'boost::multi_index::ordered_unique'
-            or self.index_type == 'boost::multi_index::ordered_non_unique'):
+    class random_access_iterator:
+        @staticmethod
+        def get_up_ptr(node_ptr):
+            return read_pointer(node_ptr)
+
+        # pointers read from the node array at a time
+        chunk_size = 512
+
+        def __init__(self, element, index_offset, head_index_ptr, node_count):
+            self.element = element
+            self.index_offset = index_offset
+            self.guard = Traversal_Guard()
+            self.ptr_size = pointer_size()
+            self.begin = self.get_up_ptr(head_index_ptr) - node_count * self.ptr_size
+            self.size = min(node_count, self.guard.max_nodes)
+            self.truncated = self.size < node_count
+            self.chunk_start = 0
+            self.chunk = ()
+            self.count = 0
+
+        def __iter__(self):
+            return self
+
+        @property
+        def position(self):
+            return self.count
+
+        def seek(self, position, index):
+            self.count = position
+
+        def get_node_ptr(self, idx):
+            """Return the idx-th pointer of the node array, reading it a chunk at a time; None if unreadable."""
+            if not self.chunk_start <= idx < self.chunk_start + len(self.chunk):
+                count = min(self.chunk_size, self.size - idx)
+                addr = self.begin + idx * self.ptr_size
+                if not is_readable(addr, count * self.ptr_size):
+                    self.guard.reason = 'unreadable node array 0x{:x}'.format(addr)
+                    return None
+                self.chunk_start, self.chunk = idx, read_pointers(addr, count)
+            return self.chunk[idx - self.chunk_start]
+
+        def __next__(self):
+            if self.count == self.size:
+                if self.truncated and self.guard.reason is None:
+                    self.guard.reason = 'more than {} nodes'.format(self.guard.max_nodes)
+                raise StopIteration
+            crt = self.get_node_ptr(self.count)
+            if crt is None or not self.guard.check(crt):
+                raise StopIteration
+            self.count = self.count + 1
+            val_ptr = Boost_Multi_Index.get_val_ptr(crt, self.index_offset)
+            return ('[%s]' % hex(int(val_ptr)), self.element(val_ptr))
+
+        def next(self):
+            return self.__next__()
+
+    def index_iterator(self, idx, element):
+        """
+        Return an iterator over the (label, element(val_ptr)) pairs of index `idx`,
+        or None if the index type is not supported.
+        """
+        index_type, index_offset, head_index_ptr = self.index_layout(idx)
+        if not self.index_supported(index_type):
+            return None
+        if index_type in _boost_multi_index_ordered:
             return self.ordered_iterator(
-                self.elem_type,
-                self.index_offset,
-                self.ordered_iterator.get_left_ptr(self.head_index_ptr),
-                self.ordered_iterator.get_right_ptr(self.head_index_ptr))
-        elif (self.index_type == 'boost::multi_index::hashed_unique'
-            or self.index_type == 'boost::multi_index::hashed_non_unique'):
+                element,
+                index_offset,
+                self.ordered_iterator.get_left_ptr(head_index_ptr),
+                self.ordered_iterator.get_right_ptr(head_index_ptr))
+        elif index_type in _boost_multi_index_hashed:
             return self.hashed_iterator(
-                self.elem_type,
-                self.index_offset_for_hash,
-                self.hashed_iterator.get_prev_ptr(self.head_index_ptr_for_hash),
-                self.head_index_ptr_for_hash)
-        elif self.index_type == 'boost::multi_index::sequenced':
+                element,
+                index_offset,
+                self.hashed_iterator.get_prev_ptr(head_index_ptr),
+                head_index_ptr)
+        elif index_type == 'boost::multi_index::sequenced':
             return self.sequenced_iterator(
-                self.elem_type,
-                self.index_offset,
-                self.sequenced_iterator.get_next_ptr(self.head_index_ptr),
-                self.head_index_ptr)
-        return self.na_iterator(self.index_type)
+                element,
+                index_offset,
+                self.sequenced_iterator.get_next_ptr(head_index_ptr),
+                head_index_ptr)
+        elif index_type == 'boost::multi_index::random_access':
+            return self.random_access_iterator(
+                element,
+                index_offset,
+                head_index_ptr,
+                self.node_count)
+        return None
+
+    def index_children(self, idx):
+        it = self.index_iterator(idx, self.element)
+        if it is None:
+            return self.na_iterator(self.indexes[idx])
+        return guarded_children(it, it.guard)
+
+    def element_addresses(self):
+        if self.empty_cont():
+            return self.elem_type, iter([])
+        it = self.index_iterator(self.idxs[0], lambda val_ptr: val_ptr)
+        if it is None:
+            return None
+        return self.elem_type, guarded_addresses((val_ptr for _, val_ptr in it), it.guard)
+
+    def children(self):
+        if self.empty_cont():
+            return self.empty_iterator()
+        if len(self.idxs) == 1:
+            return self.index_children(self.idxs[0])
+        # several indexes side by side: prefix each child name with its index
+        return (('[idx=%d]%s' % (idx, name), value)
+                for idx in self.idxs
+                for name, value in self.index_children(idx))
+
+    def tree_shape_accessors(self):
+        if self.index_type not in _boost_multi_index_ordered:
+            return None
+        def get_children(node_ptr):
+            l = self.ordered_iterator.get_left_ptr(node_ptr)
+            r = self.ordered_iterator.get_right_ptr(node_ptr)
+            return [n for n in (l, r) if n != 0]
+        root = self.ordered_iterator.get_parent_ptr(self.head_index_ptr)
+        return (None if self.empty_cont() or root == 0 else root), get_children
 
     def to_string(self):
         if self.empty_cont():
             return 'empty %s' % self.type_name
         return '%s' % self.type_name
+
+
+class Boost_Multi_Index_Command(gdb.Command):
+    """Select the indexes used to print boost::multi_index_container objects.
+
+Usage: boost-multi-index EXPRESSION IDX[,IDX...]
+       boost-multi-index -type REGEX IDX[,IDX...]
+       boost-multi-index -clear
+       boost-multi-index
+
+The first form selects the indexes used to print the container EXPRESSION
+evaluates to; the selection is forgotten when the inferior exits. The second
+form selects the indexes used to print all containers whose type name matches
+REGEX; selections by address take precedence. With several indexes, the
+elements are listed once per index, one index after the other. Without
+arguments, the current selections are listed; -clear removes them all."""
+
+    usage = 'usage: boost-multi-index [-type REGEX | EXPRESSION] IDX[,IDX...]'
+    args_re = re.compile(r'^(.*?)\s+(\d+(?:\s*,\s*\d+)*)$')
+
+    def __init__(self):
+        super(Boost_Multi_Index_Command, self).__init__('boost-multi-index', gdb.COMMAND_DATA, gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        arg = arg.strip()
+        if not arg:
+            self.list_selections()
+            return
+        if arg == '-clear':
+            multi_index_selector.clear()
+            del multi_index_type_selector[:]
+            return
+        m = self.args_re.match(arg)
+        if m is None:
+            raise gdb.GdbError(self.usage)
+        target, idxs = m.group(1).strip(), [int(idx) for idx in m.group(2).split(',')]
+        if target.startswith('-type'):
+            pattern = target[len('-type'):].strip()
+            if not pattern:
+                raise gdb.GdbError(self.usage)
+            try:
+                regex = re.compile(pattern)
+            except re.error as e:
+                raise gdb.GdbError('boost-multi-index: bad regex: ' + str(e))
+            multi_index_type_selector[:] = [s for s in multi_index_type_selector if s[0].pattern != pattern]
+            multi_index_type_selector.insert(0, (regex, idxs))
+            return
+        v = GDB_Value_Wrapper(parse_and_eval(target))
+        if v.template_name != Boost_Multi_Index.template_name:
+            raise gdb.GdbError('boost-multi-index: not a boost::multi_index_container: ' + v.type_name)
+        if v.address is None:
+            raise gdb.GdbError('boost-multi-index: value has no address: ' + target)
+        if not _boost_multi_index_get_indexes(v):
+            raise gdb.GdbError('boost-multi-index: cannot parse type: ' + v.type_name)
+        if max(idxs) >= len(v.indexes):
+            raise gdb.GdbError('boost-multi-index: container has {} indexes'.format(len(v.indexes)))
+        multi_index_selector[(intptr(v.address), v.type_name)] = idxs
+
+    @staticmethod
+    def list_selections():
+        for key, idxs in multi_index_selector.items():
+            addr, type_name = key if isinstance(key, tuple) else (key, None)
+            idxs = idxs if isinstance(idxs, (list, tuple)) else [idxs]
+            gdb.write('{} {}: {}\n'.format(hex(addr), abbreviate_type_name(type_name) if type_name else '*',
+                                            ','.join(str(idx) for idx in idxs)))
+        for regex, idxs in multi_index_type_selector:
+            gdb.write('-type {}: {}\n'.format(regex.pattern, ','.join(str(idx) for idx in idxs)))
+
+
+Boost_Multi_Index_Command()
+
+
+def clear_multi_index_selector(event=None):
+    # addresses are meaningless once the inferior is gone
+    multi_index_selector.clear()
+
+
+if hasattr(gdb, 'events') and hasattr(gdb.events, 'exited'):
+    gdb.events.exited.connect(clear_multi_index_selector)
@@ -53,6 +53,32 @@ from .utils import *
 # template name will attempt to use this printer.
 # (Either supports() or template_name is required.)
 # - '__init__' : Its only argument is a GDB_Value_Wrapper.
+# - 'at(idx)' : Optional random-access hook used by $at(). Returns the idx-th
+# element without walking children(), or raises IndexError. Printers with
+# display hint 'map' return a (key, value) pair.
+# - 'find(key)' : Optional keyed lookup used by $find(). Returns the element
+# (the mapped value, for maps) whose key equals the gdb.Value `key`, or None.
+# - 'tree_shape_accessors()' : Optional hook used by boost-tree-stats. Returns
+# (root, children) for tree-based containers, where root is None for an empty
+# tree and children(node) returns the non-null children of a node; or None.
+# - 'element_addresses()' : Optional hook used by boost.iter_addresses() and
+# boost.iter_items(). Returns (element type, iterable of element addresses as
+# python ints), walking the container like children() does; or None to fall
+# back to children().
+# - 'element_spans()' : Optional hook for contiguous containers, used by
+# boost-export (and instead of element_addresses()). Returns (element type,
+# list of (address, count) spans holding the elements in order); or None.
+# - 'element_count()' : Optional hook for front ends that page through children.
+# Returns the number of elements (key-value pairs, for maps) without walking
+# children(). Printers with this hook also get num_children() and child(n).
+# - Seekable children : Optionally, the iterator returned by children() has a
+# 'position' attribute, a hashable description of where the next element is
+# (e.g. a node address), or None when unknown; and a 'seek(position, index)'
+# method, making a fresh iterator continue at element number `index`, found
+# earlier at `position`. $at() and $slice() then start walking node-based
+# containers from the nearest recorded position. See Element_Children and
+# guarded_children() in utils.py. Iterators whose positions are element indexes
+# also set 'random_access = True', and are sought directly (see Indexed_Children).
 #
 
 @add_printer
@@ -64,20 +90,32 @@ class BoostIteratorRange:
     template_name = 'boost::iterator_range'
 
     class _iterator:
+        random_access = True
+
         def __init__(self, begin, end):
+            self.begin = begin
             self.item = begin
             self.end = end
             self.count = 0
+            self.read = element_reader(begin)
 
         def __iter__(self):
             return self
 
+        @property
+        def position(self):
+            return self.count
+
+        def seek(self, position, index):
+            self.count = position
+            self.item = self.begin + position
+
         def __next__(self):
             if self.item == self.end:
                 raise StopIteration
             count = self.count
             self.count = self.count + 1
-            elem = self.item.dereference()
+            elem = self.read(count)
             self.item = self.item + 1
             return ('[%d]' % count, elem)
 
@@ -85,12 +123,24 @@ class BoostIteratorRange:
             return self.__next__()
 
     def __init__(self, value):
-        self.typename = value.type_name
+        self.typename = value.short_type_name
         self.value = value
 
     def children(self):
         return self._iterator(self.value['m_Begin'], self.value['m_End'])
 
+    def at(self, idx):
+        begin = self.value['m_Begin']
+        check_index(idx, int(self.value['m_End'] - begin))
+        return (begin + idx).dereference()
+
+    def element_count(self):
+        return int(self.value['m_End'] - self.value['m_Begin'])
+
+    def element_spans(self):
+        begin = self.value['m_Begin']
+        return pointer_spans(begin, (0, int(self.value['m_End'] - begin)))
+
     def to_string(self):
         begin = self.value['m_Begin']
         end = self.value['m_End']
@@ -107,26 +157,32 @@ class BoostOptional:
     min_supported_version = (1, 40, 0)
     max_supported_version = last_supported_boost_version
     template_name = 'boost::optional'
+    plans = type_cache()
+
+    @staticmethod
+    def build_plan(t):
+        stored_type = get_basic_type(t.template_argument(0))
+        storage_type = field_offset(t, 'm_storage')[1]
+        storage_path = ('m_storage',) \
+            if get_basic_type(storage_type) == stored_type \
+            else ('m_storage', 'dummy_', 'data')
+        return Access_Plan(t, [('initialized', ('m_initialized',)),
+                               ('value', storage_path, stored_type)])
 
     def __init__(self, value):
         self.value = value
+        self.plan = access_plan(self.plans, value.basic_type, self.build_plan)
+        self.initialized = self.plan.read(value)['initialized']
 
     def children(self):
-        initialized = self.value['m_initialized']
-        if initialized:
-            stored_type = get_basic_type(self.value.basic_type.template_argument(0))
-            m_storage = self.value['m_storage']
-            stored_value = m_storage \
-                if get_basic_type(m_storage.type) == stored_type \
-                else reinterpret_cast(m_storage['dummy_']['data'], stored_type)
-            yield 'value', stored_value
+        if self.initialized:
+            yield 'value', self.plan.field(self.value, 'value')
 
     def to_string(self):
-        initialized = self.value['m_initialized']
-        if initialized:
-            return '{} is initialized'.format(self.value.type_name)
+        if self.initialized:
+            return '{} is initialized'.format(self.value.short_type_name)
         else:
-            return '{} is not initialized'.format(self.value.type_name)
+            return '{} is not initialized'.format(self.value.short_type_name)
 
 
 @add_printer
@@ -138,7 +194,7 @@ class BoostReferenceWrapper:
     template_name = 'boost::reference_wrapper'
 
     def __init__(self, value):
-        self.typename = value.type_name
+        self.typename = value.short_type_name
         self.value = value
 
     def to_string(self):
@@ -154,7 +210,7 @@ class BoostTribool:
     template_name = 'boost::logic::tribool'
 
     def __init__(self, value):
-        self.typename = value.type_name
+        self.typename = value.short_type_name
         self.value = value
 
     def to_string(self):
@@ -223,7 +279,7 @@ class BoostSharedPtr:
     template_name = ['boost::shared_ptr', 'boost::weak_ptr']
 
     def __init__(self, value):
-        self.typename = value.type_name
+        self.typename = value.short_type_name
         self.value = value
 
     def to_string(self):
@@ -248,7 +304,7 @@ class BoostSharedArray:
     template_name = ['boost::shared_array', 'boost::weak_array']
 
     def __init__(self, value):
-        self.typename = value.type_name
+        self.typename = value.short_type_name
         self.value = value
 
     def to_string(self):
@@ -271,6 +327,8 @@ class BoostCircular:
     template_name = 'boost::circular_buffer'
 
     class _iterator:
+        random_access = True
+
         def __init__(self, first, last, buff, end, size):
             self.item = first  # virtual beginning of the circular buffer
             self.last = last   # virtual end of the circular buffer (one behind the last element).
@@ -278,17 +336,25 @@ class BoostCircular:
             self.end = end     # internal buffer's end (end of the storage space).
             self.size = size
             self.capa = int(end - buff)
+            self.first = int(first - buff)
+            self.read = element_reader(buff)
             self.count = 0
 
         def __iter__(self):
             return self
 
+        @property
+        def position(self):
+            return self.count
+
+        def seek(self, position, index):
+            self.count = position
+
         def __next__(self):
             if self.count == self.size:
                 raise StopIteration
             count = self.count
-            crt = self.buff + (count + self.item - self.buff) % self.capa
-            elem = crt.dereference()
+            elem = self.read((count + self.first) % self.capa)
             self.count = self.count + 1
             return ('[%d]' % count, elem)
 
@@ -296,7 +362,7 @@ class BoostCircular:
             return self.__next__()
 
     def __init__(self, value):
-        self.typename = value.type_name
+        self.typename = value.short_type_name
         self.value = value
 
     def children(self):
@@ -306,6 +372,25 @@ class BoostCircular:
                               self.value['m_end'],
                               self.value['m_size'])
 
+    def at(self, idx):
+        first = self.value['m_first']
+        buff = self.value['m_buff']
+        check_index(idx, int(self.value['m_size']))
+        capa = int(self.value['m_end'] - buff)
+        return (buff + (idx + int(first - buff)) % capa).dereference()
+
+    def element_count(self):
+        return int(self.value['m_size'])
+
+    def element_spans(self):
+        buff = self.value['m_buff']
+        first = int(self.value['m_first'] - buff)
+        capa = int(self.value['m_end'] - buff)
+        size = int(self.value['m_size'])
+        # the elements wrap around the end of the buffer
+        head = min(size, capa - first)
+        return pointer_spans(buff, (first, head), (0, size - head))
+
     def to_string(self):
         buff = self.value['m_buff']
         end = self.value['m_end']
@@ -332,8 +417,28 @@ class BoostArray:
         return None
 
     def children(self):
-        for idx in range(self.size):
-            yield '[{}]'.format(idx), self.value['elems'][idx]
+        if self.size == 0:
+            return iter([])
+        elems = self.value['elems']
+        # values without an address (e.g. elements of an outer container, decoded from a
+        # buffer) are indexed directly
+        read = elems.__getitem__ if elems[0].address is None else element_reader(elems[0].address)
+        return Indexed_Children(self.size, lambda idx: [('[{}]'.format(idx), read(idx))])
+
+    def at(self, idx):
+        check_index(idx, self.size)
+        return self.value['elems'][idx]
+
+    def element_count(self):
+        return self.size
+
+    def element_spans(self):
+        if self.size == 0:
+            return self.value.type.template_argument(0), []
+        address = self.value['elems'][0].address
+        if address is None:
+            return None
+        return pointer_spans(address, (0, self.size))
 
     def display_hint(self):
         return 'array'
@@ -358,9 +463,20 @@ class BoostSmallVector:
 
     def children(self):
         m_holder = self.value['m_holder']
-        size = int(m_holder['m_size'])
-        for idx in range(size):
-            yield '[{}]'.format(idx), m_holder['m_start'][idx]
+        read = element_reader(m_holder['m_start'])
+        return Indexed_Children(int(m_holder['m_size']), lambda idx: [('[{}]'.format(idx), read(idx))])
+
+    def at(self, idx):
+        m_holder = self.value['m_holder']
+        check_index(idx, int(m_holder['m_size']))
+        return m_holder['m_start'][idx]
+
+    def element_count(self):
+        return int(self.value['m_holder']['m_size'])
+
+    def element_spans(self):
+        m_holder = self.value['m_holder']
+        return pointer_spans(m_holder['m_start'], (0, int(m_holder['m_size'])))
 
     def display_hint(self):
         return 'array'
@@ -384,9 +500,20 @@ class BoostSmallVectorBase:
 
     def children(self):
         m_holder = self.value['m_holder']
-        size = int(m_holder['m_size'])
-        for idx in range(size):
-            yield '[{}]'.format(idx), m_holder['m_start'][idx]
+        read = element_reader(m_holder['m_start'])
+        return Indexed_Children(int(m_holder['m_size']), lambda idx: [('[{}]'.format(idx), read(idx))])
+
+    def at(self, idx):
+        m_holder = self.value['m_holder']
+        check_index(idx, int(m_holder['m_size']))
+        return m_holder['m_start'][idx]
+
+    def element_count(self):
+        return int(self.value['m_holder']['m_size'])
+
+    def element_spans(self):
+        m_holder = self.value['m_holder']
+        return pointer_spans(m_holder['m_start'], (0, int(m_holder['m_size'])))
 
     def display_hint(self):
         return 'array'
@@ -399,20 +526,36 @@ class BoostStaticVector:
     min_supported_version = (1, 58, 0)
     max_supported_version = last_supported_boost_version
     template_name = 'boost::container::static_vector'
+    plans = type_cache()
+
+    @staticmethod
+    def build_plan(t):
+        # view the storage as the first element
+        return Access_Plan(t, [('size', ('m_holder', 'm_size')),
+                               ('storage', ('m_holder', 'storage'), t.template_argument(0))])
 
     def __init__(self, value):
         self.value = value
+        self.plan = access_plan(self.plans, value.basic_type, self.build_plan)
+        self.size = self.plan.read(value)['size']
 
     def to_string(self):
-        return 'size={}'.format(self.value['m_holder']['m_size'])
+        return 'size={}'.format(self.size)
 
     def children(self):
-        element_type = self.value.type.template_argument(0)
-        data_storage = self.value['m_holder']['storage']
-        elements = data_storage.address.cast(element_type.pointer())
-        size = int(self.value['m_holder']['m_size'])
-        for idx in range(size):
-            yield '[{}]'.format(idx), elements[idx]
+        elements = self.plan.field(self.value, 'storage').address
+        read = element_reader(elements)
+        return Indexed_Children(self.size, lambda idx: [('[{}]'.format(idx), read(idx))])
+
+    def at(self, idx):
+        check_index(idx, self.size)
+        return self.plan.field(self.value, 'storage').address[idx]
+
+    def element_count(self):
+        return self.size
+
+    def element_spans(self):
+        return pointer_spans(self.plan.field(self.value, 'storage').address, (0, self.size))
 
     def display_hint(self):
         return 'array'
@@ -438,7 +581,7 @@ class BoostDynamicBitset:
         data_vis = gdb.default_visualizer(self.value['m_bits'])
         if data_vis is None:
             return
-        data = [int(value) for index_str, value in data_vis.children()]
+        data = [int(value) for index_str, value in unbudgeted_children(data_vis)]
 
         for block_idx, block in enumerate(data):
             bits_in_block = num_bits % block_size if block_idx == len(data) - 1 else block_size
@@ -459,7 +602,7 @@ class BoostUuid:
     template_name = 'boost::uuids::uuid'
 
     def __init__(self, value):
-        self.typename = value.type_name
+        self.typename = value.short_type_name
         self.value = value
 
     def to_string(self):
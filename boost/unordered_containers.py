@@ -25,7 +25,93 @@
 # DEALINGS IN THE SOFTWARE.
 
 from .utils import *
-import itertools
+import collections
+
+
+#
+# Python reimplementation of boost::hash and of the hash policies of boost
+# unordered containers (boost/unordered/detail/implementation.hpp), used to
+# locate the bucket of a key without walking the whole container.
+#
+
+def _hash_combine(seed, value, bits, boost_version):
+    """boost::hash_combine (hash_detail::hash_combine_impl) for a `bits`-wide std::size_t"""
+    mask = (1 << bits) - 1
+    if boost_version < (1, 56, 0):
+        # before the murmur-based hash_combine_impl
+        return (seed ^ (value + 0x9e3779b9 + (seed << 6) + (seed >> 2))) & mask
+    if bits == 64:
+        m = 0xc6a4a7935bd1e995
+        k = (value * m) & mask
+        k ^= k >> 47
+        k = (k * m) & mask
+        seed = ((seed ^ k) * m) & mask
+        return (seed + 0xe6546b64) & mask
+    if bits == 32:
+        def rotl(x, r):
+            return ((x << r) | (x >> (32 - r))) & mask
+        k = rotl((value * 0xcc9e2d51) & mask, 15)
+        k = (k * 0x1b873593) & mask
+        seed = rotl(seed ^ k, 13)
+        return (seed * 5 + 0xe6546b64) & mask
+    return (seed ^ (value + 0x9e3779b9 + (seed << 6) + (seed >> 2))) & mask
+
+
+def _hash_integral(value, value_bits, bits):
+    """
+    boost::hash_detail::hash_value_signed/hash_value_unsigned of a `value_bits`-wide integer
+    `value`, for a `bits`-wide std::size_t: integers wider than std::size_t are folded.
+    """
+    mask = (1 << bits) - 1
+    # (digits - 1) / size_t bits; the same for signed and unsigned power of 2 widths
+    length = (value_bits - 1) // bits
+    positive = -1 - value if value < 0 else value
+    seed = 0
+    for i in xrange(length * bits, 0, -bits):
+        seed = (seed ^ (((positive >> i) & mask) + (seed << 6) + (seed >> 2))) & mask
+    return (seed ^ ((value & mask) + (seed << 6) + (seed >> 2))) & mask
+
+
+def boost_hash(key_type, key, bits, boost_version):
+    """
+    Compute boost::hash<`key_type`> of `key`, a python object produced by key_decoder(`key_type`).
+
+    Supports integral, enum and pointer types, and std::string, as hashed by boost versions
+    before 1.81 (which rewrote boost::hash). Returns None whenever the hash cannot be
+    reproduced exactly, so that callers scan the container instead.
+    """
+    if boost_version is None or boost_version >= (1, 81, 0):
+        return None
+    t = get_basic_type(key_type)
+    mask = (1 << bits) - 1
+    if t.code == gdb.TYPE_CODE_PTR:
+        x = key & mask
+        return (x + (x >> 3)) & mask
+    if t.code in [gdb.TYPE_CODE_INT, gdb.TYPE_CODE_CHAR, gdb.TYPE_CODE_BOOL, gdb.TYPE_CODE_ENUM]:
+        return _hash_integral(key, t.sizeof * 8, bits)
+    if isinstance(key, bytes):
+        # hash_range() over signed chars
+        seed = 0
+        for c in bytearray(key):
+            seed = _hash_combine(seed, (c - 256 if c >= 128 else c) & mask, bits, boost_version)
+        return seed
+    return None
+
+
+def _mix64(key):
+    """boost::unordered::detail::mix64_policy::apply_hash() post-processing step"""
+    mask = (1 << 64) - 1
+    key = ((~key) + (key << 21)) & mask
+    key ^= key >> 24
+    key = (key + (key << 3) + (key << 8)) & mask
+    key ^= key >> 14
+    key = (key + (key << 2) + (key << 4)) & mask
+    key ^= key >> 28
+    return (key + (key << 31)) & mask
+
+
+# Key types for which pick_policy selects prime_policy even with a 64-bit std::size_t
+_prime_policy_key_types = ['int', 'unsigned int', 'long', 'unsigned long', 'long long', 'unsigned long long']
 
 
 class BoostUnorderedCommon:
@@ -33,23 +119,46 @@ class BoostUnorderedCommon:
     def __init__(self, val):
         self.val = val
 
-    @staticmethod
-    def nodes(start_node):
-        """Generator iterating over all nodes in unordered container"""
-        node_ptr = start_node.address
-        while True:
-            next_ptr = node_ptr.dereference()['next_']
-            if not next_ptr or next_ptr == node_ptr:
-                return
-            node_ptr = next_ptr
-            yield node_ptr.dereference()
-
-    def stored_items(self):
-        """Generator iterating over all items stored in container"""
+    class Item_Iterator:
+        """Seekable iterator over the items stored after node pointer `node_ptr`"""
+        def __init__(self, node_ptr, node_type, value_type, guard):
+            self.node_ptr = node_ptr
+            self.node_type = node_type
+            self.value_type = value_type
+            self.guard = guard
+
+        def __iter__(self):
+            return self
+
+        @property
+        def position(self):
+            return None if self.node_ptr is None else intptr(self.node_ptr)
+
+        def seek(self, position, index):
+            self.node_ptr = gdb.Value(position).cast(self.node_ptr.type)
+
+        def __next__(self):
+            if self.node_ptr is None:
+                raise StopIteration
+            next_ptr = self.node_ptr.dereference()['next_']
+            if not next_ptr or next_ptr == self.node_ptr or not self.guard.check(next_ptr):
+                self.node_ptr = None
+                raise StopIteration
+            self.node_ptr = next_ptr
+            node_data = reinterpret_cast(next_ptr.dereference(), self.node_type)['value_base_']['data_']
+            return reinterpret_cast(node_data, self.value_type)
+
+        def next(self):
+            return self.__next__()
+
+    def stored_items(self, guard=None):
+        """Seekable iterator over all items stored in container"""
+        if guard is None:
+            guard = Traversal_Guard()
         table = self.val['table_']
         buckets = table['buckets_']
         if not buckets:
-            return
+            return self.Item_Iterator(None, None, None, guard)
 
         value_type = get_inner_type(self.val.type, 'value_type')
 
@@ -64,16 +173,204 @@ class BoostUnorderedCommon:
         bucket_count = table['bucket_count_']
         start_node = buckets[bucket_count]
 
-        for node in itertools.islice(self.nodes(start_node), 1 if extra_node else 0, None):
-            node_data = reinterpret_cast(node, node_type)['value_base_']['data_']
-            stored_value = reinterpret_cast(node_data, value_type)
-            yield stored_value
+        it = self.Item_Iterator(start_node.address, node_type, value_type, guard)
+        if extra_node:
+            next(it, None)
+        return it
 
     def size(self):
         table = self.val['table_']
         buckets = table['buckets_']
         return table['size_'] if buckets else 0
 
+    def element_count(self):
+        return int(self.size())
+
+    def find_item(self, key, key_of):
+        """
+        Find the stored item whose key, as extracted by `key_of`, equals the gdb.Value `key`.
+
+        When the container uses boost::hash on an integral, pointer or std::string key, the bucket
+        of `key` is computed in python and that bucket's chain is walked first. The computed hash
+        may not be the one the program used (e.g. a user specialization of boost::hash), so all
+        stored items are scanned when the bucket has no match, or when no bucket can be computed.
+        Returns None if no item matches.
+        """
+        container_type = self.val.type.strip_typedefs()
+        key_type = get_basic_type(container_type.template_argument(0))
+        decode = key_decoder(key_type)
+        if decode is None:
+            match = lambda v: v == key
+        else:
+            decoded_key = decode(key)
+            match = lambda v: decode(v) == decoded_key
+
+        items = self.bucket_items(key_type, decoded_key) if decode is not None else None
+        if items is not None:
+            for item in items:
+                if match(key_of(item)):
+                    return item
+        for item in self.stored_items():
+            if match(key_of(item)):
+                return item
+        return None
+
+    @staticmethod
+    def uses_mix64(key_type, bits):
+        """Check if boost picks mix64_policy (rather than prime_policy) for `key_type`"""
+        return bits == 64 and str(get_basic_type(key_type)) not in _prime_policy_key_types
+
+    @staticmethod
+    def hash_policy(key_type, bucket_count, bits):
+        """
+        Return the function mapping a (policy-adjusted) hash value to a bucket index, or None
+        if `bucket_count` does not fit the hash policy boost picks for `key_type`.
+        """
+        if BoostUnorderedCommon.uses_mix64(key_type, bits):
+            # mix64_policy uses power of 2 bucket counts
+            if bucket_count & (bucket_count - 1):
+                return None
+            return lambda h: h & (bucket_count - 1)
+        return lambda h: h % bucket_count
+
+    def element_addresses(self):
+        """
+        Return (value type, generator of the addresses of all stored items), reading only node links.
+        """
+        value_type = get_inner_type(self.val.type, 'value_type')
+        table = self.val['table_']
+        buckets = table['buckets_']
+        if not buckets:
+            return value_type, iter([])
+        bucket_type = get_basic_type(table['allocators_'].type.template_argument(0).template_argument(0))
+        if bucket_type.name != 'boost::unordered::detail::ptr_bucket':
+            return value_type, (intptr(item.address) for item in self.stored_items())
+        node_type = table['allocators_'].type.template_argument(1).template_argument(0)
+
+        # links point to the ptr_bucket base of the next node
+        link_offset, _ = field_offset(bucket_type, 'next_')
+        base_offset = field_offset(node_type, 'next_')[0] - link_offset
+        data_offset = field_offset(node_type, 'value_base_', 'data_')[0] - base_offset
+        start_link = intptr(buckets[int(table['bucket_count_'])].address)
+
+        guard = Traversal_Guard()
+
+        def walk():
+            link = read_pointer(start_link + link_offset)
+            while link and guard.check(link):
+                yield link + data_offset
+                next_link = read_pointer(link + link_offset)
+                if next_link == link:
+                    break
+                link = next_link
+        return value_type, guarded_addresses(walk(), guard)
+
+    def chain_lengths(self, guard=None):
+        """
+        Generator of the lengths of all non-empty bucket chains, computed in one pass over the node list.
+
+        Only the link and bucket fields of each node are read, as raw integers; element values are
+        never materialized. Returns None if the node layout of the container is not supported.
+        """
+        if guard is None:
+            guard = Traversal_Guard()
+        table = self.val['table_']
+        buckets = table['buckets_']
+        if not buckets:
+            return iter([])
+        bucket_type = get_basic_type(table['allocators_'].type.template_argument(0).template_argument(0))
+        if bucket_type.name != 'boost::unordered::detail::ptr_bucket':
+            return None
+        node_type = table['allocators_'].type.template_argument(1).template_argument(0)
+        key_type = get_basic_type(self.val.type.strip_typedefs().template_argument(0))
+        bits = lookup_type('size_t').sizeof * 8
+        size_t_size = bits // 8
+        ptr_size = pointer_size()
+        bucket_count = int(table['bucket_count_'])
+
+        # links point to the ptr_bucket base of the next node
+        link_offset, _ = field_offset(bucket_type, 'next_')
+        base_offset = field_offset(node_type, 'next_')[0] - link_offset
+        if gdb.types.has_field(node_type, 'bucket_info_'):
+            info_offset = field_offset(node_type, 'bucket_info_')[0] - base_offset
+            mask = (1 << (bits - 1)) - 1
+            node_bucket = lambda link: read_uint(link + info_offset, size_t_size) & mask
+        else:
+            to_bucket = self.hash_policy(key_type, bucket_count, bits)
+            if to_bucket is None:
+                return None
+            hash_offset = field_offset(node_type, 'hash_')[0] - base_offset
+            node_bucket = lambda link: to_bucket(read_uint(link + hash_offset, size_t_size))
+        start_link = intptr(buckets[bucket_count].address)
+
+        def walk():
+            # nodes of one bucket are adjacent in the node list
+            crt_bucket, length = None, 0
+            link = read_uint(start_link + link_offset, ptr_size)
+            while link and guard.check(link):
+                bucket = node_bucket(link)
+                if bucket != crt_bucket:
+                    if length:
+                        yield length
+                    crt_bucket, length = bucket, 0
+                length += 1
+                next_link = read_uint(link + link_offset, ptr_size)
+                if next_link == link:
+                    break
+                link = next_link
+            if length:
+                yield length
+        return walk()
+
+    def bucket_items(self, key_type, key):
+        """
+        Generator iterating over the items in the bucket of python key `key`, or None if
+        the bucket cannot be computed for this container.
+        """
+        table = self.val['table_']
+        buckets = table['buckets_']
+        if not buckets:
+            return iter([])
+        if template_name(self.val.type.strip_typedefs().template_argument(self.hash_arg)) != 'boost::hash':
+            return None
+        bucket_allocator_type = table['allocators_'].type.template_argument(0)
+        if get_basic_type(bucket_allocator_type.template_argument(0)).name != 'boost::unordered::detail::ptr_bucket':
+            return None
+        node_type = table['allocators_'].type.template_argument(1).template_argument(0)
+        bits = lookup_type('size_t').sizeof * 8
+        hash_value = boost_hash(key_type, key, bits, registered_boost_version())
+        if hash_value is None:
+            return None
+
+        bucket_count = int(table['bucket_count_'])
+        to_bucket = self.hash_policy(key_type, bucket_count, bits)
+        if to_bucket is None:
+            return None
+        if self.uses_mix64(key_type, bits):
+            hash_value = _mix64(hash_value)
+        bucket_index = to_bucket(hash_value)
+
+        if gdb.types.has_field(node_type, 'bucket_info_'):
+            node_bucket = lambda node: int(node['bucket_info_']) & ((1 << (bits - 1)) - 1)
+        else:
+            node_bucket = lambda node: to_bucket(int(node['hash_']))
+        value_type = get_inner_type(self.val.type, 'value_type')
+
+        def walk():
+            # the bucket points to the node preceding its first node
+            prev = buckets[bucket_index]['next_']
+            if not prev:
+                return
+            node_ptr = prev.dereference()['next_']
+            guard = Traversal_Guard()
+            while node_ptr and guard.check(node_ptr):
+                node = reinterpret_cast(node_ptr.dereference(), node_type)
+                if node_bucket(node) != bucket_index:
+                    return
+                yield reinterpret_cast(node['value_base_']['data_'], value_type)
+                node_ptr = node['next_']
+        return walk()
+
 
 @add_printer
 class BoostUnorderedMapPrinter(BoostUnorderedCommon):
@@ -82,6 +379,8 @@ class BoostUnorderedMapPrinter(BoostUnorderedCommon):
     min_supported_version = (1, 58, 0)
     max_supported_version = last_supported_boost_version
     template_name = ['boost::unordered::unordered_map', 'boost::unordered::unordered_multimap']
+    # index of the Hash template argument
+    hash_arg = 2
 
     def __init__(self, val):
         BoostUnorderedCommon.__init__(self, val)
@@ -91,12 +390,19 @@ class BoostUnorderedMapPrinter(BoostUnorderedCommon):
         container_type = self.val.type.strip_typedefs()
         key_type = container_type.template_argument(0)
         value_type = container_type.template_argument(1)
-        return '{}<{}, {}> size = {}'.format(template_name, key_type, value_type, self.size())
+        return '{}<{}, {}> size = {}'.format(template_name, abbreviate_type_name(str(key_type)),
+                                            abbreviate_type_name(str(value_type)), self.size())
 
     def children(self):
-        for item_number, item in enumerate(self.stored_items()):
-            yield 'key[{}]'.format(item_number), item['first']
-            yield 'value[{}]'.format(item_number), item['second']
+        guard = Traversal_Guard()
+        items = Element_Children(self.stored_items(guard), lambda item_number, item: [
+            ('key[{}]'.format(item_number), item['first']),
+            ('value[{}]'.format(item_number), item['second'])])
+        return guarded_children(items, guard, ('key[truncated]', 'value[truncated]'))
+
+    def find(self, key):
+        item = self.find_item(key, lambda item: item['first'])
+        return None if item is None else item['second']
 
     def display_hint(self):
         return 'map'
@@ -109,6 +415,8 @@ class BoostUnorderedSetPrinter(BoostUnorderedCommon):
     min_supported_version = (1, 58, 0)
     max_supported_version = last_supported_boost_version
     template_name = ['boost::unordered::unordered_set', 'boost::unordered::unordered_multiset']
+    # index of the Hash template argument
+    hash_arg = 1
 
     def __init__(self, val):
         BoostUnorderedCommon.__init__(self, val)
@@ -117,11 +425,16 @@ class BoostUnorderedSetPrinter(BoostUnorderedCommon):
         template_name = self.val.template_name
         container_type = self.val.type.strip_typedefs()
         value_type = container_type.template_argument(0)
-        return '{}<{}> size = {}'.format(template_name, value_type, self.size())
+        return '{}<{}> size = {}'.format(template_name, abbreviate_type_name(str(value_type)), self.size())
 
     def children(self):
-        for item_number, item in enumerate(self.stored_items()):
-            yield '[{}]'.format(item_number), item
+        guard = Traversal_Guard()
+        items = Element_Children(self.stored_items(guard), lambda item_number, item: [
+            ('[{}]'.format(item_number), item)])
+        return guarded_children(items, guard)
+
+    def find(self, key):
+        return self.find_item(key, lambda item: item)
 
     def display_hint(self):
         return 'array'
@@ -151,3 +464,53 @@ class BoostUnorderedIterator:
             stored_value = reinterpret_cast(node_data, value_type)
             return [('value', stored_value)]
         return []
+
+
+class BoostUnorderedStatsCommand(gdb.Command):
+    """Print bucket occupancy statistics of a boost::unordered container.
+
+Usage: boost-unordered-stats EXPRESSION
+
+Reports the load factor, the number of empty buckets, the longest bucket chain
+and the histogram of bucket chain lengths. The node list is walked once, reading
+only node links and bucket information; element values are never read."""
+
+    template_names = (BoostUnorderedMapPrinter.template_name + BoostUnorderedSetPrinter.template_name)
+
+    def __init__(self):
+        super(BoostUnorderedStatsCommand, self).__init__('boost-unordered-stats', gdb.COMMAND_DATA, gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        if not arg:
+            raise gdb.GdbError('boost-unordered-stats: expression required')
+        v = GDB_Value_Wrapper(parse_and_eval(arg))
+        if v.template_name not in self.template_names:
+            raise gdb.GdbError('boost-unordered-stats: not a boost::unordered container: ' + v.type_name)
+        cont = BoostUnorderedCommon(v)
+        guard = Traversal_Guard()
+        lengths = cont.chain_lengths(guard)
+        if lengths is None:
+            raise gdb.GdbError('boost-unordered-stats: unsupported node layout: ' + v.type_name)
+        histogram = collections.Counter(lengths)
+        size = int(cont.size())
+        bucket_count = int(v['table_']['bucket_count_']) if v['table_']['buckets_'] else 0
+        used_buckets = sum(histogram.values())
+        if bucket_count > used_buckets:
+            histogram[0] = bucket_count - used_buckets
+
+        gdb.write('{}: size={} buckets={}\n'.format(v.template_name, size, bucket_count))
+        if guard.reason is not None:
+            gdb.write('node list {}\n'.format(truncation_marker(guard.reason)))
+        if bucket_count == 0:
+            return
+        gdb.write('load factor: {:.3f}\n'.format(float(size) / bucket_count))
+        gdb.write('empty buckets: {} ({:.1f}%)\n'.format(histogram[0], 100.0 * histogram[0] / bucket_count))
+        gdb.write('max chain length: {}\n'.format(max(histogram)))
+        if used_buckets:
+            gdb.write('mean non-empty chain length: {:.3f}\n'.format(float(size) / used_buckets))
+        gdb.write('chain length histogram:\n')
+        for length in sorted(histogram):
+            gdb.write('  {:>6}: {}\n'.format(length, histogram[length]))
+
+
+BoostUnorderedStatsCommand()
@@ -3,9 +3,15 @@ from __future__ import print_function
 import gdb
 import gdb.types
 import gdb.printing
-from gdb import lookup_type
 import sys
+import re
+import bisect
+import struct
+import itertools
+import time
 import collections
+import json
+import zlib
 
 from .detect_version import detect_boost_version
 
@@ -24,6 +30,19 @@ if have_python_3:
 elif have_python_2:
     intptr = long
 
+#
+# Type lookup.
+#
+def lookup_type(name, block=None):
+    """
+    gdb.lookup_type(), also saving the type while a snapshot is being recorded.
+    """
+    t = gdb.lookup_type(name) if block is None else gdb.lookup_type(name, block)
+    if _snapshot_recording:
+        _snapshot_recording[0].add_lookup(name, t)
+    return t
+
+
 #
 # Replacement for switch statement.
 #
@@ -138,6 +157,235 @@ def template_name(t):
         return ''
 
 
+#
+# C++ type name parsing.
+#
+# Type names printed by gdb (and template arguments which gdb.Type.template_argument()
+# cannot provide, e.g. variadic packs) are parsed by parse_type_name(). Only the
+# brackets and commas of a name are visited, using a regex, and parse results are
+# memoized per name, so repeated and nested names of large Boost types are parsed once.
+#
+_type_name_delimiters = re.compile(r'[<>()\[\]{},]')
+_type_name_closing = {'>': '<', ')': '(', ']': '[', '}': '{'}
+_type_name_suffix_qualifiers = ('&', '*', 'const', 'volatile')
+_type_name_prefix_qualifiers = ('const', 'volatile')
+_parsed_type_names = dict()
+
+
+def _ends_with_word(s, word):
+    return s.endswith(word) and (len(s) == len(word) or not (s[-len(word) - 1].isalnum() or s[-len(word) - 1] == '_'))
+
+
+def _starts_with_word(s, word):
+    return s.startswith(word) and (len(s) == len(word) or not (s[len(word)].isalnum() or s[len(word)] == '_'))
+
+
+class Type_Name(object):
+    """
+    Parsed C++ type name. Attributes:
+    - text: the whole name
+    - base: the name without const/volatile qualifiers, pointers and references
+    - qualifiers: the qualifiers, pointers and references removed from `text` to get `base`,
+      innermost first (see strip_qualifiers in variant.py)
+    - name: the template name of `base` (`base` itself if it is not a template)
+    - arg_names: the template argument strings of `base`
+    - args: the template arguments of `base`, as Type_Name objects
+    - suffix: what follows the template arguments in `base`, e.g. '::iterator'
+    """
+    def __init__(self, text):
+        self.text = text.strip()
+        base = self.text
+        qualifiers = []
+        while True:
+            base = base.rstrip()
+            qual = next((q for q in _type_name_suffix_qualifiers
+                         if (q in '&*' and base.endswith(q)) or (q not in '&*' and _ends_with_word(base, q))), None)
+            if qual is None:
+                break
+            base = base[:-len(qual)]
+            qualifiers.append(qual)
+        while True:
+            base = base.lstrip()
+            qual = next((q for q in _type_name_prefix_qualifiers if _starts_with_word(base, q)), None)
+            if qual is None:
+                break
+            base = base[len(qual):]
+            qualifiers.append(qual)
+        self.base = base
+        self.qualifiers = tuple(qualifiers[::-1])
+        self.name, self.arg_names, self.suffix = _split_template_id(base)
+
+    @property
+    def args(self):
+        return [parse_type_name(arg) for arg in self.arg_names]
+
+    def __str__(self):
+        return self.text
+
+
+def _split_template_id(s):
+    """
+    Split a type name into its template name, the list of its template argument strings,
+    taken from the first top-level <...> group, and the rest of the name.
+    Returns (s, [], '') if there is no such group.
+    """
+    stack = []
+    args = []
+    begin = None
+    for m in _type_name_delimiters.finditer(s):
+        c = m.group()
+        i = m.start()
+        if c in '<([{':
+            if not stack and c == '<' and begin is None:
+                begin = i
+                args_start = i + 1
+            stack.append(c)
+        elif c == ',':
+            if len(stack) == 1 and begin is not None and stack[0] == '<':
+                args.append(s[args_start:i].strip())
+                args_start = i + 1
+        else:
+            if not stack or stack[-1] != _type_name_closing[c]:
+                # mismatched brackets, e.g. operator<
+                return s, [], ''
+            stack.pop()
+            if not stack and c == '>' and begin is not None:
+                last = s[args_start:i].strip()
+                if last or args:
+                    args.append(last)
+                return s[:begin].strip(), args, s[i + 1:].strip()
+    return s, [], ''
+
+
+def parse_type_name(type_name):
+    """
+    Parse a C++ type name into a Type_Name. Results are memoized per name.
+    """
+    t = _parsed_type_names.get(type_name)
+    if t is None:
+        t = _parsed_type_names[type_name] = Type_Name(type_name)
+    return t
+
+
+#
+# Type name abbreviation.
+#
+# Printers show type names through abbreviate_type_name() (e.g. with
+# GDB_Value_Wrapper.short_type_name), when options['abbreviate_type_names'] is set:
+# - trailing template arguments which are defaults are dropped. An argument is a
+#   default if it is in type_name_placeholder_args, or if it is the default argument
+#   for its position in type_name_default_args, instantiated from the preceding
+#   (abbreviated) arguments, e.g. std::less<Key> but not std::less<void>. Patterns
+#   use {0}, {1}, ... for the preceding arguments, and {alloc} for any of
+#   type_name_allocators;
+# - whole names found in type_name_aliases are replaced;
+# - nested names, e.g. A<...>::B<...>, are abbreviated segment by segment.
+# Results are cached in abbreviated_type_names, which must be cleared after changing
+# these rules.
+#
+type_name_placeholder_args = set([
+    'mpl_::na', 'boost::detail::variant::void_', 'boost::multi_index::tag<>'])
+type_name_allocators = [
+    'std::allocator', 'boost::container::new_allocator', 'boost::container::container_detail::new_allocator']
+_sequence_defaults = {1: ['{alloc}<{0}>']}
+_set_defaults = {1: ['std::less<{0}>'], 2: ['{alloc}<{0}>']}
+_map_defaults = {2: ['std::less<{0}>'],
+                 3: ['{alloc}<std::pair<const {0}, {1}> >', '{alloc}<std::pair<{0} const, {1}> >']}
+_flat_map_defaults = {2: ['std::less<{0}>'], 3: ['{alloc}<std::pair<{0}, {1}> >']}
+_string_defaults = {1: ['std::char_traits<{0}>'], 2: ['{alloc}<{0}>']}
+_unordered_set_defaults = {1: ['std::hash<{0}>'], 2: ['std::equal_to<{0}>'], 3: ['{alloc}<{0}>']}
+_unordered_map_defaults = {2: ['std::hash<{0}>'], 3: ['std::equal_to<{0}>'], 4: _map_defaults[3]}
+_boost_unordered_set_defaults = dict(_unordered_set_defaults)
+_boost_unordered_set_defaults[1] = ['boost::hash<{0}>']
+_boost_unordered_map_defaults = dict(_unordered_map_defaults)
+_boost_unordered_map_defaults[2] = ['boost::hash<{0}>']
+type_name_default_args = {
+    'std::basic_string': _string_defaults,
+    'std::__cxx11::basic_string': _string_defaults,
+    'std::vector': _sequence_defaults,
+    'std::deque': _sequence_defaults,
+    'std::list': _sequence_defaults,
+    'std::__cxx11::list': _sequence_defaults,
+    'std::forward_list': _sequence_defaults,
+    'std::set': _set_defaults,
+    'std::multiset': _set_defaults,
+    'std::map': _map_defaults,
+    'std::multimap': _map_defaults,
+    'std::unordered_set': _unordered_set_defaults,
+    'std::unordered_multiset': _unordered_set_defaults,
+    'std::unordered_map': _unordered_map_defaults,
+    'std::unordered_multimap': _unordered_map_defaults,
+    'boost::unordered::unordered_set': _boost_unordered_set_defaults,
+    'boost::unordered::unordered_multiset': _boost_unordered_set_defaults,
+    'boost::unordered::unordered_map': _boost_unordered_map_defaults,
+    'boost::unordered::unordered_multimap': _boost_unordered_map_defaults,
+    'boost::container::flat_set': _set_defaults,
+    'boost::container::flat_multiset': _set_defaults,
+    'boost::container::flat_map': _flat_map_defaults,
+    'boost::container::flat_multimap': _flat_map_defaults,
+    'boost::container::small_vector': {2: ['{alloc}<{0}>']},
+    'boost::circular_buffer': _sequence_defaults,
+}
+type_name_aliases = {
+    'std::basic_string<char>': 'std::string',
+    'std::__cxx11::basic_string<char>': 'std::string',
+    'std::basic_string<wchar_t>': 'std::wstring',
+    'std::__cxx11::basic_string<wchar_t>': 'std::wstring',
+}
+abbreviated_type_names = dict()
+
+
+def _squeeze(type_name):
+    return ''.join(type_name.split())
+
+
+def _is_default_arg(template, args):
+    """
+    Check if the last of the (abbreviated) template arguments `args` of `template` is a default.
+    """
+    arg = args[-1]
+    if arg in type_name_placeholder_args:
+        return True
+    patterns = type_name_default_args.get(template, dict()).get(len(args) - 1, ())
+    arg = _squeeze(arg)
+    return any(_squeeze(pattern.format(*args[:-1], alloc=alloc)) == arg
+               for pattern in patterns for alloc in type_name_allocators)
+
+
+def _abbreviate(t):
+    if not t.arg_names:
+        return type_name_aliases.get(t.text, t.text)
+    args = [abbreviate_type_name(arg) for arg in t.arg_names]
+    while args and _is_default_arg(t.name, args):
+        args.pop()
+    suffix = t.suffix
+    if suffix.startswith('::'):
+        suffix = '::' + abbreviate_type_name(suffix[2:])
+    if args == t.arg_names and suffix == t.suffix:
+        base = t.base
+    else:
+        base = t.name + '<' + ', '.join(args) + (' >' if args and args[-1].endswith('>') else '>')
+        base = type_name_aliases.get(base, base)
+        if suffix:
+            base += suffix if suffix.startswith('::') else ' ' + suffix
+    if base == t.base:
+        return t.text
+    i = t.text.find(t.base)
+    return t.text[:i] + base + t.text[i + len(t.base):]
+
+
+def abbreviate_type_name(type_name):
+    """
+    Shorten a C++ type name for display, if options['abbreviate_type_names'] is set.
+    """
+    if not options['abbreviate_type_names']:
+        return type_name
+    short_name = abbreviated_type_names.get(type_name)
+    if short_name is None:
+        short_name = abbreviated_type_names[type_name] = _abbreviate(parse_type_name(type_name))
+    return short_name
+
+
 class _aux_save_value_as_variable(gdb.Function):
     def __init__(self, v):
         super(_aux_save_value_as_variable, self).__init__('_aux_save_value_as_variable')
@@ -476,8 +724,71 @@ def add_to_dict(d, *keys):
         return None
     return inner_decorator
 
+def read_string_bytes(v):
+    """
+    Read the characters held by `v` into a python byte string.
+
+    `v` is a gdb.Value holding a char array, a pointer to char, or a libstdc++ std::string.
+    Returns None for any other type.
+    """
+    t = get_basic_type(v.type)
+    if t.code in [gdb.TYPE_CODE_ARRAY, gdb.TYPE_CODE_PTR] and t.target().sizeof == 1:
+        if t.code == gdb.TYPE_CODE_PTR and intptr(v) == 0:
+            return None
+        return v.string('latin-1').encode('latin-1')
+    if template_name(t) in ['std::basic_string', 'std::__cxx11::basic_string']:
+        data = v['_M_dataplus']['_M_p']
+        if gdb.types.has_field(t, '_M_string_length'):
+            length = int(v['_M_string_length'])
+        else:
+            # pre-C++11 ABI: the length is the first field of the _Rep header preceding the data
+            size_t_ptr = lookup_type('size_t').pointer()
+            length = int((data.cast(size_t_ptr) - 3).dereference())
+        return data.string('latin-1', length=length).encode('latin-1')
+    return None
+
+
+def key_decoder(key_type):
+    """
+    Return a function mapping gdb.Values to python objects that compare like `key_type` under
+    std::less and std::equal_to.
+
+    Arithmetic, enum and pointer keys map to numbers; std::string keys map to byte strings. Returns
+    None for other key types.
+    """
+    t = get_basic_type(key_type)
+    if t.code in [gdb.TYPE_CODE_INT, gdb.TYPE_CODE_CHAR, gdb.TYPE_CODE_BOOL, gdb.TYPE_CODE_ENUM, gdb.TYPE_CODE_PTR]:
+        return lambda v: int(v.cast(t))
+    if t.code == gdb.TYPE_CODE_FLT:
+        return lambda v: float(v.cast(t))
+    if template_name(t) in ['std::basic_string', 'std::__cxx11::basic_string']:
+        return read_string_bytes
+    return None
+
+
+def check_index(idx, size):
+    """
+    Raise IndexError if `idx` is not a valid element index for a container of `size` elements.
+    """
+    if not 0 <= idx < size:
+        raise IndexError('index ' + str(idx) + ' out of range [0, ' + str(size) + ')')
+
+
+def format_element(p, elem):
+    """
+    Format element `elem` returned by printer `p`. Elements of 'map' printers are (key, value) pairs.
+    """
+    if hasattr(p, 'display_hint') and p.display_hint() == 'map':
+        return '[' + str(elem[0]) + '] = ' + str(elem[1])
+    return str(elem)
+
+
+#
+# Convenience functions for printing specific elements in containers.
 #
-# Convenience function for printing specific elements in containers.
+# If the printer provides the optional random-access hook at(), it is used
+# directly. Otherwise, the printer's children() are walked, from the start or,
+# for seekable children, from the nearest checkpoint (see iter_elements()).
 #
 class at_func(gdb.Function):
     def __init__(self):
@@ -486,19 +797,144 @@ class at_func(gdb.Function):
         assert isinstance(cont, gdb.Value)
         p = gdb.default_visualizer(cont)
         assert p, 'no printer for type [' + str(cont.type) + ']'
+        idx = int(idx)
+        if hasattr(p, 'at'):
+            return format_element(p, p.at(idx))
         assert hasattr(p, 'children'), 'printer for type [' + str(cont.type) + '] has no children() function'
-        it = iter(p.children())
-        i = idx
-        while i > 0:
-            next(it)
-            i -= 1
-        _, val = next(it)
-        return str(val)
+        for _, elem in iter_elements(cont, p, idx):
+            return format_element(p, elem)
+        raise IndexError('index ' + str(idx) + ' out of range')
 
 
 _at = at_func()
 
 
+class slice_func(gdb.Function):
+    """$slice(CONTAINER, BEGIN, END): print the elements of CONTAINER with indexes in [BEGIN, END)."""
+    def __init__(self):
+        super(slice_func, self).__init__('slice')
+    def invoke(self, cont, begin, end):
+        assert isinstance(cont, gdb.Value)
+        p = gdb.default_visualizer(cont)
+        assert p, 'no printer for type [' + str(cont.type) + ']'
+        begin, end = int(begin), int(end)
+        assert 0 <= begin <= end, 'invalid slice [' + str(begin) + ', ' + str(end) + ')'
+        if hasattr(p, 'at'):
+            elements = []
+            for idx in xrange(begin, end):
+                try:
+                    elements.append((idx, p.at(idx)))
+                except IndexError:
+                    break
+        else:
+            assert hasattr(p, 'children'), 'printer for type [' + str(cont.type) + '] has no children() function'
+            elements = itertools.islice(iter_elements(cont, p, begin), end - begin)
+        if per_element(p) == 2:
+            items = [format_element(p, elem) for _, elem in elements]
+        else:
+            items = ['[{}] = {}'.format(idx, elem) for idx, elem in elements]
+        return '{' + ', '.join(items) + '}'
+
+
+_slice = slice_func()
+
+
+#
+# Convenience function for looking up elements by key in associative containers.
+#
+# The printer must provide the optional hook find(), which uses the
+# container's own ordering or hashing where possible.
+#
+class find_func(gdb.Function):
+    def __init__(self):
+        super(find_func, self).__init__('find')
+    def invoke(self, cont, key):
+        assert isinstance(cont, gdb.Value)
+        p = gdb.default_visualizer(cont)
+        assert p, 'no printer for type [' + str(cont.type) + ']'
+        assert hasattr(p, 'find'), 'printer for type [' + str(cont.type) + '] has no find() function'
+        val = p.find(key)
+        assert val is not None, 'key [' + str(key) + '] not found'
+        return str(val)
+
+
+_find = find_func()
+
+
+def tree_shape(root, children, max_nodes):
+    """
+    Measure a binary tree in one breadth-first pass.
+
+    `root` is the root node (or None for an empty tree), and `children(node)` returns the list
+    of non-null children of a node. Each node is visited at most once, and at most `max_nodes`
+    nodes are visited.
+
+    Returns (node_count, nodes_per_depth, truncated).
+    """
+    nodes_per_depth = []
+    node_count = 0
+    level = [root] if root is not None else []
+    while level:
+        if node_count + len(level) > max_nodes:
+            level = level[:max_nodes - node_count]
+            nodes_per_depth.append(len(level))
+            return node_count + len(level), nodes_per_depth, True
+        nodes_per_depth.append(len(level))
+        node_count += len(level)
+        next_level = []
+        for node in level:
+            next_level.extend(children(node))
+        level = next_level
+    return node_count, nodes_per_depth, False
+
+
+class tree_stats_cmd(gdb.Command):
+    """Print the shape of a tree-based container: height, node count, nodes per depth, imbalance.
+
+Usage: boost-tree-stats [-max-nodes N] EXPRESSION
+
+Works with Boost.Intrusive ordered containers (set, avl_set, splay_set, sg_set, ...)
+and with ordered indexes of multi_index_container. The imbalance ratio is the tree
+height divided by the minimal height of a binary tree with the same node count.
+At most N nodes (default 1000000) are visited, guarding against corrupt trees."""
+
+    default_max_nodes = 1000000
+
+    def __init__(self):
+        super(tree_stats_cmd, self).__init__('boost-tree-stats', gdb.COMMAND_DATA, gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        max_nodes = self.default_max_nodes
+        if arg.startswith('-max-nodes'):
+            args = arg.split(None, 2)
+            if len(args) < 3 or not args[1].isdigit():
+                raise gdb.GdbError('usage: boost-tree-stats [-max-nodes N] EXPRESSION')
+            max_nodes = int(args[1])
+            arg = args[2]
+        if not arg:
+            raise gdb.GdbError('usage: boost-tree-stats [-max-nodes N] EXPRESSION')
+        v = parse_and_eval(arg)
+        p = gdb.default_visualizer(v)
+        accessors = p.tree_shape_accessors() if hasattr(p, 'tree_shape_accessors') else None
+        if accessors is None:
+            raise gdb.GdbError('boost-tree-stats: not a tree-based container: ' + str(v.type))
+        root, children = accessors
+        node_count, nodes_per_depth, truncated = tree_shape(root, children, max_nodes)
+
+        height = len(nodes_per_depth)
+        min_height = node_count.bit_length()
+        gdb.write('nodes: {}{}\n'.format(node_count, ' (truncated at -max-nodes)' if truncated else ''))
+        gdb.write('height: {} (minimal: {})\n'.format(height, min_height))
+        if node_count:
+            gdb.write('imbalance ratio: {:.3f}\n'.format(float(height) / min_height))
+        gdb.write('nodes per depth:\n')
+        for depth, count in enumerate(nodes_per_depth):
+            gdb.write('  {:>4}: {}\n'.format(depth, count))
+
+
+_tree_stats = tree_stats_cmd()
+
+
 def unwind_references(value):
     """Convert reference (or reference chain) to actual value"""
     # gdb.TYPE_CODE_RVALUE_REF is also available in recent gdb versions
@@ -511,6 +947,1645 @@ def reinterpret_cast(value, target_type):
     return value.address.cast(target_type.pointer()).dereference()
 
 
+def field_offset(t, *path):
+    """
+    Return (offset, type) of the field reached by following field names `path` inside gdb.Type `t`.
+
+    The offset is in bytes from the start of `t`. Fields of base classes are found as well.
+    Raises KeyError if a field is not found.
+    """
+    offset = 0
+    for name in path:
+        found = _find_field(get_basic_type(t), name)
+        if found is None:
+            raise KeyError('no field [' + name + '] in type [' + str(t) + ']')
+        field_offset_bytes, t = found
+        offset += field_offset_bytes
+    return offset, t
+
+
+def _find_field(t, name):
+    for field in t.fields():
+        if field.name == name:
+            return field.bitpos // 8, field.type
+    for field in t.fields():
+        if field.is_base_class:
+            found = _find_field(get_basic_type(field.type), name)
+            if found is not None:
+                return field.bitpos // 8 + found[0], found[1]
+    return None
+
+
+#
+# Raw memory access.
+#
+# These helpers read integers and pointers straight from inferior memory,
+# without creating intermediate gdb.Value objects. Addresses are python ints.
+# They go through the read-ahead cache (see read_memory() below).
+#
+_uint_formats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+_byte_order = []
+
+
+def target_byte_order():
+    """
+    Return the struct module byte order character ('<' or '>') of the inferior.
+    """
+    if not _byte_order:
+        big = 'big endian' in gdb.execute('show endian', False, True)
+        _byte_order.append('>' if big else '<')
+    return _byte_order[0]
+
+
+def read_uint(addr, size):
+    """
+    Read an unsigned integer of `size` bytes at address `addr`.
+    """
+    return struct.unpack(target_byte_order() + _uint_formats[size], read_memory(addr, size))[0]
+
+
+def pointer_size():
+    return lookup_type('void').pointer().sizeof
+
+
+def read_pointer(addr):
+    """
+    Read a raw pointer at address `addr`, as a python int.
+    """
+    return read_uint(addr, pointer_size())
+
+
+def read_pointers(addr, count):
+    """
+    Read an array of `count` raw pointers at address `addr` in a single memory read,
+    as a tuple of python ints.
+    """
+    size = pointer_size()
+    return struct.unpack('{}{}{}'.format(target_byte_order(), count, _uint_formats[size]),
+                         read_memory(addr, count * size))
+
+
+#
+# Readable memory regions.
+#
+# The address ranges of the inferior are read once per stop, from `info proc mappings`
+# (live processes) and from the sections listed by `info files` (core files), so that
+# bad pointers are rejected with a binary search instead of a failed memory read.
+#
+_readable_regions = {}
+_mapping_re = re.compile(r'^\s*(0x[0-9a-fA-F]+)\s+(0x[0-9a-fA-F]+)\s+0x[0-9a-fA-F]+\s+0x[0-9a-fA-F]+(?:\s+([r-][w-][x-][ps]))?')
+_section_re = re.compile(r'^\s*(0x[0-9a-fA-F]+) - (0x[0-9a-fA-F]+) is ')
+
+
+def _execute_quietly(cmd):
+    try:
+        return gdb.execute(cmd, False, True)
+    except gdb.error:
+        return ''
+
+
+def _load_readable_regions():
+    ranges = []
+    for line in _execute_quietly('info proc mappings').splitlines():
+        m = _mapping_re.match(line)
+        if m and (m.group(3) is None or m.group(3)[0] == 'r'):
+            ranges.append((int(m.group(1), 16), int(m.group(2), 16)))
+    targets = _execute_quietly('info files')
+    if 'core dump' in targets:
+        for line in targets.splitlines():
+            m = _section_re.match(line)
+            if m:
+                ranges.append((int(m.group(1), 16), int(m.group(2), 16)))
+    if not ranges:
+        return None
+    # merge overlapping and adjacent ranges
+    starts, ends = [], []
+    for start, end in sorted(ranges):
+        if ends and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def readable_regions():
+    """
+    Return the readable memory regions of the selected inferior, as sorted lists (starts, ends)
+    of disjoint address ranges; or None if they are unknown (e.g. on remote targets without
+    /proc). The result is cached until the next stop.
+    """
+    if _snapshot_replay:
+        return _snapshot_replay[0].regions()
+    num = gdb.selected_inferior().num
+    if num not in _readable_regions:
+        _readable_regions[num] = _load_readable_regions()
+    return _readable_regions[num]
+
+
+def _find_region(regions, addr):
+    starts, ends = regions
+    i = bisect.bisect_right(starts, addr) - 1
+    if i >= 0 and addr < ends[i]:
+        return starts[i], ends[i]
+    return None
+
+
+def is_readable(addr, size=1):
+    """
+    Check if `size` bytes of inferior memory at address `addr` can be read.
+    """
+    if addr <= 0:
+        return False
+    regions = readable_regions()
+    if regions is not None:
+        region = _find_region(regions, addr)
+        return region is not None and addr + size <= region[1]
+    # probe through the read-ahead cache, so that the read also serves the printer next
+    try:
+        read_memory(addr, size)
+    except gdb.MemoryError:
+        return False
+    return True
+
+
+#
+# Read-ahead cache.
+#
+# Inferior memory is fetched in aligned blocks of options['read_ahead_bytes'] bytes,
+# clipped to the enclosing readable region. Walking a contiguous container then costs
+# one read (one remote packet, against gdbserver) per block rather than per element.
+# Blocks are kept until the inferior stops again, or its memory is written to.
+#
+_read_cache = dict()
+_max_read_cache_blocks = 4096
+
+
+def _read_block(block_addr, addr):
+    entry = _read_cache.get(block_addr)
+    if entry is None or not entry[0] <= addr < entry[0] + len(entry[1]):
+        lo, hi = block_addr, block_addr + options['read_ahead_bytes']
+        regions = readable_regions()
+        region = _find_region(regions, addr) if regions is not None else None
+        if region is not None:
+            lo, hi = max(lo, region[0]), min(hi, region[1])
+        try:
+            data = _inferior_read(lo, hi - lo)
+        except gdb.MemoryError:
+            lo, data = addr, b''
+        if len(_read_cache) >= _max_read_cache_blocks:
+            _read_cache.clear()
+        entry = _read_cache[block_addr] = (lo, data)
+    return entry
+
+
+def read_memory(addr, size):
+    """
+    Read `size` bytes of inferior memory at address `addr` into a python byte string.
+    """
+    block = options['read_ahead_bytes']
+    if block <= 0:
+        return _inferior_read(addr, size)
+    chunks = []
+    pos, end = addr, addr + size
+    while pos < end:
+        block_addr = pos - pos % block
+        lo, data = _read_block(block_addr, pos)
+        chunk = data[pos - lo:min(end, block_addr + block) - lo]
+        if not chunk:
+            # not readable as a block: let gdb read (or fail to read) exactly what was asked
+            return _inferior_read(addr, size)
+        chunks.append(chunk)
+        pos += len(chunk)
+    return b''.join(chunks)
+
+
+#
+# Memory snapshots (boost-snapshot).
+#
+# All inferior memory reads made by the package go through _inferior_read(); while
+# recording, it saves every range read in a Snapshot. gdb's own reads cannot be seen
+# from python, so the values gdb fetches lazily are saved as they reach the package:
+# every value handed to the printers (which includes the children gdb prints), and
+# every element gdb reads for element_reader(), with its type, goes through
+# record_value(). A saved snapshot can then be replayed: _inferior_read() serves
+# reads from it instead of the inferior.
+#
+_type_code_names = dict((getattr(gdb, name), name) for name in dir(gdb) if name.startswith('TYPE_CODE_'))
+_snapshot_recording = []
+_snapshot_replay = []
+
+
+class Snapshot(object):
+    """
+    Memory ranges and type metadata recorded while printing.
+
+    `memory` maps start addresses to byte strings; `types` maps type names to dicts
+    describing them (code, sizeof, fields, target, template arguments, ...); `lookups`
+    maps the names passed to lookup_type() to the names of the types found; `values`
+    maps captured expressions to [address, type name]; `prints` is a list of
+    (expression, output) pairs.
+    """
+    magic = b'BOOST-SNAPSHOT 1\n'
+    max_types = 10000
+
+    def __init__(self):
+        self.memory = dict()
+        self.types = dict()
+        self.lookups = dict()
+        self.values = dict()
+        self.prints = []
+        self.byte_order = None
+        self.pointer_size = None
+        self._regions = None
+        self._merged = None
+
+    def add_memory(self, addr, data):
+        if len(data) > len(self.memory.get(addr, b'')):
+            self.memory[addr] = data
+            self._regions = self._merged = None
+
+    def add_value(self, value):
+        self.add_type(value.type)
+        if value.address is not None and value.type.sizeof > 0:
+            try:
+                self.add_memory(intptr(value.address), _inferior_read(intptr(value.address), value.type.sizeof))
+            except gdb.MemoryError:
+                pass
+
+    def add_lookup(self, name, t):
+        self.add_type(t)
+        if name != str(t):
+            self.lookups[name] = str(t)
+
+    def add_type(self, t):
+        pending = [t]
+        while pending and len(self.types) < self.max_types:
+            t = pending.pop()
+            name = str(t)
+            if name in self.types:
+                continue
+            entry = self.types[name] = {'code': _type_code_names.get(t.code), 'sizeof': t.sizeof,
+                                        'name': t.name, 'tag': t.tag}
+            qualified = t.unqualified()
+            if str(qualified) != name:
+                entry['unqualified'] = str(qualified)
+                entry['const'] = t in (qualified.const(), qualified.const().volatile())
+                entry['volatile'] = t in (qualified.volatile(), qualified.const().volatile())
+                pending.append(qualified)
+                continue
+            if t.code == gdb.TYPE_CODE_TYPEDEF:
+                entry['target'] = str(t.strip_typedefs())
+                pending.append(t.strip_typedefs())
+            elif t.code in (gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_REF, gdb.TYPE_CODE_ARRAY):
+                entry['target'] = str(t.target())
+                pending.append(t.target())
+                if t.code == gdb.TYPE_CODE_ARRAY:
+                    entry['range'] = list(t.range())
+            if t.code in (gdb.TYPE_CODE_STRUCT, gdb.TYPE_CODE_UNION, gdb.TYPE_CODE_ENUM):
+                entry['fields'] = []
+                for field in t.fields():
+                    entry['fields'].append({
+                        'name': field.name,
+                        'type': str(field.type) if field.type is not None else None,
+                        'bitpos': getattr(field, 'bitpos', None),
+                        'enumval': getattr(field, 'enumval', None),
+                        'bitsize': field.bitsize,
+                        'is_base_class': field.is_base_class,
+                        'artificial': field.artificial})
+                    if field.type is not None:
+                        pending.append(field.type)
+                entry['template_args'] = []
+                for i in itertools.count():
+                    try:
+                        arg = t.template_argument(i)
+                    except (RuntimeError, gdb.error):
+                        break
+                    if isinstance(arg, gdb.Type):
+                        entry['template_args'].append({'type': str(arg)})
+                        pending.append(arg)
+                    else:
+                        entry['template_args'].append({'value': str(arg), 'type': str(arg.type)})
+
+    def regions(self):
+        """
+        Return the recorded ranges as sorted lists (starts, ends), like readable_regions().
+        """
+        if self._regions is None:
+            starts, ends = [], []
+            for start in sorted(self.memory):
+                end = start + len(self.memory[start])
+                if ends and start <= ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self._regions = starts, ends
+        return self._regions
+
+    def merged_memory(self):
+        """
+        Return the recorded memory as a sorted list of disjoint (start, bytes) ranges.
+        """
+        ranges = []
+        for start in sorted(self.memory):
+            data = self.memory[start]
+            if ranges and start <= ranges[-1][0] + len(ranges[-1][1]):
+                prev_start, prev_data = ranges[-1]
+                overlap = prev_start + len(prev_data) - start
+                ranges[-1] = (prev_start, prev_data + data[overlap:])
+            else:
+                ranges.append((start, data))
+        return ranges
+
+    def read(self, addr, size):
+        """
+        Read `size` recorded bytes at address `addr`; raises gdb.MemoryError if they were not recorded.
+        """
+        region = _find_region(self.regions(), addr)
+        if region is None or addr + size > region[1]:
+            raise gdb.MemoryError('Cannot access memory at address 0x{:x} (not in snapshot)'.format(addr))
+        if self._merged is None:
+            self._merged = self.merged_memory()
+            self._merged_starts = [start for start, _ in self._merged]
+        start, data = self._merged[bisect.bisect_right(self._merged_starts, addr) - 1]
+        return data[addr - start:addr - start + size]
+
+    def save(self, path):
+        ranges = self.merged_memory()
+        header = {'byte_order': self.byte_order, 'pointer_size': self.pointer_size,
+                  'memory': [[start, len(data)] for start, data in ranges],
+                  'types': self.types, 'lookups': self.lookups, 'values': self.values,
+                  'prints': self.prints}
+        payload = json.dumps(header).encode('utf-8') + b'\n' + b''.join(data for _, data in ranges)
+        with open(path, 'wb') as f:
+            f.write(self.magic + zlib.compress(payload))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            content = f.read()
+        if not content.startswith(cls.magic):
+            raise ValueError('not a boost snapshot: ' + path)
+        payload = zlib.decompress(content[len(cls.magic):])
+        header_end = payload.index(b'\n')
+        header = json.loads(payload[:header_end].decode('utf-8'))
+        snapshot = cls()
+        snapshot.byte_order = header['byte_order']
+        snapshot.pointer_size = header['pointer_size']
+        snapshot.types = header['types']
+        snapshot.lookups = header.get('lookups', dict())
+        snapshot.values = header.get('values', dict())
+        snapshot.prints = [tuple(p) for p in header['prints']]
+        pos = header_end + 1
+        for start, length in header['memory']:
+            snapshot.memory[start] = payload[pos:pos + length]
+            pos += length
+        return snapshot
+
+
+def _inferior_read(addr, size):
+    if _snapshot_replay:
+        return _snapshot_replay[0].read(addr, size)
+    data = bytes(gdb.selected_inferior().read_memory(addr, size))
+    if _snapshot_recording:
+        _snapshot_recording[0].add_memory(addr, data)
+    return data
+
+
+def record_value(value):
+    """
+    Save the memory and type of a value read by gdb while recording; return the value.
+    """
+    if _snapshot_recording:
+        _snapshot_recording[0].add_value(value)
+    return value
+
+
+class snapshot_cmd(gdb.Command):
+    """Record the memory read by the printers, and replay it later.
+
+Usage: boost-snapshot record
+       boost-snapshot save FILE
+       boost-snapshot capture FILE EXPRESSION
+       boost-snapshot replay [FILE]
+       boost-snapshot show FILE
+
+record starts recording all the memory read by the package (printers and
+commands), along with the memory and type metadata of the values gdb reads
+for them; save stops recording
+and writes everything to a compressed FILE. capture records while printing
+EXPRESSION, then saves FILE, keeping the printed output and the address and
+type of EXPRESSION as well (tests/benchmark.py prints it again). replay FILE
+serves the printers' memory reads from FILE instead of the inferior (values
+read by gdb itself still come from the inferior); replay without FILE stops
+replaying. show lists the outputs captured in FILE."""
+
+    usage = 'usage: boost-snapshot record | save FILE | capture FILE EXPRESSION | replay [FILE] | show FILE'
+
+    def __init__(self):
+        super(snapshot_cmd, self).__init__('boost-snapshot', gdb.COMMAND_DATA, gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        args = arg.split(None, 2)
+        if not args:
+            raise gdb.GdbError(self.usage)
+        if args[0] == 'record' and len(args) == 1:
+            self.record()
+        elif args[0] == 'save' and len(args) == 2:
+            self.save(args[1])
+        elif args[0] == 'capture' and len(args) == 3:
+            self.record()
+            try:
+                value = gdb.parse_and_eval(args[2])
+                output = gdb.execute('print ' + args[2], False, True)
+            except gdb.error:
+                del _snapshot_recording[:]
+                raise
+            gdb.write(output)
+            snapshot = _snapshot_recording[0]
+            snapshot.add_value(value)
+            if value.address is not None:
+                snapshot.values[args[2]] = [intptr(value.address), str(value.type)]
+            snapshot.prints.append((args[2], output))
+            self.save(args[1])
+        elif args[0] == 'replay' and len(args) <= 2:
+            del _snapshot_replay[:]
+            if len(args) == 2:
+                _snapshot_replay.append(self.load(args[1]))
+            clear_inferior_caches()
+        elif args[0] == 'show' and len(args) == 2:
+            for expression, output in self.load(args[1]).prints:
+                gdb.write('{}: {}'.format(expression, output))
+        else:
+            raise gdb.GdbError(self.usage)
+
+    @staticmethod
+    def record():
+        del _snapshot_recording[:]
+        _snapshot_recording.append(Snapshot())
+        # blocks read before recording started would not be recorded
+        clear_inferior_caches()
+
+    @staticmethod
+    def save(path):
+        if not _snapshot_recording:
+            raise gdb.GdbError('boost-snapshot: not recording')
+        snapshot = _snapshot_recording.pop()
+        snapshot.byte_order = target_byte_order()
+        snapshot.pointer_size = pointer_size()
+        for name in ('void', 'char', 'int', 'long', 'unsigned long', 'size_t'):
+            try:
+                t = lookup_type(name)
+            except gdb.error:
+                continue
+            snapshot.add_type(t)
+            snapshot.add_type(t.pointer())
+        snapshot.save(path)
+
+    @staticmethod
+    def load(path):
+        try:
+            return Snapshot.load(path)
+        except (IOError, OSError, ValueError, zlib.error) as e:
+            raise gdb.GdbError('boost-snapshot: cannot load {}: {}'.format(path, e))
+
+
+_snapshot = snapshot_cmd()
+
+
+_scalar_type_codes = (gdb.TYPE_CODE_INT, gdb.TYPE_CODE_CHAR, gdb.TYPE_CODE_BOOL, gdb.TYPE_CODE_ENUM,
+                      gdb.TYPE_CODE_FLT, gdb.TYPE_CODE_PTR)
+_plain_data_types = dict()
+_value_from_buffer = []
+
+
+def is_plain_data(t):
+    """
+    Check if type `t` is a scalar, or a struct (or array) made only of scalars. Values of
+    such types print the same whether or not they know their address.
+    """
+    t = t.strip_typedefs()
+    if t.code in _scalar_type_codes:
+        return True
+    if t.code == gdb.TYPE_CODE_ARRAY:
+        return is_plain_data(t.target())
+    if t.code != gdb.TYPE_CODE_STRUCT:
+        return False
+    name = str(t)
+    if name not in _plain_data_types:
+        _plain_data_types[name] = all(is_plain_data(f.type) for f in t.fields() if hasattr(f, 'bitpos'))
+    return _plain_data_types[name]
+
+
+def value_from_buffer_supported():
+    """
+    Check if this gdb can build a gdb.Value from a buffer and a type.
+    """
+    if not _value_from_buffer:
+        try:
+            gdb.Value(b'\0', lookup_type('char'))
+            _value_from_buffer.append(True)
+        except TypeError:
+            _value_from_buffer.append(False)
+    return _value_from_buffer[0]
+
+
+def element_reader(ptr):
+    """
+    Return a function mapping an index `idx` to the value `ptr[idx]`, for a gdb.Value pointer `ptr`.
+
+    Elements of plain data type are decoded from the read-ahead cache, so that consecutive
+    elements do not cost one memory read each. Other elements are read by gdb.
+    """
+    ptr_type = ptr.type.strip_typedefs()
+    if (options['read_ahead_bytes'] <= 0 or ptr_type.code != gdb.TYPE_CODE_PTR
+            or not is_plain_data(ptr_type.target()) or not value_from_buffer_supported()):
+        if _snapshot_recording:
+            return lambda idx: record_value((ptr + idx).dereference())
+        return lambda idx: (ptr + idx).dereference()
+    elem_type = ptr_type.target()
+    base = intptr(ptr)
+    size = elem_type.sizeof
+    return lambda idx: gdb.Value(read_memory(base + idx * size, size), elem_type)
+
+
+#
+# Access plans.
+#
+# A printer resolves the byte offsets and types of the fields it needs once per
+# type, into an Access_Plan kept in a type_cache(). Each value of that type is then
+# decoded from a single read of its memory, instead of one gdb.Value field lookup
+# per field and per value.
+#
+class Access_Plan(object):
+    """
+    Byte offsets and types of some fields of a gdb.Type.
+
+    `fields` is a list of (name, path) or (name, path, type) tuples, where `path` is a
+    tuple of field names (as for field_offset()), and `type`, if given, overrides the
+    type of the field, e.g. to view raw storage as the object it holds. Any further
+    keyword arguments are saved as attributes of the plan.
+    """
+    def __init__(self, t, fields, **attrs):
+        self.fields = dict()
+        self.scalars = []
+        for field in fields:
+            name, path = field[0], field[1]
+            offset, field_type = field_offset(t, *path)
+            field_type = field[2] if len(field) > 2 else get_basic_type(field_type)
+            self.fields[name] = (path, offset, field_type)
+            if (field_type.strip_typedefs().code in _scalar_type_codes
+                    and field_type.strip_typedefs().code != gdb.TYPE_CODE_FLT
+                    and field_type.sizeof in _uint_formats):
+                self.scalars.append((name, offset, _uint_formats[field_type.sizeof]))
+        # the scalar fields are read in one go, from the smallest span holding them all
+        self.lo = min([offset for _, offset, _ in self.scalars] or [0])
+        self.hi = max([offset + struct.calcsize(fmt) for _, offset, fmt in self.scalars] or [0])
+        for name, attr in attrs.items():
+            setattr(self, name, attr)
+
+    def offset(self, name):
+        return self.fields[name][1]
+
+    def type(self, name):
+        return self.fields[name][2]
+
+    def read(self, value):
+        """
+        Return a dict mapping the name of each integer, enum and pointer field of
+        gdb.Value `value` to its value, as a python int.
+        """
+        if value.address is None:
+            return dict((name, int(self._follow(value, self.fields[name][0])))
+                        for name, _, _ in self.scalars)
+        data = read_memory(intptr(value.address) + self.lo, self.hi - self.lo)
+        order = target_byte_order()
+        return dict((name, struct.unpack_from(order + fmt, data, offset - self.lo)[0])
+                    for name, offset, fmt in self.scalars)
+
+    def field(self, value, name):
+        """
+        Return field `name` of gdb.Value `value`, as a gdb.Value of the planned type.
+        """
+        path, offset, field_type = self.fields[name]
+        if value.address is None:
+            field = self._follow(value, path)
+            return field if get_basic_type(field.type) == field_type else reinterpret_cast(field, field_type)
+        return gdb.Value(intptr(value.address) + offset).cast(field_type.pointer()).dereference()
+
+    @staticmethod
+    def _follow(value, path):
+        for name in path:
+            value = value[name]
+        return value
+
+
+def access_plan(plans, t, build):
+    """
+    Return the Access_Plan of gdb.Type `t` cached in `plans` (a type_cache()),
+    calling `build(t)` to make it on first use.
+    """
+    key = str(t)
+    plan = plans.get(key)
+    if plan is None:
+        plan = plans[key] = build(t)
+    return plan
+
+
+#
+# Raw iteration over container elements, for scripts.
+#
+# iter_addresses() and iter_items() walk a container with its printer's traversal
+# logic, but produce element addresses (python ints) or decoded python values,
+# without building labels or gdb.Value objects. Printers take part through the
+# optional element_spans() (contiguous containers) and element_addresses() hooks;
+# others are walked through children().
+#
+def pointer_spans(ptr, *ranges):
+    """
+    Return (element type, spans) for the elements of pointer gdb.Value `ptr` in `ranges`,
+    a list of (first index, count) pairs; spans are (address, count) pairs.
+
+    Returns None if `ptr` is not a raw pointer.
+    """
+    ptr_type = ptr.type.strip_typedefs()
+    if ptr_type.code != gdb.TYPE_CODE_PTR:
+        return None
+    elem_type = ptr_type.target()
+    base, size = intptr(ptr), elem_type.sizeof
+    return elem_type, [(base + first * size, count) for first, count in ranges if count > 0]
+
+
+def element_spans(value):
+    """
+    Return (element type, list of (address, count) spans) for contiguous container gdb.Value
+    `value`, or None if its printer does not know where its elements are stored.
+    """
+    p = gdb.default_visualizer(value)
+    if p is None or not hasattr(p, 'element_spans'):
+        return None
+    return p.element_spans()
+
+
+def element_addresses(value):
+    """
+    Return (element type, iterator over element addresses) for container gdb.Value `value`.
+
+    The element type is None for an empty container walked through children().
+    Raises TypeError if `value` has no printer, or if its elements have no address.
+    """
+    p = gdb.default_visualizer(value)
+    if p is None:
+        raise TypeError('no printer for type [' + str(value.type) + ']')
+    spans = p.element_spans() if hasattr(p, 'element_spans') else None
+    if spans is not None:
+        elem_type, spans = spans
+        size = elem_type.sizeof
+        return elem_type, (addr + idx * size for addr, count in spans for idx in xrange(count))
+    if hasattr(p, 'element_addresses'):
+        result = p.element_addresses()
+        if result is not None:
+            return result
+    if not hasattr(p, 'children'):
+        raise TypeError('printer for type [' + str(value.type) + '] has no children() function')
+    if hasattr(p, 'display_hint') and p.display_hint() == 'map':
+        raise TypeError('elements of type [' + str(value.type) + '] have no single address')
+    children = iter(unbudgeted_children(p))
+    first = next(children, None)
+    if first is None:
+        return None, iter([])
+
+    def address(elem):
+        if not isinstance(elem, gdb.Value) or elem.address is None:
+            raise TypeError('element of type [' + str(value.type) + '] has no address')
+        return intptr(elem.address)
+    first_address = address(first[1])
+    return first[1].type, itertools.chain([first_address], (address(elem) for _, elem in children))
+
+
+def iter_addresses(value):
+    """
+    Iterate over the addresses (python ints) of the elements of container gdb.Value `value`.
+    Raises gdb.error after the last address read if the walk over a corrupt container stopped early.
+    """
+    return element_addresses(value)[1]
+
+
+def _scalar_format(t):
+    t = t.strip_typedefs()
+    if t.code == gdb.TYPE_CODE_FLT:
+        return {4: 'f', 8: 'd'}.get(t.sizeof)
+    if t.code not in _scalar_type_codes or t.sizeof not in _uint_formats:
+        return None
+    fmt = _uint_formats[t.sizeof]
+    if t.code == gdb.TYPE_CODE_BOOL:
+        return '?' if t.sizeof == 1 else fmt
+    if t.code in (gdb.TYPE_CODE_INT, gdb.TYPE_CODE_CHAR, gdb.TYPE_CODE_ENUM):
+        signed = t.is_signed if hasattr(t, 'is_signed') else 'unsigned' not in str(t)
+        if signed:
+            fmt = fmt.lower()
+    return fmt
+
+
+def iter_items(value, decode=None):
+    """
+    Iterate over the elements of container gdb.Value `value`, decoded into python values.
+
+    `decode` is either a function mapping the raw bytes of an element to a python value,
+    or a struct module format string (without byte order), e.g. 'i' or 'qd': elements are
+    then decoded to a single value, or to a tuple of several. By default, scalar elements
+    are decoded to python numbers (and bools), and other elements are produced as gdb.Value.
+    """
+    elem_type, addresses = element_addresses(value)
+    if elem_type is None:
+        return iter([])
+    size = elem_type.sizeof
+    if decode is None:
+        decode = _scalar_format(elem_type)
+        if decode is None:
+            elem_ptr_type = elem_type.pointer()
+            return (gdb.Value(addr).cast(elem_ptr_type).dereference() for addr in addresses)
+    if not callable(decode):
+        fmt = struct.Struct(target_byte_order() + decode)
+        if len(fmt.unpack(bytes(bytearray(fmt.size)))) == 1:
+            decode = lambda data: fmt.unpack_from(data)[0]
+        else:
+            decode = fmt.unpack_from
+    return (decode(read_memory(addr, size)) for addr in addresses)
+
+
+#
+# Export of contiguous containers to NumPy .npy files (boost-export).
+#
+def numpy_descr(t):
+    """
+    Return the NumPy type description (as found in .npy headers) of gdb.Type `t`:
+    a type string such as '<i4' for scalars, or a list of (name, description[, shape])
+    fields for structs of scalars, with unnamed void fields for padding. Returns None
+    if `t` cannot be described.
+    """
+    t = get_basic_type(t)
+    order = target_byte_order() if t.sizeof > 1 else '|'
+    if t.code == gdb.TYPE_CODE_FLT:
+        return order + 'f' + str(t.sizeof) if t.sizeof in (2, 4, 8) else None
+    if t.code == gdb.TYPE_CODE_BOOL:
+        return '|b1' if t.sizeof == 1 else None
+    if t.code in (gdb.TYPE_CODE_INT, gdb.TYPE_CODE_CHAR, gdb.TYPE_CODE_ENUM):
+        if t.sizeof not in _uint_formats:
+            return None
+        return order + ('i' if _scalar_format(t).islower() else 'u') + str(t.sizeof)
+    if t.code != gdb.TYPE_CODE_STRUCT:
+        return None
+    fields, pos = [], 0
+    for field in t.fields():
+        if not hasattr(field, 'bitpos') or (field.is_base_class and not get_basic_type(field.type).fields()):
+            # static members and empty bases take no space
+            continue
+        if field.bitsize or field.bitpos % 8:
+            return None
+        offset = field.bitpos // 8
+        field_type, shape = get_basic_type(field.type), []
+        while field_type.code == gdb.TYPE_CODE_ARRAY:
+            low, high = field_type.range()
+            shape.append(high - low + 1)
+            field_type = get_basic_type(field_type.target())
+        descr = numpy_descr(field_type)
+        if descr is None or offset < pos:
+            return None
+        if offset > pos:
+            fields.append(('', '|V' + str(offset - pos)))
+        name = field.name if not field.is_base_class else str(field_type)
+        fields.append((name, descr, tuple(shape)) if shape else (name, descr))
+        pos = offset + field.type.sizeof
+    if pos < t.sizeof:
+        fields.append(('', '|V' + str(t.sizeof - pos)))
+    return fields
+
+
+def npy_header(descr, count):
+    """
+    Return the header of a version 1.0 .npy file holding a 1-dimensional array of
+    `count` elements described by `descr` (see numpy_descr()).
+    """
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(descr, count)
+    # magic, version, header length, then the header, padded to a multiple of 64 bytes
+    header_len = len(header) + 1
+    header += ' ' * (-(10 + header_len) % 64) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin-1')
+
+
+class export_cmd(gdb.Command):
+    """Write the elements of a contiguous container to a file.
+
+Usage: boost-export [-raw] EXPRESSION FILE
+
+Without -raw, FILE is written in NumPy's .npy format, as a 1-dimensional array
+whose dtype is built from the element type: arithmetic types, and structs and
+arrays of them, are supported. With -raw, only the element bytes are written.
+Works with boost::array, iterator_range over pointers, circular_buffer,
+small_vector, static_vector, flat_set and flat_map. The memory is copied to
+the file in chunks, without decoding the elements."""
+
+    chunk_size = 1 << 24
+
+    def __init__(self):
+        super(export_cmd, self).__init__('boost-export', gdb.COMMAND_DATA, gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        raw = arg.startswith('-raw')
+        if raw:
+            arg = arg[len('-raw'):]
+        args = arg.strip().rsplit(None, 1)
+        if len(args) < 2:
+            raise gdb.GdbError('usage: boost-export [-raw] EXPRESSION FILE')
+        v = parse_and_eval(args[0])
+        spans = element_spans(v)
+        if spans is None:
+            raise gdb.GdbError('boost-export: not a contiguous container: ' + str(v.type))
+        elem_type, spans = spans
+        count = sum(span_count for _, span_count in spans)
+        if not raw:
+            descr = numpy_descr(elem_type)
+            if descr is None:
+                raise gdb.GdbError('boost-export: element type not supported: ' + str(elem_type))
+        with open(args[1], 'wb') as f:
+            if not raw:
+                f.write(npy_header(descr, count))
+            for addr, span_count in spans:
+                end = addr + span_count * elem_type.sizeof
+                while addr < end:
+                    size = min(self.chunk_size, end - addr)
+                    f.write(read_memory(addr, size))
+                    addr += size
+        if from_tty:
+            gdb.write('{} elements of type {} written to {}\n'.format(count, elem_type, args[1]))
+
+
+_export = export_cmd()
+
+
+def clear_inferior_caches(event=None):
+    """
+    Forget everything cached about inferior memory. Called whenever the inferior stops, when
+    its memory is written to, when object files are loaded or unloaded, and when it exits.
+
+    Resuming does not clear the caches: the printers of intrusive containers make inferior
+    calls for every node, and these must not discard the regions and blocks read for the
+    same print. A successful inferior call does not report a stop.
+    """
+    _readable_regions.clear()
+    _read_cache.clear()
+
+
+if hasattr(gdb, 'events'):
+    gdb.events.stop.connect(clear_inferior_caches)
+    for _event_name in ('memory_changed', 'new_objfile', 'clear_objfiles', 'exited'):
+        if hasattr(gdb.events, _event_name):
+            getattr(gdb.events, _event_name).connect(clear_inferior_caches)
+
+
+#
+# Caches of gdb.Type objects. Types belong to object files, so these caches
+# are emptied whenever object files are loaded or unloaded.
+#
+_type_caches = []
+
+
+def type_cache():
+    """
+    Return a new dict for caching gdb.Type objects, emptied when object files change.
+    """
+    cache = dict()
+    _type_caches.append(cache)
+    return cache
+
+
+def clear_type_caches(event=None):
+    for cache in _type_caches:
+        cache.clear()
+
+
+if hasattr(gdb, 'events'):
+    for _event_name in ('new_objfile', 'clear_objfiles'):
+        if hasattr(gdb.events, _event_name):
+            getattr(gdb.events, _event_name).connect(clear_type_caches)
+
+
+#
+# Background prefetch (enabled by options['prefetch']).
+#
+# Printers remember which values they printed at each stop location (pc). When the
+# inferior stops at that location again, the children of those values are walked
+# ahead of time, filling the read-ahead cache (and the children cache, when enabled),
+# so that printing them is immediate. The bytes of each child are read through the
+# read-ahead cache too, for the printers and element readers that decode them from it.
+#
+# The gdb API may only be used from gdb's main thread, so the walk runs in
+# gdb.post_event callbacks of at most _prefetch_chunk_ms milliseconds each, which
+# reschedule themselves: gdb handles user input between two chunks, and the walk
+# stops as soon as the inferior resumes (but not for the inferior calls the printers
+# make while walking).
+#
+_printed_at = collections.OrderedDict()
+_max_printed_per_pc = 16
+_max_printed_pcs = 256
+_prefetch_chunk_ms = 20
+_prefetch = []
+_inferior_calls = []
+
+
+def _selected_pc():
+    try:
+        return gdb.selected_frame().pc()
+    except gdb.error:
+        return None
+
+
+def remember_printed(value):
+    """
+    Remember that `value` was printed at the current stop location.
+    """
+    pc = _selected_pc()
+    if pc is None or value.address is None:
+        return
+    printed = _printed_at.pop(pc, None) or collections.OrderedDict()
+    _printed_at[pc] = printed
+    while len(_printed_at) > _max_printed_pcs:
+        _printed_at.popitem(last=False)
+    printed[(intptr(value.address), str(value.type))] = value.type
+    while len(printed) > _max_printed_per_pc:
+        printed.popitem(last=False)
+
+
+class Prefetch(object):
+    """
+    Prefetch run started at a stop, walking the children of previously printed values.
+    """
+    def __init__(self, targets):
+        self.targets = list(targets)
+        self.children = None
+        self.cancelled = False
+
+    def start(self):
+        gdb.post_event(self.step)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def next_children(self):
+        """
+        Return an iterator over the children of the next target, None if there are no more.
+        """
+        while self.targets:
+            (addr, _), t = self.targets.pop(0)
+            value = gdb.Value(addr).cast(t.pointer()).dereference()
+            p = gdb.default_visualizer(value)
+            if p is not None and hasattr(p, 'children'):
+                # walk as many children as `print` would show; 0 or None mean unlimited
+                limit = gdb.parameter('print elements') or None
+                return itertools.islice(p.children(), limit)
+        return None
+
+    def step(self):
+        # runs on gdb's main thread
+        if self.cancelled:
+            return
+        deadline = time.time() + _prefetch_chunk_ms / 1000.0
+        try:
+            while time.time() < deadline:
+                if self.children is None:
+                    self.children = self.next_children()
+                    if self.children is None:
+                        return
+                child = next(self.children, None)
+                if child is None:
+                    self.children = None
+                elif isinstance(child[1], gdb.Value):
+                    if child[1].address is not None:
+                        read_memory(intptr(child[1].address), child[1].type.sizeof)
+                    if options['children_cache']:
+                        # the value is replayed from the children cache: fetch it now
+                        child[1].fetch_lazy()
+        except gdb.error:
+            # unreadable or invalid value: skip the rest of it
+            self.children = None
+        gdb.post_event(self.step)
+
+
+def cancel_prefetch(event=None):
+    """
+    Stop the running prefetch, if any. Called when the inferior resumes, except for the
+    inferior calls made by printers (e.g. those of intrusive containers), during which
+    the inferior stays stopped for the user.
+    """
+    if _inferior_calls and isinstance(event, getattr(gdb, 'ContinueEvent', ())):
+        return
+    while _prefetch:
+        _prefetch.pop().cancel()
+
+
+def track_inferior_call(event):
+    if isinstance(event, getattr(gdb, 'InferiorCallPreEvent', ())):
+        _inferior_calls.append(event.address)
+    elif _inferior_calls:
+        _inferior_calls.pop()
+
+
+def start_prefetch(event=None):
+    """
+    Start prefetching the values printed at the current stop location, if options['prefetch'] is set.
+    """
+    cancel_prefetch()
+    if not options['prefetch']:
+        return
+    targets = list(_printed_at.get(_selected_pc(), dict()).items())
+    if targets:
+        _prefetch.append(Prefetch(targets))
+        _prefetch[0].start()
+
+
+if hasattr(gdb, 'events') and hasattr(gdb, 'post_event'):
+    gdb.events.stop.connect(start_prefetch)
+    for _event_name in ('cont', 'exited'):
+        if hasattr(gdb.events, _event_name):
+            getattr(gdb.events, _event_name).connect(cancel_prefetch)
+    if hasattr(gdb.events, 'inferior_call'):
+        gdb.events.inferior_call.connect(track_inferior_call)
+
+
+#
+# Corruption-safe traversal.
+#
+# Node-based printers stop when they reach a sentinel (null, or the header node).
+# In a corrupt container (typically, in a core file), the sentinel may never be
+# reached. Printers feed the address of every node they are about to read to a
+# Traversal_Guard, and stop walking, printing truncation_marker(guard.reason), when
+# the guard trips. Address generators (see element_addresses) raise gdb.error instead,
+# so that scripts never get a silently truncated container.
+#
+class Traversal_Guard(object):
+    """
+    Stop a walk over linked nodes which loops, leaves readable memory, or exceeds
+    options['max_traversal_nodes'] nodes.
+
+    Loops are found with Brent's cycle detection on node addresses, in constant space.
+    """
+    def __init__(self, max_nodes=None):
+        self.max_nodes = max_nodes if max_nodes is not None else options['max_traversal_nodes']
+        self.count = 0
+        self.reason = None
+        self._saved = None
+        self._power = 1
+        self._steps = 0
+
+    def check(self, addr):
+        """
+        Check the address of the next node. Returns True if it is safe to read it;
+        otherwise, sets `reason` and returns False.
+        """
+        addr = int(addr)
+        if self.count >= self.max_nodes:
+            self.reason = 'more than {} nodes'.format(self.max_nodes)
+        elif addr == self._saved:
+            self.reason = 'cycle at node 0x{:x}'.format(addr)
+        elif not is_readable(addr):
+            self.reason = 'unreadable node 0x{:x}'.format(addr)
+        if self.reason is not None:
+            return False
+        self.count += 1
+        self._steps += 1
+        if self._steps == self._power:
+            self._saved = addr
+            self._power *= 2
+            self._steps = 0
+        return True
+
+
+def truncation_marker(reason):
+    """
+    Printable placeholder for the children which were not printed after a Traversal_Guard tripped.
+    """
+    return '<truncated: {}>'.format(reason)
+
+
+class Guarded_Children(object):
+    """
+    Iterator over `children`, followed by a truncation marker child if `guard` tripped.
+    Forwards the position and seek() of seekable children (see Children_Cursor).
+    """
+    def __init__(self, children, guard, labels=('[truncated]',)):
+        self.children = iter(children)
+        self.guard = guard
+        self.labels = labels
+        self.done = False
+        self._markers = []
+        if hasattr(self.children, 'seek'):
+            self.seek = self.children.seek
+
+    @property
+    def position(self):
+        return None if self.done else getattr(self.children, 'position', None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.done:
+            try:
+                return next(self.children)
+            except StopIteration:
+                self.done = True
+                if self.guard.reason is not None:
+                    # 'map' printers need a (key, value) pair of marker children
+                    self._markers = [(self.labels[0], truncation_marker(self.guard.reason))]
+                    self._markers += [(label, '...') for label in self.labels[1:]]
+        if not self._markers:
+            raise StopIteration
+        return self._markers.pop(0)
+
+    def next(self):
+        return self.__next__()
+
+
+def guarded_children(children, guard, labels=('[truncated]',)):
+    """
+    Iterator over `children`, followed by truncation marker children named `labels` if `guard` tripped.
+    """
+    return Guarded_Children(children, guard, labels)
+
+
+def guarded_addresses(addresses, guard):
+    """
+    Generator over `addresses`, raising gdb.error with the truncation marker if `guard` tripped.
+    """
+    for address in addresses:
+        yield address
+    if guard.reason is not None:
+        raise gdb.error('elements not all read, ' + truncation_marker(guard.reason))
+
+
+class Element_Children(object):
+    """
+    Iterator over the children of the elements produced by iterator `elements`, as lists
+    returned by make_children(index, element). Forwards the position and seek() of
+    seekable element iterators (see Children_Cursor).
+    """
+    def __init__(self, elements, make_children):
+        self.elements = iter(elements)
+        self.make_children = make_children
+        self.index = 0
+        self._pending = []
+
+    @property
+    def position(self):
+        return None if self._pending else getattr(self.elements, 'position', None)
+
+    def seek(self, position, index):
+        self.elements.seek(position, index)
+        self.index = index
+        self._pending = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._pending:
+            self._pending = list(self.make_children(self.index, next(self.elements)))
+            self.index += 1
+        return self._pending.pop(0)
+
+    def next(self):
+        return self.__next__()
+
+
+#
+# Print budgets (set boost print-budget-ms, set boost print-budget-elements) and
+# resumable cursors (boost-more).
+#
+# The printer generator replaces the children() method of every printer it returns
+# with a Budgeted_Children. Each walk goes through a Children_Cursor, which keeps the
+# printer's live children iterator and counts the elements produced; the walk stops
+# once it has run for options['print_budget_ms'] milliseconds or produced
+# options['print_budget_elements'] elements, and ends with a truncation marker.
+# The cursor of the last walk of each container in memory is kept until the inferior
+# stops again, so that boost-more continues where printing stopped (because of a
+# budget, or of "set print elements") without walking the elements before it again.
+# Code that needs all the elements, e.g. $at() and iter_items(), walks
+# unbudgeted_children() instead.
+#
+# The children of node-based printers can also be seekable: they have a `position`
+# attribute, an opaque description of where the next element is (e.g. a node address,
+# or None if unknown), and a seek(position, index) method, which makes a fresh
+# iterator start at the element number `index` found earlier at `position`. Walks over
+# seekable children record the position of every _checkpoint_interval-th element, per
+# container, until the inferior stops again and as long as the container header (its
+# own bytes) does not change; $at() and $slice() then start walking from the nearest
+# checkpoint. The header alone does not show every change (e.g. an erase followed by an
+# insert), so checkpoints are not kept across stops.
+#
+_cursors = collections.OrderedDict()
+_max_cursors = 64
+_checkpoints = collections.OrderedDict()
+_checkpoint_interval = 1024
+
+
+class Children_Cursor(object):
+    """
+    Position in a walk over the children of a printer. Elements are groups of
+    `per_element` children (2 for 'map' printers). Attributes:
+    - elements: the number of elements produced so far
+    - stopped_by: the budget that stopped the last walk, or None
+    """
+    def __init__(self, children, per_element, checkpoints=None, start=0):
+        self.it = iter(children)
+        self.per_element = per_element
+        self.checkpoints = checkpoints
+        self.elements = start
+        self.stopped_by = None
+        self._pending = []
+
+    def next_element(self):
+        """
+        Return the list of children of the next element without consuming it, or None at the end.
+        """
+        if not self._pending:
+            if (self.checkpoints is not None and self.elements % _checkpoint_interval == 0
+                    and self.elements not in self.checkpoints):
+                position = getattr(self.it, 'position', None)
+                if position is not None:
+                    self.checkpoints[self.elements] = position
+            self._pending = list(itertools.islice(self.it, self.per_element))
+        return self._pending or None
+
+    def advance(self):
+        self._pending = []
+        self.elements += 1
+
+
+def cursor_key(value, type_name=None):
+    """
+    Key of the cursor of container gdb.Value `value`, or None if it has no address.
+    """
+    if value.address is None:
+        return None
+    return intptr(value.address), type_name or str(get_basic_type(value.type))
+
+
+def header_fingerprint(value, key):
+    """
+    Return the bytes of container gdb.Value `value` saved under `key` (its size, begin/end or
+    first/last pointers, bucket array pointer, etc.), or None if they cannot be read.
+    """
+    try:
+        return read_memory(key[0], value.type.sizeof)
+    except gdb.MemoryError:
+        return None
+
+
+def container_checkpoints(value, key):
+    """
+    Return the dict of checkpoints (element index -> position) of container gdb.Value `value`,
+    saved under `key`; emptied first if the bytes of `value` changed since they were recorded.
+    """
+    fingerprint = header_fingerprint(value, key)
+    if fingerprint is None:
+        return None
+    entry = _checkpoints.pop(key, None)
+    if entry is None or entry[0] != fingerprint:
+        entry = (fingerprint, dict())
+    _checkpoints[key] = entry
+    while len(_checkpoints) > _max_cursors:
+        _checkpoints.popitem(last=False)
+    return entry[1]
+
+
+def per_element(p):
+    """
+    Number of children per element produced by printer `p`: 2 for 'map' printers, else 1.
+    """
+    return 2 if hasattr(p, 'display_hint') and p.display_hint() == 'map' else 1
+
+
+def seek_cursor(value, p, begin):
+    """
+    Return a Children_Cursor over the children of printer `p` for container gdb.Value `value`,
+    bypassing the print budgets. Random-access children start at element `begin`, other
+    seekable children from the nearest checkpoint at or before it, others from the first element.
+    """
+    children = unbudgeted_children(p)
+    if getattr(children, 'random_access', False):
+        children.seek(begin, begin)
+        return Children_Cursor(children, per_element(p), None, begin)
+    key = cursor_key(value)
+    checkpoints = container_checkpoints(value, key) if key is not None and hasattr(children, 'seek') else None
+    start = 0
+    if checkpoints:
+        start = max([idx for idx in checkpoints if idx <= begin] or [0])
+        if start:
+            children.seek(checkpoints[start], start)
+    return Children_Cursor(children, per_element(p), checkpoints, start)
+
+
+def iter_elements(value, p, begin=0):
+    """
+    Generator of (index, element) pairs for the elements of container gdb.Value `value` from
+    index `begin` on, walking the children of its printer `p` (elements of 'map' printers are
+    (key, value) pairs). Seekable children start from the nearest checkpoint before `begin`.
+    """
+    cursor = seek_cursor(value, p, begin)
+    while True:
+        element = cursor.next_element()
+        if element is None:
+            return
+        index = cursor.elements
+        cursor.advance()
+        if index >= begin:
+            yield index, (element[0][1], element[1][1]) if cursor.per_element == 2 else element[0][1]
+
+
+def budgeted_children(cursor, key=None, ms=None, max_elements=None):
+    """
+    Generator yielding the children of the next elements of `cursor`, until `max_elements`
+    elements were yielded or `ms` milliseconds passed (0 means no limit; None means the
+    print budget option). Sets cursor.stopped_by if stopped by a budget; forgets the cursor
+    saved under `key` when the walk is complete.
+    """
+    ms = options['print_budget_ms'] if ms is None else ms
+    max_elements = options['print_budget_elements'] if max_elements is None else max_elements
+    deadline = time.time() + ms / 1000.0 if ms else None
+    first = cursor.elements
+    cursor.stopped_by = None
+    while True:
+        element = cursor.next_element()
+        if element is None:
+            if key is not None and _cursors.get(key) is cursor:
+                del _cursors[key]
+            return
+        if max_elements and cursor.elements - first >= max_elements:
+            cursor.stopped_by = 'print-budget-elements is {}'.format(max_elements)
+        elif deadline is not None and time.time() > deadline:
+            cursor.stopped_by = 'print-budget-ms is {}'.format(ms)
+        if cursor.stopped_by is not None:
+            return
+        # if the caller stops before the last child of an element, that element is produced again
+        for child in element[:-1]:
+            yield child
+        cursor.advance()
+        yield element[-1]
+
+
+class Budgeted_Children(object):
+    """
+    Replacement for the children() method of a printer for gdb.Value `value`, enforcing
+    the print budgets and saving the position reached under `key` (see cursor_key()).
+    """
+    def __init__(self, printer, value, key):
+        self.printer = printer
+        self.value = value
+        self.key = key
+        self.unbudgeted = printer.children
+
+    def __call__(self):
+        if options['children_cache'] and self.key is not None:
+            children = cached_children(self.value, self.key, self.unbudgeted)
+        else:
+            children = self.unbudgeted()
+        checkpoints = None
+        if self.key is not None and hasattr(children, 'position') and not getattr(children, 'random_access', False):
+            checkpoints = container_checkpoints(self.value, self.key)
+        cursor = Children_Cursor(children, per_element(self.printer), checkpoints)
+        if self.key is not None:
+            _cursors.pop(self.key, None)
+            _cursors[self.key] = cursor
+            while len(_cursors) > _max_cursors:
+                _cursors.popitem(last=False)
+        return self.walk(cursor)
+
+    def walk(self, cursor):
+        for child in budgeted_children(cursor, self.key):
+            yield child
+        if cursor.stopped_by is not None:
+            reason = '{} elements printed, {}; boost-more continues'.format(cursor.elements, cursor.stopped_by)
+            yield '[truncated]', truncation_marker(reason)
+            if cursor.per_element == 2:
+                yield '[truncated]', '...'
+
+
+#
+# Ranged children, for front ends that page through the children of a variable
+# (gdb's DAP server, which calls num_children() and then child(n) for each child of
+# the requested page).
+#
+# The printer generator gives these two methods to the printers with the optional hook
+# element_count(), which report their number of children without walking them; front
+# ends list the children of other printers with children(), within the print budgets.
+# child(n) keeps a cursor over children(), so that it produces the same child names:
+# random-access children (e.g. Indexed_Children) seek to the element directly;
+# otherwise consecutive children come from the same walk, and a walk restarted for an
+# earlier child begins at the nearest checkpoint of seekable children. As with $at(),
+# the print budgets do not apply.
+#
+class Ranged_Children(object):
+    """
+    The num_children() and child(n) methods of a printer for container gdb.Value `value`.
+    """
+    def __init__(self, printer, value):
+        self.printer = printer
+        self.value = value
+        self.per_element = per_element(printer)
+        self.count = None
+        self.cursor = None
+
+    def num_children(self):
+        if self.count is None:
+            self.count = self.per_element * self.printer.element_count()
+        return self.count
+
+    def child(self, n):
+        idx, part = divmod(n, self.per_element)
+        if (self.cursor is None or self.cursor.elements > idx
+                or (self.cursor.elements < idx and getattr(self.cursor.it, 'random_access', False))):
+            self.cursor = seek_cursor(self.value, self.printer, idx)
+        cursor = self.cursor
+        while cursor.elements < idx and cursor.next_element() is not None:
+            cursor.advance()
+        element = cursor.next_element()
+        if element is None or part >= len(element):
+            raise IndexError('child ' + str(n) + ' out of range')
+        return element[part]
+
+
+class Indexed_Children(object):
+    """
+    Iterator over the children of elements 0 to `count` - 1 of a contiguous container, as lists
+    returned by make_children(idx). It is seekable (see Children_Cursor) in O(1): positions
+    are element indexes.
+    """
+    random_access = True
+
+    def __init__(self, count, make_children):
+        self.count = count
+        self.make_children = make_children
+        self.index = 0
+        self._pending = []
+
+    @property
+    def position(self):
+        return None if self._pending else self.index
+
+    def seek(self, position, index):
+        self.index = index
+        self._pending = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._pending:
+            if self.index >= self.count:
+                raise StopIteration
+            self._pending = list(self.make_children(self.index))
+            self.index += 1
+        return self._pending.pop(0)
+
+    def next(self):
+        return self.__next__()
+
+
+def unbudgeted_children(p):
+    """
+    Call the children() method of printer `p`, bypassing the print budgets.
+    """
+    children = p.children
+    return getattr(children, 'unbudgeted', children)()
+
+
+def clear_cursors(event=None):
+    _cursors.clear()
+
+
+def clear_checkpoints(event=None):
+    _checkpoints.clear()
+
+
+#
+# Children cache (set boost children-cache).
+#
+# The children produced when printing a container are kept across stops, for the
+# options['children_cache'] containers printed last, under the key of the container
+# (see cursor_key()). When the container is printed again and its own bytes (the
+# header fingerprint) did not change, the children are replayed from the cache, and
+# the printer only walks past the elements cached so far. Changes that leave the
+# header alone, e.g. assigning to an element of a flat_map, are not noticed: this is
+# why the cache is off by default.
+#
+_children_cache = collections.OrderedDict()
+
+
+class Cached_Walk(object):
+    """
+    The children produced so far by iterator `it` over the children of a container whose
+    header bytes were `fingerprint`.
+    """
+    def __init__(self, fingerprint, it):
+        self.fingerprint = fingerprint
+        self.it = it
+        self.children = []
+
+    def replay(self):
+        """
+        Generator yielding the cached children, then the rest of the children of `it`.
+        """
+        idx = 0
+        while True:
+            if idx == len(self.children):
+                if self.it is None:
+                    return
+                try:
+                    self.children.append(next(self.it))
+                except StopIteration:
+                    self.it = None
+                    return
+            yield self.children[idx]
+            idx += 1
+
+
+def cached_children(value, key, children):
+    """
+    Iterator over the children of container gdb.Value `value` saved under `key`, replayed
+    from the children cache if the header of `value` did not change; `children` is the
+    printer's (unbudgeted) children() method.
+    """
+    fingerprint = header_fingerprint(value, key)
+    if fingerprint is None:
+        return children()
+    walk = _children_cache.pop(key, None)
+    if walk is None or walk.fingerprint != fingerprint:
+        walk = Cached_Walk(fingerprint, iter(children()))
+    _children_cache[key] = walk
+    while len(_children_cache) > options['children_cache']:
+        _children_cache.popitem(last=False)
+    return walk.replay()
+
+
+def clear_children_cache(event=None):
+    _children_cache.clear()
+
+
+if hasattr(gdb, 'events'):
+    gdb.events.stop.connect(clear_cursors)
+    gdb.events.stop.connect(clear_checkpoints)
+    for _event_name in ('memory_changed', 'new_objfile', 'clear_objfiles', 'exited'):
+        if hasattr(gdb.events, _event_name):
+            getattr(gdb.events, _event_name).connect(clear_cursors)
+            getattr(gdb.events, _event_name).connect(clear_checkpoints)
+            getattr(gdb.events, _event_name).connect(clear_children_cache)
+
+
+class more_cmd(gdb.Command):
+    """Continue printing a container where the last print stopped.
+
+Usage: boost-more EXPRESSION
+
+Prints the next elements of the container EXPRESSION, starting after the last
+element printed by print (or by the previous boost-more), without walking the
+elements before it again. As many elements are printed as print would: the
+limits are "set boost print-budget-elements" and "set boost print-budget-ms",
+or else "set print elements". Positions are forgotten when the inferior stops."""
+
+    def __init__(self):
+        super(more_cmd, self).__init__('boost-more', gdb.COMMAND_DATA, gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        if not arg:
+            raise gdb.GdbError('usage: boost-more EXPRESSION')
+        value = gdb.parse_and_eval(arg)
+        p = gdb.default_visualizer(value)
+        key = cursor_key(value)
+        cursor = _cursors.get(key)
+        if p is None or key is None or cursor is None:
+            raise gdb.GdbError('boost-more: no unfinished print of ' + arg)
+        _cursors.pop(key)
+        _cursors[key] = cursor
+        ms, max_elements = options['print_budget_ms'], options['print_budget_elements']
+        if not ms and not max_elements:
+            max_elements = gdb.parameter('print elements') or 0
+        first = cursor.elements
+        children = list(budgeted_children(cursor, key, ms, max_elements))
+        if cursor.per_element == 2:
+            items = ['[{}] = {}'.format(k, v) for (_, k), (_, v) in zip(children[::2], children[1::2])]
+        else:
+            items = ['{} = {}'.format(name, v) for name, v in children]
+        more = key in _cursors
+        gdb.write('{' + ', '.join(items + (['...'] if more else [])) + '}\n')
+        if from_tty:
+            gdb.write('elements {} to {}{}\n'.format(first, cursor.elements - 1, '' if more else ' (end)'))
+
+
+_more = more_cmd()
+
+
 class GDB_Value_Wrapper(gdb.Value):
     """Wrapper class for gdb.Value"""
     def __init__(self, value):
@@ -524,6 +2599,11 @@ class GDB_Value_Wrapper(gdb.Value):
         self.type_name = str(self.basic_type)
         self.template_name = template_name(self.basic_type)
 
+    @property
+    def short_type_name(self):
+        """Abbreviated type name, for display"""
+        return abbreviate_type_name(self.type_name)
+
 
 class Printer_Gen(object):
     """
@@ -594,11 +2674,21 @@ class Printer_Gen(object):
             self.no_template_name_list.append(p)
 
     def __call__(self, value):
+        if _snapshot_recording:
+            record_value(value)
         v = GDB_Value_Wrapper(value)
         subprinter_generators = self.template_name_dict.get(v.template_name, self.no_template_name_list)
         for subprinter_gen in subprinter_generators:
             printer = subprinter_gen(v)
             if printer is not None:
+                if options['prefetch']:
+                    remember_printed(value)
+                if hasattr(printer, 'children') and not isinstance(printer.children, Budgeted_Children):
+                    printer.children = Budgeted_Children(printer, value, cursor_key(value, v.type_name))
+                    if hasattr(printer, 'element_count') and not hasattr(printer, 'num_children'):
+                        ranged = Ranged_Children(printer, value)
+                        printer.num_children = ranged.num_children
+                        printer.child = ranged.child
                 return printer
         return None
 
@@ -622,14 +2712,26 @@ boost_printer_list = []
 trivial_printer_list = []
 
 
+_registered_boost_version = None
+
+
+def registered_boost_version():
+    """
+    Return the boost version (a 3-tuple) printers were last registered for, or None.
+    """
+    return _registered_boost_version
+
+
 def register_printers(obj=None, boost_version=None):
     """
     Register top-level printers 'boost' and 'trivial' with objfile `obj`.
     """
+    global _registered_boost_version
     if boost_version is None:
         message('Detecting boost_version... ')
         boost_version = detect_boost_version()
         message('Detected boost version: {}.{}.{}'.format(*boost_version))
+    _registered_boost_version = tuple(boost_version)
     supported_printers = [printer for printer in boost_printer_list
                           if printer.min_supported_version <= boost_version <= printer.max_supported_version]
     if supported_printers:
@@ -760,22 +2862,115 @@ def add_trivial_type_printer(tn, f, **kwargs):
 
 
 #
-# To specify which index to use for printing for a specific container
-# (dynamically, inside gdb), add its address here as key, and the desired
-# index as value. E.g.:
+# To specify which indexes to use for printing a specific container
+# (dynamically, inside gdb), use the boost-multi-index command:
 #
-# (gdb) p &s_5
-# $2 = (Int_Set_5 *) 0x7fffffffd770
-# (gdb) python import boost.printers
-# (gdb) python boost.multi_index_selector[0x7fffffffd770] = 1
+# (gdb) boost-multi-index s_5 1
+# (gdb) boost-multi-index -type Int_Set 0,1
 # (gdb) p s_5
 #
+# Selections by address are kept in multi_index_selector, keyed by
+# (address, type name); a plain address key, with an index or a list of
+# indexes as value, is also accepted. E.g.:
+#
+# (gdb) python boost.utils.multi_index_selector[0x7fffffffd770] = 1
+#
+# Selections by address are forgotten when the inferior exits. Selections by
+# type are kept in multi_index_type_selector, as (compiled regex, indexes)
+# pairs; the first pattern found in the type name applies.
+#
 multi_index_selector = dict()
+multi_index_type_selector = []
 
 #
-# If set to true, do not print intrusive container hooks.
+# Printer options:
+# - hide_intrusive_hooks: If set to true, do not print intrusive container hooks.
+# - max_traversal_nodes: Maximum number of nodes visited when walking a node-based container.
+# - read_ahead_bytes: Size of the blocks in which inferior memory is read and cached; 0 disables the cache.
+# - prefetch: If set to true, prefetch the contents of the containers printed at a stop location
+#   when the inferior stops there again.
+# - abbreviate_type_names: If set to true, drop default template arguments and use aliases
+#   (e.g. std::string) in the type names shown by printers.
+# - print_budget_ms: Time after which printing the children of a container stops; 0 means no limit.
+# - print_budget_elements: Number of elements after which printing the children of a container
+#   stops; 0 means no limit. Unlike 'print elements', this also applies to MI front ends.
+# - children_cache: Number of containers whose children are kept across stops, and reused
+#   while the container header does not change; 0 disables the cache.
 #
-options = {'hide_intrusive_hooks': True}
+options = {'hide_intrusive_hooks': True,
+           'max_traversal_nodes': 10000000,
+           'read_ahead_bytes': 16384,
+           'prefetch': False,
+           'abbreviate_type_names': False,
+           'print_budget_ms': 0,
+           'print_budget_elements': 0,
+           'children_cache': 0}
+
+
+#
+# gdb settings for printer options: set boost ..., show boost ...
+#
+class boost_settings_cmd(gdb.Command):
+    """Boost printer settings."""
+
+    def __init__(self, name):
+        super(boost_settings_cmd, self).__init__(name, gdb.COMMAND_DATA, gdb.COMPLETE_NONE, True)
+
+
+class option_param(gdb.Parameter):
+    """
+    A gdb setting mirroring options[key].
+    """
+    key = None
+
+    def __init__(self, name):
+        super(option_param, self).__init__('boost ' + name, gdb.COMMAND_DATA, gdb.PARAM_ZUINTEGER)
+        self.setting = 'boost ' + name
+        self.value = options[self.key]
+
+    def get_set_string(self):
+        options[self.key] = self.value
+        return ''
+
+    def get_show_string(self, svalue):
+        return 'The value of "{}" is {}.'.format(self.setting, options[self.key])
+
+
+class print_budget_ms_param(option_param):
+    """Time budget for printing the children of a container, in milliseconds.
+When printing a container takes longer, its remaining elements are replaced by a
+truncation marker. 0 means no limit."""
+    set_doc = 'Set the time budget for printing a container, in milliseconds.'
+    show_doc = 'Show the time budget for printing a container, in milliseconds.'
+    key = 'print_budget_ms'
+
+
+class print_budget_elements_param(option_param):
+    """Element budget for printing the children of a container.
+Elements after the first N are replaced by a truncation marker. Unlike
+"set print elements", this also limits the children listed by MI front ends.
+0 means no limit."""
+    set_doc = 'Set the element budget for printing a container.'
+    show_doc = 'Show the element budget for printing a container.'
+    key = 'print_budget_elements'
+
+
+class children_cache_param(option_param):
+    """Number of containers whose children are cached across stops.
+Printing one of them again replays its children from the cache, as long as the
+bytes of the container object itself (size, pointers to the elements or buckets)
+did not change. Changes to the elements alone are then not shown. 0 disables
+the cache."""
+    set_doc = 'Set the number of containers whose children are cached across stops.'
+    show_doc = 'Show the number of containers whose children are cached across stops.'
+    key = 'children_cache'
+
+
+_set_boost = boost_settings_cmd('set boost')
+_show_boost = boost_settings_cmd('show boost')
+_print_budget_ms = print_budget_ms_param('print-budget-ms')
+_print_budget_elements = print_budget_elements_param('print-budget-elements')
+_children_cache_param = children_cache_param('children-cache')
 
 # Latest boost currently supported by printers
 last_supported_boost_version = (1, 70, 0)
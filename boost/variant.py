@@ -1,7 +1,6 @@
 # encoding: utf-8
 from __future__ import print_function, absolute_import, division
 import gdb
-import re
 from .utils import *
 
 #
@@ -10,27 +9,8 @@ from .utils import *
 
 def strip_qualifiers(typename):
     """Remove const/volatile qualifiers, references, and pointers of a type"""
-    qps = []
-
-    try:
-        while True:
-            typename = typename.rstrip()
-            qual = next(q for q in ['&', '*', 'const', 'volatile'] if typename.endswith(q))
-            typename = typename[:-len(qual)]
-            qps.append(qual)
-    except StopIteration:
-        pass
-
-    try:
-        while True:
-            typename = typename.lstrip()
-            qual = next(q for q in ['const', 'volatile'] if typename.startswith(q))
-            typename = typename[len(qual):]
-            qps.append(qual)
-    except StopIteration:
-        pass
-
-    return typename, qps[::-1]
+    t = parse_type_name(typename)
+    return t.base, list(t.qualifiers)
 
 
 def apply_qualifiers(t, qs):
@@ -48,24 +28,6 @@ def apply_qualifiers(t, qs):
     return t
 
 
-def split_parameter_pack(typename):
-    """Split a string represending a comma-separated c++ parameter pack into a list of stings of element types"""
-    unmatched = 0
-    length = len(typename)
-    b = e = 0
-    while e < length:
-        c = typename[e]
-        if c == ',' and unmatched == 0:
-            yield typename[b:e].strip()
-            b = e = e + 1
-        elif c == '<':
-            unmatched += 1
-        elif c == '>':
-            unmatched -= 1
-        e += 1
-    yield typename[b:e].strip()
-
-
 @add_printer
 class BoostVariant:
     "Pretty Printer for boost::variant (Boost.Variant)"
@@ -73,31 +35,62 @@ class BoostVariant:
     min_supported_version = (1, 40, 0)
     max_supported_version = last_supported_boost_version
     template_name = 'boost::variant'
-    regex = re.compile('^boost::variant<(.*)>$')
+
+    # (variant type name, index) -> (held type, type name, wrapped)
+    alternatives = type_cache()
 
     def __init__(self, value):
         self.value = value
+        self.variant_type = None
 
     def to_string(self):
-        stored_type, stored_type_name = self.get_variant_type()
-        return '(boost::variant<...>) type = {}'.format(stored_type_name)
+        held_type, stored_type_name, wrapped, backup = self.get_variant_type()
+        return '(boost::variant<...>) type = {}{}'.format(stored_type_name, ' (heap backup)' if backup else '')
 
     def children(self):
-        stored_type, stored_type_name = self.get_variant_type()
-        stored_value = reinterpret_cast(self.value['storage_']['data_']['buf'], stored_type)
-        yield stored_type_name, stored_value
+        held_type, stored_type_name, wrapped, backup = self.get_variant_type()
+        # address of the stored object: either the held value, or a recursive_wrapper<T>
+        addr = intptr(self.value['storage_']['data_']['buf'].address)
+        if backup:
+            # storage holds a backup_holder, whose only member points to the heap copy
+            addr = read_pointer(addr)
+        if wrapped:
+            # recursive_wrapper<T>, whose only member is a T*; held_type is T*
+            held_value = gdb.Value(read_pointer(addr)).cast(held_type).dereference()
+        else:
+            held_value = gdb.Value(addr).cast(held_type.pointer()).dereference()
+        yield stored_type_name, held_value
+
+    @staticmethod
+    def get_alternative(type_name, type_index):
+        """
+        Get (held type, type name, wrapped) of an alternative. For boost::recursive_wrapper<T>,
+        the held type is T*, the type name is that of T, and wrapped is True.
+        """
+        key = (type_name, type_index)
+        alternative = BoostVariant.alternatives.get(key)
+        if alternative is None:
+            # This is a workaround for a GDB issue
+            # https://sourceware.org/bugzilla/show_bug.cgi?id=17311.
+            # gdb.Type.template_argument() method does not work unless variadic templates
+            # are disabled using BOOST_VARIANT_DO_NOT_USE_VARIADIC_TEMPLATES.
+            stored = parse_type_name(type_name).args[type_index]
+            wrapped = stored.name == 'boost::recursive_wrapper'
+            if wrapped:
+                stored_type_name = stored.arg_names[0]
+                held_type = lookup_type(stored_type_name).pointer()
+            else:
+                stored_type_name = stored.text
+                held_type = apply_qualifiers(lookup_type(stored.base), stored.qualifiers)
+            alternative = BoostVariant.alternatives[key] = (held_type, stored_type_name, wrapped)
+        return alternative
 
     def get_variant_type(self):
-        """Get a gdb.Type of a template argument"""
-        type_index = intptr(self.value['which_'])
-        assert type_index >= 0, 'Heap backup is not supported'
-        
-        # This is a workaround for a GDB issue
-        # https://sourceware.org/bugzilla/show_bug.cgi?id=17311. 
-        # gdb.Type.template_argument() method does not work unless variadic templates
-        # are disabled using BOOST_VARIANT_DO_NOT_USE_VARIADIC_TEMPLATES.
-        m = BoostVariant.regex.search(self.value.type_name)
-        type_names = list(split_parameter_pack(m.group(1)))
-        stored_type_name = type_names[type_index]
-        base_type_name, qualifiers = strip_qualifiers(stored_type_name)
-        return apply_qualifiers(lookup_type(base_type_name), qualifiers), stored_type_name
+        """Get (held type, type name, wrapped, heap backup flag) of the stored alternative"""
+        if self.variant_type is None:
+            which = intptr(self.value['which_'])
+            # during assignment, which_ is the bitwise complement of the index of the backed up type
+            backup = which < 0
+            alternative = self.get_alternative(self.value.type_name, ~which if backup else which)
+            self.variant_type = alternative + (backup,)
+        return self.variant_type
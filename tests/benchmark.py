@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""
+Time the printers on values captured with `boost-snapshot capture`, without gdb.
+
+The printers run on the pure-python gdb emulation in tests/fakegdb. For each captured
+expression, this measures printer lookup (the 'boost' Printer_Gen.__call__) and a full
+walk of the children, with the read-ahead cache emptied before every walk. Times
+include the overhead of the emulation, so compare them only with each other.
+"""
+
+from __future__ import print_function, division
+import argparse
+import sys
+import os
+import time
+import itertools
+from os.path import join
+
+tests_dir = sys.path[0]
+printers_dir = os.path.abspath(join(tests_dir, '..'))
+sys.path[0:0] = [join(tests_dir, 'fakegdb'), printers_dir]
+
+import gdb
+import boost
+import boost.utils
+
+# time.perf_counter() is python 3.3 and later
+clock = getattr(time, 'perf_counter', time.time)
+
+
+def best_time(f, repeat, number):
+    """Best average duration of `number` calls to `f`, over `repeat` runs, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = clock()
+        for _ in range(number):
+            f()
+        elapsed = (clock() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def walk(value, limit):
+    boost.utils.clear_inferior_caches()
+    p = gdb.default_visualizer(value)
+    if p is None or not hasattr(p, 'children'):
+        return 0
+    return sum(1 for _ in itertools.islice(p.children(), limit))
+
+
+def benchmark(expression, args):
+    value = gdb.parse_and_eval(expression)
+    printer = gdb.default_visualizer(value)
+    if printer is None:
+        print('{}: no printer'.format(expression))
+        return
+    boost_gen = next(p for p in gdb.pretty_printers if p.name == 'boost')
+    lookup = best_time(lambda: boost_gen(value), args.repeat, args.number)
+    count = walk(value, args.limit)
+    traversal = best_time(lambda: walk(value, args.limit), args.repeat, 1)
+    print('{}: {} ({} children)'.format(expression, printer.__class__.__name__, count))
+    print('    lookup {:10.1f} us'.format(lookup * 1e6))
+    print('    walk   {:10.3f} ms  ({:.2f} us per child)'.format(traversal * 1e3, traversal * 1e6 / max(count, 1)))
+    if args.print:
+        print('    ' + str(value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('snapshot', help='file saved by boost-snapshot capture')
+    parser.add_argument('expressions', nargs='*', help='captured expressions (default: all of them)')
+    parser.add_argument('-b', '--boost-version', default='{}.{}.{}'.format(*boost.last_supported_boost_version),
+                        help='boost version to register printers for (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='timing runs, the best one is reported')
+    parser.add_argument('-n', '--number', type=int, default=1000, help='printer lookups per timing run')
+    parser.add_argument('-l', '--limit', type=int, default=None, help='children walked per value (default: all)')
+    parser.add_argument('-p', '--print', action='store_true', help='also print each value')
+    args = parser.parse_args()
+
+    snapshot = boost.utils.Snapshot.load(args.snapshot)
+    gdb.use_snapshot(snapshot)
+    boost.register_printers(boost_version=tuple(int(x) for x in args.boost_version.split('.')))
+    for expression in args.expressions or sorted(snapshot.values):
+        benchmark(expression, args)
+
+
+if __name__ == '__main__':
+    main()
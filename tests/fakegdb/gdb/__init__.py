@@ -0,0 +1,1062 @@
+"""
+Pure-python stand-in for gdb's python API, for running the printers without gdb.
+
+Values and types are served from a memory snapshot recorded with `boost-snapshot`
+(see boost.utils.Snapshot): select one with use_snapshot(), then import the boost
+package and use parse_and_eval(), lookup_type() and default_visualizer() as in gdb.
+
+Only what the printers use is emulated. There is no inferior process, so printers
+which call inferior functions (e.g. those of intrusive containers) do not work, and
+parse_and_eval() understands only captured expressions, casts, dereferences and
+integer literals.
+"""
+
+from __future__ import print_function
+
+import re
+import sys
+import struct
+import itertools
+
+if sys.version_info[0] == 2:
+    _integer_types = (int, long)
+    # gdb's python 2 read_memory() returns a buffer object
+    _membuf = buffer
+else:
+    _integer_types = (int,)
+    _membuf = memoryview
+
+VERSION = '0.0 (boost fake gdb)'
+
+(TYPE_CODE_BITSTRING, TYPE_CODE_PTR, TYPE_CODE_ARRAY, TYPE_CODE_STRUCT, TYPE_CODE_UNION,
+ TYPE_CODE_ENUM, TYPE_CODE_FLAGS, TYPE_CODE_FUNC, TYPE_CODE_INT, TYPE_CODE_FLT, TYPE_CODE_VOID,
+ TYPE_CODE_SET, TYPE_CODE_RANGE, TYPE_CODE_STRING, TYPE_CODE_ERROR, TYPE_CODE_METHOD,
+ TYPE_CODE_METHODPTR, TYPE_CODE_MEMBERPTR, TYPE_CODE_REF, TYPE_CODE_RVALUE_REF, TYPE_CODE_CHAR,
+ TYPE_CODE_BOOL, TYPE_CODE_COMPLEX, TYPE_CODE_TYPEDEF, TYPE_CODE_NAMESPACE, TYPE_CODE_DECFLOAT,
+ TYPE_CODE_INTERNAL_FUNCTION) = range(-1, 26)
+
+(COMMAND_NONE, COMMAND_RUNNING, COMMAND_DATA, COMMAND_STACK, COMMAND_FILES, COMMAND_SUPPORT,
+ COMMAND_STATUS, COMMAND_BREAKPOINTS, COMMAND_TRACEPOINTS, COMMAND_OBSCURE, COMMAND_MAINTENANCE,
+ COMMAND_USER) = range(-1, 11)
+
+(COMPLETE_NONE, COMPLETE_FILENAME, COMPLETE_LOCATION, COMPLETE_COMMAND, COMPLETE_SYMBOL,
+ COMPLETE_EXPRESSION) = range(6)
+
+(PARAM_BOOLEAN, PARAM_AUTO_BOOLEAN, PARAM_UINTEGER, PARAM_INTEGER, PARAM_STRING,
+ PARAM_STRING_NOESCAPE, PARAM_OPTIONAL_FILENAME, PARAM_FILENAME, PARAM_ZINTEGER, PARAM_ZUINTEGER,
+ PARAM_ZUINTEGER_UNLIMITED, PARAM_ENUM) = range(12)
+
+
+class error(RuntimeError):
+    pass
+
+
+class MemoryError(error):
+    pass
+
+
+class GdbError(Exception):
+    pass
+
+
+_snapshot = []
+_types = dict()
+_commands = dict()
+_functions = dict()
+_output = []
+pretty_printers = []
+type_printers = []
+
+_scalar_codes = (TYPE_CODE_INT, TYPE_CODE_CHAR, TYPE_CODE_BOOL, TYPE_CODE_ENUM, TYPE_CODE_PTR, TYPE_CODE_FLT)
+_builtin_types = {
+    'void': (TYPE_CODE_VOID, 1),
+    'bool': (TYPE_CODE_BOOL, 1),
+    'char': (TYPE_CODE_CHAR, 1),
+    'signed char': (TYPE_CODE_CHAR, 1),
+    'unsigned char': (TYPE_CODE_CHAR, 1),
+    'short': (TYPE_CODE_INT, 2),
+    'unsigned short': (TYPE_CODE_INT, 2),
+    'int': (TYPE_CODE_INT, 4),
+    'unsigned int': (TYPE_CODE_INT, 4),
+    'long': (TYPE_CODE_INT, None),
+    'unsigned long': (TYPE_CODE_INT, None),
+    'long long': (TYPE_CODE_INT, 8),
+    'unsigned long long': (TYPE_CODE_INT, 8),
+    'float': (TYPE_CODE_FLT, 4),
+    'double': (TYPE_CODE_FLT, 8),
+}
+
+
+def use_snapshot(snapshot):
+    """
+    Serve memory and types from `snapshot`, a boost.utils.Snapshot.
+    """
+    del _snapshot[:]
+    _snapshot.append(snapshot)
+    _types.clear()
+    for handler in list(events.clear_objfiles.handlers) + list(events.stop.handlers):
+        handler(None)
+
+
+def _current_snapshot():
+    if not _snapshot:
+        raise error('No snapshot selected; call gdb.use_snapshot() first.')
+    return _snapshot[0]
+
+
+def _pointer_size():
+    return _snapshot[0].pointer_size or 8 if _snapshot else 8
+
+
+def _byte_order():
+    return '>' if _snapshot and _snapshot[0].byte_order == 'big' else '<'
+
+
+def _read(addr, size):
+    if size == 0:
+        return b''
+    return bytes(_current_snapshot().read(addr, size))
+
+
+#
+# Types
+#
+class Field(object):
+    def __init__(self, parent_type, entry):
+        self.parent_type = parent_type
+        self.name = entry['name']
+        self._type_name = entry['type']
+        if entry.get('bitpos') is not None:
+            self.bitpos = entry['bitpos']
+        if entry.get('enumval') is not None:
+            self.enumval = entry['enumval']
+        self.bitsize = entry.get('bitsize') or 0
+        self.is_base_class = bool(entry.get('is_base_class'))
+        self.artificial = bool(entry.get('artificial'))
+
+    @property
+    def type(self):
+        return lookup_type(self._type_name) if self._type_name is not None else None
+
+
+class Type(object):
+    def __init__(self, name, code, sizeof, tag=None, type_name=None, entry=None,
+                 unqualified=None, const=False, volatile=False, target=None):
+        self._str = name
+        self.code = code
+        self.sizeof = sizeof
+        self.tag = tag
+        self.name = type_name
+        self._entry = entry or dict()
+        self._unqualified = unqualified
+        self._const = const
+        self._volatile = volatile
+        self._target = target
+        self._fields = None
+        self._member_offsets = dict()
+
+    dynamic = False
+    objfile = None
+
+    def __str__(self):
+        return self._str
+
+    def __repr__(self):
+        return '<gdb.Type %s>' % self._str
+
+    def __eq__(self, other):
+        return isinstance(other, Type) and self._str == other._str
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._str)
+
+    @property
+    def is_signed(self):
+        t = self.strip_typedefs()
+        if t.code not in (TYPE_CODE_INT, TYPE_CODE_CHAR, TYPE_CODE_BOOL, TYPE_CODE_ENUM, TYPE_CODE_FLT):
+            raise ValueError('Type must be a scalar type')
+        if t.code == TYPE_CODE_ENUM:
+            return any(getattr(f, 'enumval', 0) < 0 for f in t.fields())
+        name = str(t.unqualified())
+        return t.code == TYPE_CODE_FLT or (t.code != TYPE_CODE_BOOL and 'unsigned' not in name
+                                           and not name.startswith('char16_t') and not name.startswith('char32_t'))
+
+    def unqualified(self):
+        return self._unqualified or self
+
+    def _qualified(self, const, volatile):
+        base = self.unqualified()
+        if not const and not volatile:
+            return base
+        quals = ' '.join(q for q, on in (('const', const), ('volatile', volatile)) if on)
+        if base.code == TYPE_CODE_PTR:
+            name = str(base) + ' ' + quals
+        else:
+            name = quals + ' ' + str(base)
+        return _find_type(name, lambda: Type(name, base.code, base.sizeof, base.tag, base.name,
+                                             unqualified=base, const=const, volatile=volatile))
+
+    def const(self):
+        return self._qualified(True, self._volatile)
+
+    def volatile(self):
+        return self._qualified(self._const, True)
+
+    def _derived(self, suffix, code, sizeof):
+        name = str(self) + ('' if str(self).endswith('*') else ' ') + suffix
+        return _find_type(name, lambda: Type(name, code, sizeof, target=self))
+
+    def pointer(self):
+        return self._derived('*', TYPE_CODE_PTR, _pointer_size())
+
+    def reference(self):
+        return self._derived('&', TYPE_CODE_REF, _pointer_size())
+
+    def array(self, n1, n2=None):
+        low, high = (0, n1) if n2 is None else (n1, n2)
+        name = '%s [%d]' % (self, high - low + 1)
+        return _find_type(name, lambda: Type(name, TYPE_CODE_ARRAY, self.sizeof * (high - low + 1),
+                                             target=self, entry={'range': [low, high]}))
+
+    def target(self):
+        base = self.unqualified()
+        if base._target is None:
+            if base._entry.get('target') is None:
+                raise RuntimeError('Type does not have a target.')
+            base._target = lookup_type(base._entry['target'])
+        return base._target
+
+    def strip_typedefs(self):
+        if self.code != TYPE_CODE_TYPEDEF:
+            return self
+        t = self.target().strip_typedefs()
+        return t._qualified(self._const or t._const, self._volatile or t._volatile)
+
+    def range(self):
+        t = self.strip_typedefs().unqualified()
+        if t._entry.get('range') is None:
+            raise RuntimeError('This type does not have a range.')
+        return tuple(t._entry['range'])
+
+    def fields(self):
+        t = self.strip_typedefs().unqualified()
+        if t.code not in (TYPE_CODE_STRUCT, TYPE_CODE_UNION, TYPE_CODE_ENUM, TYPE_CODE_FUNC):
+            raise TypeError('Type is not a structure, union, enum, or function type.')
+        if t._fields is None:
+            t._fields = [Field(t, f) for f in t._entry.get('fields', [])]
+        return list(t._fields)
+
+    def keys(self):
+        return [f.name for f in self.fields()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def has_key(self, name):
+        return name in self
+
+    def __getitem__(self, name):
+        for f in self.fields():
+            if f.name == name:
+                return f
+        raise KeyError(name)
+
+    def template_argument(self, n, block=None):
+        t = self.strip_typedefs().unqualified()
+        args = t._entry.get('template_args', [])
+        if n >= len(args):
+            raise RuntimeError('Template argument number %d out of range.' % n)
+        arg = args[n]
+        if 'value' not in arg:
+            return lookup_type(arg['type'])
+        return _value_from_string(arg['value'], lookup_type(arg['type']))
+
+    def _member_offset(self, name):
+        """
+        Return (byte offset, Field) of the member or base class `name`, searching base classes.
+        """
+        t = self.strip_typedefs().unqualified()
+        if name not in t._member_offsets:
+            t._member_offsets[name] = t._search_member(name)
+        return t._member_offsets[name]
+
+    def _search_member(self, name):
+        fields = self.fields()
+        for f in fields:
+            if f.name == name and hasattr(f, 'bitpos'):
+                return f.bitpos // 8, f
+        for f in fields:
+            if f.is_base_class:
+                found = f.type._member_offset(name)
+                if found is not None:
+                    return f.bitpos // 8 + found[0], found[1]
+        return None
+
+    def _base_offset(self, base):
+        """
+        Return the byte offset of base class `base` inside this type, or None.
+        """
+        for f in self.strip_typedefs().fields():
+            if f.is_base_class:
+                t = f.type.strip_typedefs().unqualified()
+                if t == base:
+                    return f.bitpos // 8
+                found = t._base_offset(base)
+                if found is not None:
+                    return f.bitpos // 8 + found
+        return None
+
+
+def _find_type(name, make):
+    if name not in _types:
+        entry = _snapshot[0].types.get(name) if _snapshot else None
+        _types[name] = _type_from_entry(name, entry) if entry is not None else make()
+    return _types[name]
+
+
+def _type_from_entry(name, entry):
+    if entry.get('unqualified') is not None:
+        base = lookup_type(entry['unqualified'])
+        return Type(name, base.code, base.sizeof, base.tag, entry.get('name'), unqualified=base,
+                    const=bool(entry.get('const')), volatile=bool(entry.get('volatile')))
+    code = globals().get(entry.get('code') or '', TYPE_CODE_ERROR)
+    return Type(name, code, entry['sizeof'], entry.get('tag'), entry.get('name'), entry=entry)
+
+
+def _make_type(name):
+    lookups = getattr(_snapshot[0], 'lookups', dict()) if _snapshot else dict()
+    if name in lookups:
+        return lookup_type(lookups[name])
+    for suffix, method in (('*', 'pointer'), ('&', 'reference')):
+        if name.endswith(suffix) and len(name) > 1:
+            return getattr(lookup_type(name[:-1]), method)()
+    for qualifier in ('const', 'volatile'):
+        if name.startswith(qualifier + ' '):
+            return getattr(lookup_type(name[len(qualifier) + 1:]), qualifier)()
+        if name.endswith(' ' + qualifier):
+            return getattr(lookup_type(name[:-len(qualifier) - 1]), qualifier)()
+    if name in _builtin_types:
+        code, sizeof = _builtin_types[name]
+        return Type(name, code, sizeof or _pointer_size(), type_name=name)
+    raise error('No type named %s.' % name)
+
+
+def lookup_type(name, block=None):
+    name = ' '.join(name.split())
+    if name not in _types:
+        entry = _snapshot[0].types.get(name) if _snapshot else None
+        _types[name] = _type_from_entry(name, entry) if entry is not None else _make_type(name)
+    return _types[name]
+
+
+#
+# Values
+#
+_int_formats = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+
+
+def _unpack_scalar(t, data):
+    if t.code == TYPE_CODE_FLT:
+        if t.sizeof not in (4, 8):
+            raise error('Cannot convert %s to a python float.' % t)
+        return struct.unpack(_byte_order() + ('f' if t.sizeof == 4 else 'd'), data)[0]
+    signed = t.code in (TYPE_CODE_INT, TYPE_CODE_CHAR, TYPE_CODE_ENUM) and t.is_signed
+    fmt = _int_formats.get(len(data))
+    if fmt is not None:
+        return struct.unpack(_byte_order() + (fmt if signed else fmt.upper()), data)[0]
+    n = 0
+    for c in (bytearray(data) if _byte_order() == '>' else reversed(bytearray(data))):
+        n = (n << 8) | c
+    if signed and n >> (8 * len(data) - 1):
+        n -= 1 << (8 * len(data))
+    return n
+
+
+def _pack_scalar(t, n):
+    if t.code == TYPE_CODE_FLT:
+        return struct.pack(_byte_order() + ('f' if t.sizeof == 4 else 'd'), float(n))
+    n = int(n) & ((1 << (8 * t.sizeof)) - 1)
+    data = bytearray((n >> (8 * i)) & 0xff for i in range(t.sizeof))
+    if _byte_order() == '>':
+        data.reverse()
+    return bytes(data)
+
+
+def _value_from_string(s, t):
+    """
+    Make a value of type `t` from its printed form `s`, as saved for template arguments.
+    """
+    base = t.strip_typedefs()
+    s = s.strip()
+    if s in ('true', 'false'):
+        return Value._scalar(int(s == 'true'), t)
+    if base.code == TYPE_CODE_ENUM:
+        for f in base.fields():
+            if f.name == s or f.name.split('::')[-1] == s.split('::')[-1]:
+                return Value._scalar(f.enumval, t)
+    m = re.match(r'^\(?.*?\)?\s*(-?(?:0x[0-9a-fA-F]+|\d+))[uUlL]*$', s)
+    if m is None:
+        raise error('Cannot parse template argument value: %s' % s)
+    return Value._scalar(int(m.group(1), 0), t)
+
+
+class Value(object):
+    # like gdb's C type, no __dict__ (the python 2 GDB_Value_Wrapper replaces its own)
+    __slots__ = ('_type', '_address', '_data')
+
+    def __new__(cls, val=None, type=None):
+        self = object.__new__(cls)
+        if isinstance(val, Value):
+            self._type, self._address, self._data = val._type, val._address, val._data
+        elif type is not None:
+            data = bytes(val)
+            if len(data) < type.sizeof:
+                raise ValueError('Size of type is larger than that of buffer object.')
+            self._type, self._address, self._data = type, None, data[:type.sizeof]
+        elif isinstance(val, bool):
+            self._init_scalar(int(val), lookup_type('bool'))
+        elif isinstance(val, _integer_types):
+            self._init_scalar(val, lookup_type('long' if val < 0 or val < 1 << 63 else 'unsigned long'))
+        elif isinstance(val, float):
+            self._init_scalar(val, lookup_type('double'))
+        elif isinstance(val, str):
+            data = val.encode('utf-8') + b'\0'
+            self._type, self._address, self._data = lookup_type('char').array(len(data) - 1), None, data
+        else:
+            raise TypeError('Could not convert Python object: %r.' % (val,))
+        return self
+
+    def __init__(self, *args, **kwargs):
+        # everything is done by __new__, so that subclasses may call Value.__init__ freely
+        pass
+
+    def _init_scalar(self, n, t):
+        self._type, self._address, self._data = t, None, _pack_scalar(t.strip_typedefs(), n)
+
+    @classmethod
+    def _scalar(cls, n, t):
+        self = object.__new__(cls)
+        self._init_scalar(n, t)
+        return self
+
+    @classmethod
+    def _at(cls, t, address):
+        self = object.__new__(cls)
+        self._type, self._address, self._data = t, address, None
+        return self
+
+    def _bytes(self):
+        if self._data is None:
+            self._data = _read(self._address, self._type.sizeof)
+        return self._data
+
+    def _python(self):
+        t = self._type.strip_typedefs()
+        if t.code == TYPE_CODE_REF:
+            return self.referenced_value()._python()
+        if t.code not in _scalar_codes:
+            raise error('Cannot convert value to a number: value is of type %s.' % self._type)
+        return _unpack_scalar(t, self._bytes())
+
+    def _component(self, t, offset):
+        if self._address is not None:
+            return Value._at(t, self._address + offset)
+        return Value(self._bytes()[offset:offset + t.sizeof], t)
+
+    def _deref_ref(self):
+        return self.referenced_value() if self._type.strip_typedefs().code == TYPE_CODE_REF else self
+
+    @property
+    def type(self):
+        return self._type
+
+    @property
+    def dynamic_type(self):
+        return self._type
+
+    @property
+    def address(self):
+        if self._address is None:
+            return None
+        return Value._scalar(self._address, self._type.pointer())
+
+    is_optimized_out = False
+
+    @property
+    def is_lazy(self):
+        return self._data is None
+
+    def fetch_lazy(self):
+        self._bytes()
+
+    def dereference(self):
+        t = self._type.strip_typedefs()
+        if t.code == TYPE_CODE_REF:
+            return self.referenced_value()
+        if t.code != TYPE_CODE_PTR:
+            raise error('Attempt to take contents of a non-pointer value.')
+        return Value._at(t.target(), self._python())
+
+    def referenced_value(self):
+        t = self._type.strip_typedefs()
+        if t.code == TYPE_CODE_PTR:
+            return self.dereference()
+        if t.code != TYPE_CODE_REF:
+            raise error('Trying to get the referenced value from a value which is neither a pointer nor a reference.')
+        return Value._at(t.target(), _unpack_scalar(lookup_type('unsigned long'), self._bytes()))
+
+    def cast(self, t):
+        src = self._type.strip_typedefs()
+        dst = t.strip_typedefs()
+        if src.code == TYPE_CODE_REF:
+            return self.referenced_value().cast(t)
+        if dst.code in _scalar_codes and src.code in _scalar_codes:
+            n = self._python()
+            return Value._scalar(n if dst.code == TYPE_CODE_FLT else int(n), t)
+        if dst.code in (TYPE_CODE_STRUCT, TYPE_CODE_UNION) and src.code in (TYPE_CODE_STRUCT, TYPE_CODE_UNION):
+            if src.unqualified() == dst.unqualified():
+                return self._component(t, 0)
+            offset = src._base_offset(dst.unqualified())
+            if offset is not None:
+                return self._component(t, offset)
+            offset = dst._base_offset(src.unqualified())
+            if offset is not None and self._address is not None:
+                return Value._at(t, self._address - offset)
+            raise error('Invalid cast.')
+        if dst.code == TYPE_CODE_ARRAY and self._address is not None:
+            return Value._at(t, self._address)
+        if dst.code == src.code and dst.sizeof == src.sizeof:
+            return self._component(t, 0)
+        raise error('Invalid cast.')
+
+    reinterpret_cast = cast
+    dynamic_cast = cast
+
+    def __getitem__(self, key):
+        v = self._deref_ref()
+        t = v._type.strip_typedefs()
+        if isinstance(key, Field):
+            key = key.name
+        if isinstance(key, str):
+            if t.code not in (TYPE_CODE_STRUCT, TYPE_CODE_UNION):
+                raise error('Attempt to extract a component of a value that is not a structure.')
+            found = t._member_offset(key)
+            if found is None:
+                raise error('There is no member named %s.' % key)
+            offset, field = found
+            if field.bitsize and not field.is_base_class:
+                return v._bitfield(field, offset)
+            return v._component(field.type, offset)
+        index = int(key)
+        if t.code == TYPE_CODE_PTR:
+            target = t.target()
+            return Value._at(target, v._python() + index * target.sizeof)
+        if t.code == TYPE_CODE_ARRAY:
+            target = t.target()
+            return v._component(target, (index - t.range()[0]) * target.sizeof)
+        raise error('Cannot subscript requested type.')
+
+    def _bitfield(self, field, offset):
+        # little endian bit numbering only
+        start = field.bitpos % 8
+        size = (start + field.bitsize + 7) // 8
+        data = self._component(lookup_type('unsigned char').array(size - 1), offset)._bytes()
+        n = 0
+        for c in reversed(bytearray(data)):
+            n = (n << 8) | c
+        return Value._scalar((n >> start) & ((1 << field.bitsize) - 1), field.type)
+
+    #
+    # arithmetic and comparisons
+    #
+    @staticmethod
+    def _operand(x):
+        return x._python() if isinstance(x, Value) else x
+
+    def _pointer_step(self):
+        t = self._type.strip_typedefs()
+        if t.code == TYPE_CODE_PTR:
+            return max(t.target().strip_typedefs().sizeof, 1)
+        return None
+
+    def _arith(self, other, op, reverse=False):
+        a, b = self._python(), Value._operand(other)
+        if reverse:
+            a, b = b, a
+        result = op(a, b)
+        if isinstance(result, float) or isinstance(a, float) or isinstance(b, float):
+            return Value._scalar(float(result), lookup_type('double'))
+        return Value._scalar(result, self._type)
+
+    def __add__(self, other):
+        step = self._pointer_step()
+        if step is not None:
+            return Value._scalar(self._python() + int(other) * step, self._type)
+        if isinstance(other, Value) and other._pointer_step() is not None:
+            return other + self
+        return self._arith(other, lambda a, b: a + b)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        step = self._pointer_step()
+        if step is not None:
+            if isinstance(other, Value) and other._pointer_step() is not None:
+                return Value._scalar((self._python() - other._python()) // step, lookup_type('long'))
+            return Value._scalar(self._python() - int(other) * step, self._type)
+        return self._arith(other, lambda a, b: a - b)
+
+    def __rsub__(self, other):
+        return self._arith(other, lambda a, b: a - b, True)
+
+    def __mul__(self, other):
+        return self._arith(other, lambda a, b: a * b)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return self._arith(other, lambda a, b: a / b if isinstance(a, float) or isinstance(b, float)
+                           else int(float(a) / b))
+
+    __div__ = __floordiv__ = __truediv__
+
+    def __mod__(self, other):
+        return self._arith(other, lambda a, b: a - b * int(float(a) / b))
+
+    def __and__(self, other):
+        return self._arith(other, lambda a, b: a & b)
+
+    __rand__ = __and__
+
+    def __or__(self, other):
+        return self._arith(other, lambda a, b: a | b)
+
+    __ror__ = __or__
+
+    def __xor__(self, other):
+        return self._arith(other, lambda a, b: a ^ b)
+
+    __rxor__ = __xor__
+
+    def __lshift__(self, other):
+        return self._arith(other, lambda a, b: a << b)
+
+    def __rshift__(self, other):
+        return self._arith(other, lambda a, b: a >> b)
+
+    def __neg__(self):
+        return self._arith(0, lambda a, b: -a)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return self._arith(0, lambda a, b: abs(a))
+
+    def __invert__(self):
+        return self._arith(0, lambda a, b: ~a)
+
+    def _compare(self, other, op):
+        if other is None:
+            return op(0, 1)
+        return op(self._python(), Value._operand(other))
+
+    def __eq__(self, other):
+        return self._compare(other, lambda a, b: a == b)
+
+    def __ne__(self, other):
+        return self._compare(other, lambda a, b: a != b)
+
+    def __lt__(self, other):
+        return self._compare(other, lambda a, b: a < b)
+
+    def __le__(self, other):
+        return self._compare(other, lambda a, b: a <= b)
+
+    def __gt__(self, other):
+        return self._compare(other, lambda a, b: a > b)
+
+    def __ge__(self, other):
+        return self._compare(other, lambda a, b: a >= b)
+
+    __hash__ = object.__hash__
+
+    def __bool__(self):
+        return self._python() != 0
+
+    __nonzero__ = __bool__
+
+    def __int__(self):
+        return int(self._python())
+
+    __long__ = __index__ = __int__
+
+    def __float__(self):
+        return float(self._python())
+
+    #
+    # strings
+    #
+    def string(self, encoding=None, errors=None, length=-1):
+        v = self._deref_ref()
+        t = v._type.strip_typedefs()
+        if t.code == TYPE_CODE_ARRAY:
+            data = v._bytes()
+        elif t.code == TYPE_CODE_PTR:
+            addr = v._python()
+            if length >= 0:
+                data = _read(addr, length)
+            else:
+                chunks = []
+                while True:
+                    c = _read(addr, 1)
+                    if c == b'\0':
+                        break
+                    chunks.append(c)
+                    addr += 1
+                data = b''.join(chunks)
+        else:
+            raise error('Trying to read string with inappropriate type `%s\'.' % self._type)
+        if length >= 0:
+            data = data[:length]
+        elif b'\0' in data:
+            data = data[:data.index(b'\0')]
+        return data.decode(encoding or 'utf-8', errors or 'strict')
+
+    def format_string(self, raw=False, **kwargs):
+        return _format(self, raw)
+
+    def __str__(self):
+        return _format(self, False)
+
+    def __repr__(self):
+        return '<gdb.Value %s>' % self._type
+
+
+def _format_scalar(v):
+    t = v._type.strip_typedefs()
+    n = v._python()
+    if t.code == TYPE_CODE_BOOL:
+        return 'true' if n else 'false'
+    if t.code == TYPE_CODE_CHAR:
+        return "%d '%s'" % (n, chr(n % 256) if 32 <= n % 256 < 127 else '\\%03o' % (n % 256))
+    if t.code == TYPE_CODE_PTR:
+        return '0x%x' % n
+    if t.code == TYPE_CODE_FLT:
+        return '%.17g' % n
+    if t.code == TYPE_CODE_ENUM:
+        for f in t.fields():
+            if getattr(f, 'enumval', None) == n:
+                return f.name
+    return str(n)
+
+
+def _format_child(c):
+    if isinstance(c, Value):
+        return _format(c, False)
+    if isinstance(c, str):
+        return '"%s"' % c
+    return str(c)
+
+
+def _format(v, raw):
+    p = None if raw else default_visualizer(v)
+    if p is not None:
+        s = p.to_string() if hasattr(p, 'to_string') else None
+        if isinstance(s, Value):
+            s = _format(s, False)
+        if not hasattr(p, 'children'):
+            return '' if s is None else str(s)
+        hint = p.display_hint() if hasattr(p, 'display_hint') else None
+        limit = parameter('print elements') or None
+        # like gdb: at most `limit` children are fetched, and '...' follows if there may be more
+        children = list(itertools.islice(p.children(), limit))
+        more = limit is not None and len(children) == limit
+        if hint == 'map':
+            items = ['[%s] = %s' % (_format_child(k[1]), _format_child(c[1]))
+                     for k, c in zip(children[::2], children[1::2])]
+        elif hint == 'array':
+            items = [_format_child(c[1]) for c in children]
+        else:
+            items = ['%s = %s' % (c[0], _format_child(c[1])) for c in children]
+        body = '{' + ', '.join(items + (['...'] if more else [])) + '}'
+        return body if s is None else '%s = %s' % (s, body)
+    t = v._type.strip_typedefs()
+    if t.code in _scalar_codes:
+        return _format_scalar(v)
+    if t.code == TYPE_CODE_REF:
+        r = v.referenced_value()
+        return '@0x%x: %s' % (r._address, _format(r, raw))
+    if t.code == TYPE_CODE_ARRAY:
+        low, high = t.range()
+        return '{' + ', '.join(_format(v[i], raw) for i in range(low, high + 1)) + '}'
+    if t.code in (TYPE_CODE_STRUCT, TYPE_CODE_UNION):
+        items = []
+        for f in t.fields():
+            if not hasattr(f, 'bitpos'):
+                continue
+            if f.is_base_class:
+                items.append('<%s> = %s' % (f.name, _format(v.cast(f.type), raw)))
+            else:
+                items.append('%s = %s' % (f.name, _format(v[f.name], raw)))
+        return '{' + ', '.join(items) + '}'
+    if t.code == TYPE_CODE_VOID:
+        return 'void'
+    return '<%s>' % t
+
+
+#
+# Expressions
+#
+def _matching_paren(s, i):
+    depth = 0
+    for j in range(i, len(s)):
+        if s[j] == '(':
+            depth += 1
+        elif s[j] == ')':
+            depth -= 1
+            if depth == 0:
+                return j
+    raise error('A syntax error in expression, near `%s\'.' % s[i:])
+
+
+def parse_and_eval(expression, global_context=False):
+    """
+    Evaluate a captured expression (see boost-snapshot capture), an integer literal, or a
+    cast or dereference of one, e.g. '*(T *) 0x601010'.
+    """
+    e = expression.strip()
+    while e.startswith('(') and _matching_paren(e, 0) == len(e) - 1:
+        e = e[1:-1].strip()
+    values = getattr(_current_snapshot(), 'values', dict())
+    if e in values:
+        address, type_name = values[e]
+        return Value._at(lookup_type(type_name), address)
+    if re.match(r'^-?(0x[0-9a-fA-F]+|\d+)[uUlL]*$', e):
+        return Value(int(e.rstrip('uUlL'), 0))
+    if e.startswith('*'):
+        return parse_and_eval(e[1:]).dereference()
+    if e.startswith('('):
+        j = _matching_paren(e, 0)
+        return parse_and_eval(e[j + 1:]).cast(lookup_type(e[1:j]))
+    m = re.match(r'^(.*\S)\s*([-+])\s*(\d+)$', e)
+    if m:
+        lhs = parse_and_eval(m.group(1))
+        return lhs + int(m.group(3)) if m.group(2) == '+' else lhs - int(m.group(3))
+    raise error('No symbol "%s" in current context.' % e)
+
+
+def history(number):
+    raise error('History is empty.')
+
+
+#
+# Pretty printers
+#
+def default_visualizer(value):
+    for printer in pretty_printers:
+        if getattr(printer, 'enabled', True):
+            p = printer(value)
+            if p is not None:
+                return p
+    return None
+
+
+def current_objfile():
+    return None
+
+
+def objfiles():
+    return []
+
+
+#
+# Commands, parameters, output
+#
+class Command(object):
+    def __init__(self, name, command_class, completer_class=COMPLETE_NONE, prefix=False):
+        _commands[name] = self
+
+    def dont_repeat(self):
+        pass
+
+
+class Function(object):
+    def __init__(self, name):
+        _functions[name] = self
+
+
+class Parameter(object):
+    def __init__(self, name, command_class, parameter_class, enum_sequence=None):
+        self.parameter_class = parameter_class
+        self.value = None
+        _parameters[name] = self
+
+    def _set(self, arg):
+        if self.parameter_class in (PARAM_BOOLEAN, PARAM_AUTO_BOOLEAN):
+            self.value = arg in ('', 'on', '1', 'yes', 'enable')
+        elif self.parameter_class in (PARAM_UINTEGER, PARAM_INTEGER, PARAM_ZINTEGER, PARAM_ZUINTEGER,
+                                      PARAM_ZUINTEGER_UNLIMITED):
+            try:
+                self.value = -1 if arg == 'unlimited' else int(arg, 0)
+            except ValueError:
+                raise error('integer %s out of range' % arg)
+        else:
+            self.value = arg
+        if hasattr(self, 'get_set_string'):
+            write(self.get_set_string())
+
+    def _show(self):
+        if hasattr(self, 'get_show_string'):
+            write(self.get_show_string(str(self.value)) + '\n')
+        else:
+            write('%s\n' % self.value)
+
+
+_parameters = {'print elements': 200, 'print pretty': False, 'print object': False}
+
+
+def parameter(name):
+    if name not in _parameters:
+        raise RuntimeError("Could not find parameter `%s'." % name)
+    p = _parameters[name]
+    return p.value if isinstance(p, Parameter) else p
+
+
+def write(string, stream=None):
+    if _output:
+        _output[-1].append(string)
+    else:
+        sys.stdout.write(string)
+
+
+def flush(stream=None):
+    if not _output:
+        sys.stdout.flush()
+
+
+def _mappings():
+    starts, ends = _current_snapshot().regions()
+    lines = ['          Start Addr           End Addr       Size     Offset  Perms  objfile']
+    for start, end in zip(starts, ends):
+        lines.append('%#20x %#18x %#10x %#10x  r--p' % (start, end, end - start, 0))
+    return '\n'.join(lines) + '\n'
+
+
+def _run(command, from_tty):
+    if command == 'show endian':
+        order = 'big' if _byte_order() == '>' else 'little'
+        write('The target endianness is set automatically (currently %s endian).\n' % order)
+        return
+    if command == 'info proc mappings':
+        write(_mappings())
+        return
+    word, _, arg = command.partition(' ')
+    if word in ('print', 'p', 'output'):
+        write(('$1 = %s\n' if word != 'output' else '%s') % _format(parse_and_eval(arg), False))
+        return
+    if word in ('set', 'show'):
+        name = max((p for p in _parameters if arg == p or arg.startswith(p + ' ')), key=len, default=None)
+        if isinstance(_parameters.get(name), Parameter):
+            if word == 'set':
+                _parameters[name]._set(arg[len(name):].strip())
+            else:
+                _parameters[name]._show()
+            return
+    names = [c for c in _commands if command == c or command.startswith(c + ' ')]
+    name = max(names, key=len) if names else None
+    if name is not None and hasattr(_commands[name], 'invoke'):
+        _commands[name].invoke(command[len(name):].strip(), from_tty)
+        return
+    raise error('Undefined command: "%s".  Try "help".' % word)
+
+
+def execute(command, from_tty=False, to_string=False):
+    command = ' '.join(command.split())
+    if not to_string:
+        _run(command, from_tty)
+        return None
+    _output.append([])
+    try:
+        _run(command, from_tty)
+    finally:
+        output = ''.join(_output.pop())
+    return output
+
+
+def post_event(event):
+    event()
+
+
+#
+# Inferior
+#
+class Inferior(object):
+    num = 1
+    pid = 0
+
+    def read_memory(self, address, length):
+        return _membuf(_read(int(address), int(length)))
+
+    def write_memory(self, address, buffer, length=None):
+        raise error('Cannot write memory in a snapshot.')
+
+    def threads(self):
+        return ()
+
+
+class Frame(object):
+    def pc(self):
+        return 0
+
+    def name(self):
+        return None
+
+    def is_valid(self):
+        return True
+
+
+_inferior = Inferior()
+
+
+def selected_inferior():
+    return _inferior
+
+
+def inferiors():
+    return (_inferior,)
+
+
+def selected_frame():
+    return Frame()
+
+
+#
+# Events
+#
+class EventRegistry(object):
+    def __init__(self):
+        self.handlers = []
+
+    def connect(self, handler):
+        self.handlers.append(handler)
+
+    def disconnect(self, handler):
+        if handler in self.handlers:
+            self.handlers.remove(handler)
+
+
+class _Events(object):
+    def __init__(self):
+        for name in ('stop', 'cont', 'exited', 'new_objfile', 'clear_objfiles', 'memory_changed',
+                     'inferior_call', 'before_prompt', 'new_inferior', 'new_thread'):
+            setattr(self, name, EventRegistry())
+
+
+events = _Events()
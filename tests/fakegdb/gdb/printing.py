@@ -0,0 +1,17 @@
+"""
+The parts of gdb.printing used by the printers.
+"""
+
+import gdb
+
+
+def register_pretty_printer(obj, printer, replace=False):
+    if obj is None:
+        obj = gdb
+    for i, p in enumerate(obj.pretty_printers):
+        if getattr(p, 'name', None) is not None and p.name == getattr(printer, 'name', None):
+            if not replace:
+                raise RuntimeError('pretty-printer already registered: %s' % printer.name)
+            del obj.pretty_printers[i]
+            break
+    obj.pretty_printers.insert(0, printer)
@@ -0,0 +1,40 @@
+"""
+The parts of gdb.types used by the printers.
+"""
+
+import gdb
+
+
+def get_basic_type(type_):
+    while (type_.code == gdb.TYPE_CODE_REF or type_.code == gdb.TYPE_CODE_RVALUE_REF or
+           type_.code == gdb.TYPE_CODE_TYPEDEF):
+        if type_.code == gdb.TYPE_CODE_TYPEDEF:
+            type_ = type_.strip_typedefs()
+        else:
+            type_ = type_.target()
+    return type_.unqualified()
+
+
+def has_field(type_, field):
+    type_ = get_basic_type(type_)
+    if type_.code != gdb.TYPE_CODE_STRUCT and type_.code != gdb.TYPE_CODE_UNION:
+        raise TypeError('not a struct or union')
+    for f in type_.fields():
+        if f.is_base_class:
+            if has_field(f.type, field):
+                return True
+        elif f.name == field:
+            return True
+    return False
+
+
+def make_enum_dict(enum_type):
+    if enum_type.code != gdb.TYPE_CODE_ENUM:
+        raise TypeError('not an enum type')
+    return dict((field.name, field.enumval) for field in enum_type.fields())
+
+
+def register_type_printer(locus, printer):
+    if locus is None:
+        locus = gdb
+    locus.type_printers.insert(0, printer)
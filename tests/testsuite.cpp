@@ -45,6 +45,10 @@
 #include <boost/multi_index/sequenced_index.hpp>
 #include <boost/multi_index/ordered_index.hpp>
 #include <boost/multi_index/hashed_index.hpp>
+#include <boost/multi_index/random_access_index.hpp>
+#if BOOST_VERSION >= 105900
+#include <boost/multi_index/ranked_index.hpp>
+#endif
 #include <boost/multi_index/identity.hpp>
 #include <boost/multi_index/member.hpp>
 
@@ -158,6 +162,7 @@ void test_array()
 {
 	boost::array<int, 0> empty;
 	boost::array<int, 3> three_elements = { 10, 20, 30 };
+	boost::array<boost::array<int, 2>, 2> nested = {{ {{ 1, 2 }}, {{ 3, 4 }} }};
 break_here:
 	dummy_function();
 }
@@ -198,6 +203,11 @@ void test_variant()
     Variant variant_t(VariantT<int>{53});
     Variant variant_ts(VariantTs<int, int, int>{35});
     Variant variant_char(VariantChar{"hello variant!"});
+    boost::variant<int, boost::recursive_wrapper<VariantA>> variant_wrapped(VariantA{7});
+    Variant variant_backup(VariantA{0});
+    VariantB backup_b{66};
+    boost::variant<int, boost::recursive_wrapper<VariantA>> variant_wrapped_backup(0);
+    boost::recursive_wrapper<VariantA> backup_wrapper(VariantA{77});
     
     double const ** const var_type_1{};
     const double * * const var_type_2{};
@@ -267,6 +277,11 @@ void test_flat_map()
 	fmap[1] = 10;
 	fmap[2] = 20;
 	auto itr = fmap.find(2);
+
+	boost::container::flat_map<std::string, int> string_map;
+	string_map["apple"] = 1;
+	string_map["banana"] = 2;
+	string_map["cherry"] = 3;
 #endif
 break_here:
 	dummy_function();
@@ -749,6 +764,8 @@ void test_unordered_map()
 	    big_map.emplace(i, i);
 	}
 
+	boost::unordered_map<std::string, int> string_map = {{"one", 1}, {"two", 2}, {"three", 3}};
+
 	boost::unordered_map<int, char const*>::iterator uninitialized_iter;
 	auto iter = map.begin();
 break_here:
@@ -773,6 +790,7 @@ void test_unordered_set()
 {
 	boost::unordered_set<char const*> empty_set;
 	boost::unordered_set<char const*> set = {"Thales", "Pythagoras", "Democritus"};
+	boost::unordered_set<int> int_set = {1, 2, 3, 40};
 
 	boost::unordered_set<char const*>::iterator uninitialized_iter;
 	auto iter = set.begin();
@@ -849,6 +867,8 @@ namespace mi = boost::multi_index;
 struct mi_tag_sequenced {};
 struct mi_tag_ordered {};
 struct mi_tag_hashed {};
+struct mi_tag_random_access {};
+struct mi_tag_ranked {};
 
 using sequenced_first =  mi::multi_index_container<
 	int,
@@ -918,6 +938,24 @@ using hashed_first_non_unique = mi::multi_index_container<
 	>
 >;
 
+#if BOOST_VERSION >= 105900
+using random_access_first = mi::multi_index_container<
+	int,
+	mi::indexed_by<
+		mi::random_access<
+			mi::tag<mi_tag_random_access>
+		>,
+		mi::ranked_unique<
+			mi::tag<mi_tag_ranked>,
+			mi::identity<int>
+		>,
+		mi::hashed_unique<
+			mi::tag<mi_tag_hashed>,
+			mi::identity<int>
+		>
+	>
+>;
+#endif
 
 void test_multi_index()
 {
@@ -929,6 +967,12 @@ void test_multi_index()
 	sf_two.push_back(1);
 	sf_two.push_back(2);
 
+	sequenced_first sf_long;
+	for (int i = 0; i < 3000; ++i)
+	{
+	    sf_long.push_back(i);
+	}
+
 	ordered_first of_two;
 	of_two.insert(1);
 	of_two.insert(2);
@@ -949,8 +993,22 @@ void test_multi_index()
 	hf_over_two_same_value.insert(3);
 	hf_over_two_same_value.insert(4);
 
+#if BOOST_VERSION >= 105900
+	random_access_first raf_empty;
+
+	random_access_first raf_three;
+	raf_three.push_back(3);
+	raf_three.push_back(1);
+	raf_three.push_back(2);
+#endif
+
  break_here:
 	dummy_function();
+
+	// same header, different node order
+	sf_long.relocate(sf_long.begin(), --sf_long.end());
+ relocated:
+	dummy_function();
 }
 
 int main()
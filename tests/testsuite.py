@@ -7,6 +7,9 @@ import re
 import inspect
 import unittest
 import datetime
+import tempfile
+import struct
+import subprocess
 import gdb
 import boost
 import boost.detect_version
@@ -35,6 +38,32 @@ def execute_cpp_function(function_name):
     bp.delete()
 
 
+def find_python():
+    """Path of a python interpreter with the major version of gdb's python, or None"""
+    if os.path.basename(sys.executable or '').startswith('python'):
+        return sys.executable
+    names = ['python{}.{}'.format(*sys.version_info[:2]), 'python{}'.format(sys.version_info.major)]
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                return path
+    return None
+
+
+# Prints the captured expressions of a snapshot file with the gdb emulation of tests/fakegdb
+replay_script = """
+import sys
+sys.path[0:0] = [sys.argv[1] + '/tests/fakegdb', sys.argv[1]]
+import gdb, boost, boost.utils
+snapshot = boost.utils.Snapshot.load(sys.argv[2])
+gdb.use_snapshot(snapshot)
+boost.register_printers(boost_version=tuple(int(x) for x in sys.argv[3].split('.')))
+for expression, output in snapshot.prints:
+    print(gdb.parse_and_eval(expression))
+"""
+
+
 def to_python_value(value):
     """Convert a gdb.Value to its python equivalent"""
     if not isinstance(value, gdb.Value):
@@ -166,6 +195,14 @@ class OptionalTest(PrettyPrinterTest):
         self.assertEqual(as_struct(children), {'value': 10})
         self.assertIsNone(display_hint, None)
 
+    def test_access_plan(self):
+        self.get_printer_result('ten')
+        type_name = str(gdb.parse_and_eval('ten').type.strip_typedefs())
+        plan = boost.printers.BoostOptional.plans[type_name]
+        self.assertIsNotNone(plan)
+        self.assertEqual(plan.read(gdb.parse_and_eval('ten')), {'initialized': 1})
+        self.assertEqual(int(plan.field(gdb.parse_and_eval('ten'), 'value')), 10)
+
 
 class ReferenceWrapperTest(PrettyPrinterTest):
     @classmethod
@@ -328,12 +365,24 @@ class CircularBufferTest(PrettyPrinterTest):
         self.assertEqual(as_array(children), [3, 4])
         self.assertEqual(display_hint, 'array')
 
+    def test_at(self):
+        self.assertEqual(gdb.parse_and_eval('$at(overwrite, 0)').string(), '2')
+        self.assertEqual(gdb.parse_and_eval('$at(overwrite, 2)').string(), '4')
+
 
-class ArrayTest(PrettyPrinterTest):
+class ArrayFixture:
+    """Stop at the end of test_array, unless a previous test class is still stopped there"""
     @classmethod
     def setUpClass(cls):
-        execute_cpp_function('test_array')
+        try:
+            stopped = gdb.selected_frame().name() == 'test_array'
+        except gdb.error:
+            stopped = False
+        if not stopped:
+            execute_cpp_function('test_array')
 
+
+class ArrayTest(ArrayFixture, PrettyPrinterTest):
     def test_empty(self):
         string, children, display_hint = self.get_printer_result('empty')
         self.assertEqual(string, None)
@@ -346,6 +395,184 @@ class ArrayTest(PrettyPrinterTest):
         self.assertEqual(as_array(children), [10, 20, 30])
         self.assertEqual(display_hint, 'array')
 
+    def test_nested(self):
+        string, children, display_hint = self.get_printer_result('nested')
+        self.assertEqual(display_hint, 'array')
+        inner = [as_array(gdb.default_visualizer(value).children()) for _, value in children]
+        self.assertEqual(inner, [[1, 2], [3, 4]])
+
+    def test_at(self):
+        self.assertEqual(gdb.parse_and_eval('$at(three_elements, 1)').string(), '20')
+        self.assertRaises(gdb.error, gdb.parse_and_eval, '$at(three_elements, 3)')
+
+    def test_iter_items(self):
+        addr = int(gdb.parse_and_eval('&three_elements'))
+        self.assertEqual(list(boost.iter_addresses(gdb.parse_and_eval('three_elements'))),
+                         [addr, addr + 4, addr + 8])
+        self.assertEqual(list(boost.iter_items(gdb.parse_and_eval('three_elements'))), [10, 20, 30])
+        self.assertEqual(list(boost.iter_items(gdb.parse_and_eval('three_elements'), decode='I')), [10, 20, 30])
+        self.assertEqual(list(boost.iter_items(gdb.parse_and_eval('three_elements'), decode=len)), [4, 4, 4])
+        self.assertEqual(list(boost.iter_items(gdb.parse_and_eval('empty'))), [])
+
+
+class ReadAheadTest(ArrayFixture, PrettyPrinterTest):
+    def test_read_ahead(self):
+        addr = int(gdb.parse_and_eval('&three_elements'))
+        expected = bytes(gdb.selected_inferior().read_memory(addr, 12))
+        read_ahead_bytes = boost.options['read_ahead_bytes']
+        try:
+            for block in (read_ahead_bytes, 8, 0):
+                boost.options['read_ahead_bytes'] = block
+                boost.utils.clear_inferior_caches()
+                self.assertEqual(boost.utils.read_memory(addr, 12), expected)
+                string, children, display_hint = self.get_printer_result('three_elements')
+                self.assertEqual(as_array(children), [10, 20, 30])
+        finally:
+            boost.options['read_ahead_bytes'] = read_ahead_bytes
+
+
+class ExportTest(ArrayFixture, PrettyPrinterTest):
+    def test_export(self):
+        fd, path = tempfile.mkstemp(suffix='.npy')
+        os.close(fd)
+        try:
+            gdb.execute('boost-export three_elements ' + path, False, True)
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.assertTrue(data.startswith(b'\x93NUMPY\x01\x00'))
+            header_len = struct.unpack('<H', data[8:10])[0]
+            self.assertEqual((10 + header_len) % 64, 0)
+            self.assertIn("'descr': '<i4'", data[10:10 + header_len].decode('latin-1'))
+            self.assertIn("'shape': (3,)", data[10:10 + header_len].decode('latin-1'))
+            self.assertEqual(data[10 + header_len:], struct.pack('<3i', 10, 20, 30))
+
+            gdb.execute('boost-export -raw three_elements ' + path, False, True)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), struct.pack('<3i', 10, 20, 30))
+        finally:
+            os.remove(path)
+
+
+class SnapshotTest(ArrayFixture, PrettyPrinterTest):
+    def test_snapshot(self):
+        addr = int(gdb.parse_and_eval('&three_elements'))
+        fd, path = tempfile.mkstemp(suffix='.snapshot')
+        os.close(fd)
+        try:
+            gdb.execute('boost-snapshot capture ' + path + ' three_elements', False, True)
+            snapshot = boost.utils.Snapshot.load(path)
+            self.assertEqual(snapshot.read(addr, 12), struct.pack('<3i', 10, 20, 30))
+            self.assertIn('boost::array<int, 3>', snapshot.types)
+            self.assertEqual([expression for expression, output in snapshot.prints], ['three_elements'])
+            self.assertIn('three_elements', gdb.execute('boost-snapshot show ' + path, False, True))
+
+            gdb.execute('boost-snapshot replay ' + path)
+            try:
+                self.assertEqual(boost.utils.read_memory(addr, 12), struct.pack('<3i', 10, 20, 30))
+                self.assertFalse(boost.utils.is_readable(addr + 4096))
+            finally:
+                gdb.execute('boost-snapshot replay')
+            self.assertTrue(boost.utils.is_readable(addr + 12))
+        finally:
+            os.remove(path)
+
+    @unittest.skipIf(find_python() is None, 'no python interpreter to replay snapshots')
+    def test_snapshot_replay_without_gdb(self):
+        printers_dir = os.path.dirname(os.path.dirname(os.path.abspath(boost.__file__)))
+        for expression in ['three_elements', 'nested']:
+            fd, path = tempfile.mkstemp(suffix='.snapshot')
+            os.close(fd)
+            try:
+                gdb.execute('boost-snapshot capture ' + path + ' ' + expression, False, True)
+                [(_, output)] = boost.utils.Snapshot.load(path).prints
+                replayed = subprocess.check_output(
+                    [find_python(), '-c', replay_script, printers_dir, path, '{}.{}.{}'.format(*boost_version)],
+                    universal_newlines=True)
+            finally:
+                os.remove(path)
+            self.assertEqual(replayed, re.sub(r'^\$\d+ = ', '', output))
+
+    def test_snapshot_records_export(self):
+        addr = int(gdb.parse_and_eval('&three_elements'))
+        fd, path = tempfile.mkstemp(suffix='.snapshot')
+        os.close(fd)
+        try:
+            gdb.execute('boost-snapshot record')
+            gdb.execute('boost-export -raw three_elements ' + path, False, True)
+            gdb.execute('boost-snapshot save ' + path)
+            self.assertEqual(boost.utils.Snapshot.load(path).read(addr, 12), struct.pack('<3i', 10, 20, 30))
+        finally:
+            os.remove(path)
+
+
+class PrintBudgetTest(ArrayFixture, PrettyPrinterTest):
+    def test_print_budget_elements(self):
+        gdb.execute('set boost print-budget-elements 2')
+        try:
+            string, children, display_hint = self.get_printer_result('three_elements')
+            self.assertEqual(list(boost.iter_items(gdb.parse_and_eval('three_elements'))), [10, 20, 30])
+        finally:
+            gdb.execute('set boost print-budget-elements 0')
+        self.assertEqual(as_array(children)[:2], [10, 20])
+        self.assertEqual(children[2], ('[truncated]', '<truncated: 2 elements printed, print-budget-elements is 2; '
+                                                      'boost-more continues>'))
+
+    def test_more(self):
+        gdb.execute('set boost print-budget-elements 1')
+        try:
+            string, children, display_hint = self.get_printer_result('three_elements')
+            self.assertEqual(len(children), 2)
+            self.assertEqual(gdb.execute('boost-more three_elements', False, True), '{[1] = 20, ...}\n')
+            self.assertEqual(gdb.execute('boost-more three_elements', False, True), '{[2] = 30}\n')
+            self.assertRaises(gdb.error, gdb.execute, 'boost-more three_elements', False, True)
+        finally:
+            gdb.execute('set boost print-budget-elements 0')
+
+
+class SliceTest(ArrayFixture, PrettyPrinterTest):
+    def test_slice(self):
+        self.assertEqual(gdb.parse_and_eval('$slice(three_elements, 1, 3)').string(), '{[1] = 20, [2] = 30}')
+        self.assertEqual(gdb.parse_and_eval('$slice(three_elements, 2, 10)').string(), '{[2] = 30}')
+        self.assertEqual(gdb.parse_and_eval('$slice(empty, 0, 2)').string(), '{}')
+
+
+class PagingTest(ArrayFixture, PrettyPrinterTest):
+    def test_child(self):
+        printer = gdb.default_visualizer(gdb.parse_and_eval('three_elements'))
+        self.assertEqual(printer.num_children(), 3)
+        name, value = printer.child(2)
+        self.assertEqual((name, int(value)), ('[2]', 30))
+        self.assertRaises(IndexError, printer.child, 3)
+
+
+class PrefetchTest(ArrayFixture, PrettyPrinterTest):
+    def test_prefetch_remembers_printed_values(self):
+        boost.options['prefetch'] = True
+        try:
+            self.get_printer_result('three_elements')
+        finally:
+            boost.options['prefetch'] = False
+        printed = boost.utils._printed_at[gdb.selected_frame().pc()]
+        value = gdb.parse_and_eval('three_elements')
+        self.assertIn((int(value.address), str(value.type)), printed)
+
+    def test_prefetch_fills_read_cache(self):
+        addr = int(gdb.parse_and_eval('&three_elements'))
+        boost.options['prefetch'] = True
+        try:
+            self.get_printer_result('three_elements')
+            boost.utils.clear_inferior_caches()
+            boost.utils.start_prefetch()
+            prefetch = boost.utils._prefetch[0]
+            # run the posted slices here, rather than from gdb's event loop
+            while prefetch.targets or prefetch.children is not None:
+                prefetch.step()
+        finally:
+            boost.options['prefetch'] = False
+            boost.utils.cancel_prefetch()
+        self.assertTrue(any(lo <= addr and addr + 12 <= lo + len(data)
+                            for lo, data in boost.utils._read_cache.values()))
+
 
 @unittest.skipIf(boost_version < (1, 58), 'implemented in boost 1.58 and later')
 class SmallVectorTest(PrettyPrinterTest):
@@ -479,6 +706,41 @@ class VariantTest(PrettyPrinterTest):
         self.assertEqual(as_struct(children), {'VariantChar': {'t_': 'hello variant!'}})
         self.assertIsNone(display_hint)
 
+    def test_alternatives_cache(self):
+        self.get_printer_result('variant_b')
+        type_name = boost.utils.GDB_Value_Wrapper(gdb.parse_and_eval('variant_b')).type_name
+        names = boost.utils.parse_type_name(type_name).arg_names
+        self.assertEqual(names, ['VariantA', 'VariantB', 'VariantT<int>', 'VariantTs<int, int, int>', 'VariantChar'])
+        held_type, stored_type_name, wrapped = boost.variant.BoostVariant.alternatives[(type_name, 1)]
+        self.assertEqual((str(held_type), stored_type_name, wrapped), ('VariantB', 'VariantB', False))
+
+    def test_variant_recursive_wrapper(self):
+        string, children, display_hint = self.get_printer_result('variant_wrapped')
+        self.assertEqual(string, '(boost::variant<...>) type = VariantA')
+        self.assertEqual(as_struct(children), {'VariantA': {'a_': 7}})
+
+    def test_variant_heap_backup(self):
+        # which_ and storage as set by boost::variant while assigning with a heap backup
+        gdb.execute('set var variant_backup.which_ = -2')
+        gdb.execute('set var *(VariantB**)&variant_backup.storage_ = &backup_b')
+        try:
+            string, children, display_hint = self.get_printer_result('variant_backup')
+        finally:
+            gdb.execute('set var variant_backup.which_ = 0')
+        self.assertEqual(string, '(boost::variant<...>) type = VariantB (heap backup)')
+        self.assertEqual(as_struct(children), {'VariantB': {'b_': 66}})
+
+    def test_variant_recursive_wrapper_heap_backup(self):
+        # backup_holder<recursive_wrapper<VariantA>>: pointer to a heap recursive_wrapper
+        gdb.execute('set var variant_wrapped_backup.which_ = -2')
+        gdb.execute('set var *(boost::recursive_wrapper<VariantA>**)&variant_wrapped_backup.storage_ = &backup_wrapper')
+        try:
+            string, children, display_hint = self.get_printer_result('variant_wrapped_backup')
+        finally:
+            gdb.execute('set var variant_wrapped_backup.which_ = 0')
+        self.assertEqual(string, '(boost::variant<...>) type = VariantA (heap backup)')
+        self.assertEqual(as_struct(children), {'VariantA': {'a_': 77}})
+
     def test_type1(self):
         self.check_type('var_type_1')
 
@@ -489,6 +751,55 @@ class VariantTest(PrettyPrinterTest):
         self.check_type('var_type_3')
 
 
+class TypeNameParserTest(unittest.TestCase):
+    def test_template_arguments(self):
+        t = boost.utils.parse_type_name('std::map<int, void (*)(int, char), std::less<int> >')
+        self.assertEqual(t.name, 'std::map')
+        self.assertEqual(t.arg_names, ['int', 'void (*)(int, char)', 'std::less<int>'])
+        self.assertEqual(t.args[2].name, 'std::less')
+        self.assertEqual(t.args[2].arg_names, ['int'])
+
+    def test_qualifiers(self):
+        t = boost.utils.parse_type_name('const VariantT<int> * const &')
+        self.assertEqual(t.base, 'VariantT<int>')
+        self.assertEqual(t.qualifiers, ('const', '*', 'const', '&'))
+        self.assertEqual(boost.utils.parse_type_name('myconst').base, 'myconst')
+
+    def test_not_a_template(self):
+        t = boost.utils.parse_type_name('(anonymous namespace)::Foo')
+        self.assertEqual((t.name, t.arg_names), ('(anonymous namespace)::Foo', []))
+
+    def test_memoized(self):
+        name = 'VariantTs<int, int, int>'
+        self.assertIs(boost.utils.parse_type_name(name), boost.utils.parse_type_name(name))
+
+    def test_abbreviate(self):
+        abbreviate = boost.utils.abbreviate_type_name
+        self.assertEqual(abbreviate('boost::circular_buffer<int, std::allocator<int> >'),
+                         'boost::circular_buffer<int, std::allocator<int> >')
+        boost.options['abbreviate_type_names'] = True
+        try:
+            self.check_abbreviate(abbreviate)
+        finally:
+            boost.options['abbreviate_type_names'] = False
+
+    def check_abbreviate(self, abbreviate):
+        self.assertEqual(abbreviate('boost::circular_buffer<int, std::allocator<int> >'), 'boost::circular_buffer<int>')
+        self.assertEqual(abbreviate('const std::vector<int, std::allocator<int> >::iterator &'), 'const std::vector<int>::iterator &')
+        self.assertEqual(
+            abbreviate('std::map<std::__cxx11::basic_string<char, std::char_traits<char>, std::allocator<char> >, int, '
+                       'std::less<std::__cxx11::basic_string<char, std::char_traits<char>, std::allocator<char> > >, '
+                       'std::allocator<std::pair<const std::__cxx11::basic_string<char, std::char_traits<char>, std::allocator<char> >, int> > >'),
+            'std::map<std::string, int>')
+        self.assertEqual(abbreviate('VariantTs<int, int, int>'), 'VariantTs<int, int, int>')
+        self.assertEqual(abbreviate('std::enable_if<true, void>'), 'std::enable_if<true, void>')
+        self.assertEqual(abbreviate('std::set<int, std::less<void>, std::allocator<int> >'), 'std::set<int, std::less<void> >')
+        self.assertEqual(abbreviate('boost::circular_buffer<int, std::allocator<long> >'),
+                         'boost::circular_buffer<int, std::allocator<long> >')
+        self.assertEqual(abbreviate('A<int, std::allocator<int> >::B<std::vector<int, std::allocator<int> >, mpl_::na>'),
+                         'A<int, std::allocator<int> >::B<std::vector<int> >')
+
+
 @unittest.skipIf(boost_version < (1, 42, 0), 'implemented in boost 1.42 and later')
 class UuidTest(PrettyPrinterTest):
     @classmethod
@@ -578,6 +889,11 @@ class FlatSetTest(PrettyPrinterTest):
         self.assertEqual(as_array(children), [1, 2])
         self.assertEqual(display_hint, 'array')
 
+    def test_find(self):
+        self.assertEqual(gdb.parse_and_eval('$find(fset, 2)').string(), '2')
+        self.assertRaises(gdb.error, gdb.parse_and_eval, '$find(fset, 0)')
+        self.assertRaises(gdb.error, gdb.parse_and_eval, '$find(empty_set, 1)')
+
     def test_empty_iter(self):
         string, children, display_hint = self.get_printer_result('uninitialized_iter')
         self.assertEqual(string, None)
@@ -615,6 +931,28 @@ class FlatMapTest(PrettyPrinterTest):
         self.assertEqual(as_map(children), [(1, 10), (2, 20)])
         self.assertEqual(display_hint, 'map')
 
+    def test_at(self):
+        self.assertEqual(gdb.parse_and_eval('$at(fmap, 1)').string(), '[2] = 20')
+
+    def test_find(self):
+        self.assertEqual(gdb.parse_and_eval('$find(fmap, 1)').string(), '10')
+        self.assertEqual(gdb.parse_and_eval('$find(fmap, 2)').string(), '20')
+        self.assertRaises(gdb.error, gdb.parse_and_eval, '$find(fmap, 3)')
+
+    def test_more(self):
+        gdb.execute('set boost print-budget-elements 1')
+        try:
+            string, children, display_hint = self.get_printer_result('fmap')
+            self.assertEqual(as_map(children)[0], (1, 10))
+            self.assertEqual(gdb.execute('boost-more fmap', False, True), '{[2] = 20}\n')
+        finally:
+            gdb.execute('set boost print-budget-elements 0')
+
+    def test_find_string_key(self):
+        self.assertEqual(gdb.parse_and_eval('$find(string_map, "apple")').string(), '1')
+        self.assertEqual(gdb.parse_and_eval('$find(string_map, "cherry")').string(), '3')
+        self.assertRaises(gdb.error, gdb.parse_and_eval, '$find(string_map, "banan")')
+
     def test_empty_iter(self):
         string, children, display_hint = self.get_printer_result('uninitialized_iter')
         self.assertEqual(string, None)
@@ -710,6 +1048,18 @@ class IntrusiveMemberSetCommon:
         self.assertEqual(children_as_struct['value']['int_'], 2)
         self.assertEqual(display_hint, None)
 
+    def test_member_set_tree_stats(self):
+        lines = gdb.execute('boost-tree-stats member_set_1', False, True).splitlines()
+        self.assertEqual(lines[0], 'nodes: 3')
+        histogram = [int(line.split(':')[1]) for line in lines[lines.index('nodes per depth:') + 1:]]
+        self.assertEqual(histogram[0], 1)
+        self.assertEqual(sum(histogram), 3)
+        self.assertEqual(lines[1], 'height: {} (minimal: 2)'.format(len(histogram)))
+
+    def test_empty_member_set_tree_stats(self):
+        lines = gdb.execute('boost-tree-stats empty_member_set', False, True).splitlines()
+        self.assertEqual(lines, ['nodes: 0', 'height: 0 (minimal: 0)', 'nodes per depth:'])
+
 
 @unittest.skipUnless((1, 55, 0) <= boost_version < (1, 70, 0), 'Tests for intrusive containers are not supported for boost < 1.55 or boost >= 1.70')
 class IntrusiveMemberRbtreeSetTest(PrettyPrinterTest, IntrusiveMemberSetCommon):
@@ -763,6 +1113,31 @@ class IntrusiveBaseListTest(PrettyPrinterTest):
         self.assertEqual(as_array(children, lambda val: int(val['int_'])), [1, 3])
         self.assertEqual(display_hint, 'array')
 
+    def test_regions_loaded_once(self):
+        load_readable_regions = boost.utils._load_readable_regions
+        loads = []
+        boost.utils._load_readable_regions = lambda: loads.append(None) or load_readable_regions()
+        try:
+            boost.utils.clear_inferior_caches()
+            string, children, display_hint = self.get_printer_result('base_list_1')
+        finally:
+            boost.utils._load_readable_regions = load_readable_regions
+        self.assertEqual(as_array(children, lambda val: int(val['int_'])), [1, 2, 3])
+        self.assertEqual(len(loads), 1)
+
+    def test_truncated_addresses(self):
+        max_nodes = boost.options['max_traversal_nodes']
+        boost.options['max_traversal_nodes'] = 2
+        addresses = []
+        try:
+            with self.assertRaises(gdb.error) as cm:
+                for address in boost.iter_addresses(gdb.parse_and_eval('base_list_1')):
+                    addresses.append(address)
+        finally:
+            boost.options['max_traversal_nodes'] = max_nodes
+        self.assertEqual(len(addresses), 2)
+        self.assertIn('<truncated: more than 2 nodes>', str(cm.exception))
+
     def test_base_list_iter_1(self):
         string, children, display_hint = self.get_printer_result('iter_1')
         self.assertEqual(string, None)
@@ -946,6 +1321,97 @@ class UnorderedMapTest(PrettyPrinterTest):
         self.assertEqual(expected_children, actual_children)
         self.assertEqual('map', display_hint)
 
+    def test_find(self):
+        self.assertEqual(gdb.parse_and_eval('$find(big_map, 12345)').string(), '12345')
+        self.assertRaises(gdb.error, gdb.parse_and_eval, '$find(big_map, 100000)')
+
+    def test_slice(self):
+        elements = ['[{}] = {}'.format(k, v) for k, v in as_map(self.get_printer_result('big_map')[1])]
+        # the second call starts from a node recorded by the first walk
+        for begin in (50000, 50001):
+            self.assertEqual(gdb.parse_and_eval('$slice(big_map, {}, {})'.format(begin, begin + 3)).string(),
+                             '{' + ', '.join(elements[begin:begin + 3]) + '}')
+        self.assertEqual(gdb.parse_and_eval('$at(big_map, 99999)').string(), elements[99999])
+
+    def test_child(self):
+        children = self.get_printer_result('big_map')[1]
+        printer = gdb.default_visualizer(gdb.parse_and_eval('big_map'))
+        self.assertEqual(printer.num_children(), 200000)
+        # a page in the middle, then an earlier one
+        for n in list(range(120000, 120004)) + [7]:
+            name, value = printer.child(n)
+            self.assertEqual((name, int(value)), (children[n][0], int(children[n][1])))
+
+    def test_bucket_stats(self):
+        output = gdb.execute('boost-unordered-stats big_map', False, True)
+        lines = output.splitlines()
+        self.assertTrue(lines[0].endswith('size=100000 buckets={}'.format(int(gdb.parse_and_eval('big_map.bucket_count()')))))
+        histogram = [tuple(int(x) for x in line.split(':')) for line in lines[lines.index('chain length histogram:') + 1:]]
+        self.assertEqual(sum(length * count for length, count in histogram), 100000)
+
+    def test_node_budget(self):
+        max_nodes = boost.options['max_traversal_nodes']
+        boost.options['max_traversal_nodes'] = 2
+        try:
+            string, children, display_hint = self.get_printer_result('map')
+        finally:
+            boost.options['max_traversal_nodes'] = max_nodes
+        items = as_map(children)
+        self.assertEqual(len(items), 3)
+        self.assertEqual(items[2], ('<truncated: more than 2 nodes>', '...'))
+
+    def test_print_budget_ms(self):
+        gdb.execute('set boost print-budget-ms 1')
+        try:
+            string, children, display_hint = self.get_printer_result('big_map')
+        finally:
+            gdb.execute('set boost print-budget-ms 0')
+        items = as_map(children)
+        self.assertLess(len(items), 100001)
+        self.assertTrue(items[-1][0].startswith('<truncated: '))
+        self.assertIn('elements printed, print-budget-ms is 1;', items[-1][0])
+        self.assertEqual(items[-1][1], '...')
+
+    def test_children_cache(self):
+        gdb.execute('set boost children-cache 4')
+        try:
+            string, children, display_hint = self.get_printer_result('big_map')
+            key = (int(gdb.parse_and_eval('&big_map')), 'boost::unordered::unordered_map<int, int>')
+            self.assertIn(key, boost.utils._children_cache)
+            self.assertEqual(as_map(self.get_printer_result('big_map')[1]), as_map(children))
+        finally:
+            gdb.execute('set boost children-cache 0')
+            boost.utils.clear_children_cache()
+
+    def test_traversal_guard(self):
+        a = int(gdb.parse_and_eval('&map'))
+        b = int(gdb.parse_and_eval('&big_map'))
+        guard = boost.utils.Traversal_Guard()
+        self.assertTrue(guard.check(a))
+        self.assertTrue(guard.check(b))
+        self.assertFalse(guard.check(a))
+        self.assertEqual(guard.reason, 'cycle at node 0x{:x}'.format(a))
+        guard = boost.utils.Traversal_Guard()
+        self.assertFalse(guard.check(0))
+        self.assertEqual(guard.reason, 'unreadable node 0x0')
+
+    def test_readable_regions(self):
+        self.assertIsNotNone(boost.utils.readable_regions())
+        self.assertTrue(boost.utils.is_readable(int(gdb.parse_and_eval('&map')), 8))
+        self.assertFalse(boost.utils.is_readable(0x10))
+
+    def test_abbreviated_type_name(self):
+        boost.options['abbreviate_type_names'] = True
+        try:
+            string, children, display_hint = self.get_printer_result('string_map')
+        finally:
+            boost.options['abbreviate_type_names'] = False
+        self.assertEqual(string, 'boost::unordered::unordered_map<std::string, int> size = 3')
+
+    def test_find_string_key(self):
+        self.assertEqual(gdb.parse_and_eval('$find(string_map, "two")').string(), '2')
+        self.assertRaises(gdb.error, gdb.parse_and_eval, '$find(string_map, "four")')
+
     def test_uninitialized_iter(self):
         string, children, display_hint = self.get_printer_result('uninitialized_iter')
         self.assertEqual(string, 'uninitialized')
@@ -1031,6 +1497,33 @@ class UnorderedSetTest(PrettyPrinterTest):
         self.assertIn(as_struct(children), possible_values)
         self.assertEqual(display_hint, None)
 
+    def test_find(self):
+        # the Hash argument of sets is the second one: the bucket is computed, not scanned
+        printer = gdb.default_visualizer(gdb.parse_and_eval('int_set'))
+        self.assertIsNotNone(printer.bucket_items(gdb.lookup_type('int'), 40))
+        self.assertEqual(gdb.parse_and_eval('$find(int_set, 40)').string(), '40')
+        self.assertRaises(gdb.error, gdb.parse_and_eval, '$find(int_set, 5)')
+
+    def test_find_wrong_hash(self):
+        # a key missing from its computed bucket is still found by scanning all elements
+        import boost.unordered_containers as unordered
+        boost_hash = unordered.boost_hash
+        unordered.boost_hash = lambda key_type, key, bits, boost_version: boost_hash(key_type, key + 1, bits, boost_version)
+        try:
+            self.assertEqual(gdb.parse_and_eval('$find(int_set, 40)').string(), '40')
+        finally:
+            unordered.boost_hash = boost_hash
+
+    def test_boost_hash(self):
+        from boost.unordered_containers import _hash_combine, _hash_integral
+        # 64-bit keys are folded into a 32-bit std::size_t
+        self.assertEqual(_hash_integral(5, 64, 32), 5)
+        self.assertEqual(_hash_integral((1 << 32) + 5, 64, 32), 1 ^ (5 + (1 << 6)))
+        self.assertEqual(_hash_integral(-1, 64, 32), 0xffffffff)
+        self.assertEqual(_hash_integral(-1, 64, 64), (1 << 64) - 1)
+        # hash_combine before boost 1.56
+        self.assertEqual(_hash_combine(0, 1, 64, (1, 55, 0)), 1 + 0x9e3779b9)
+
 
 @unittest.skipIf(boost_version < (1, 58), 'Printer was implemented for boost 1.58 and later versions')
 class UnorderedMultisetTest(PrettyPrinterTest):
@@ -1120,6 +1613,14 @@ class MultiIndexTest(PrettyPrinterTest):
         self.assertEqual(as_array(children, int), [])
         self.assertIsNone(display_hint)
 
+    def test_checkpoints_cleared_on_stop(self):
+        self.assertEqual(gdb.parse_and_eval('$at(sf_long, 2000)').string(), '2000')
+        bp = gdb.Breakpoint('test_multi_index:relocated', internal=True)
+        bp.silent = True
+        gdb.execute('continue')
+        bp.delete()
+        self.assertEqual(gdb.parse_and_eval('$at(sf_long, 2000)').string(), '1999')
+
     def test_ordered_first_empty(self):
         string, children, display_hint = self.get_printer_result('of_empty')
         self.assertTrue(string.startswith('empty'))
@@ -1142,16 +1643,90 @@ class MultiIndexTest(PrettyPrinterTest):
         self.assertEqual(as_array(children, int), [ 1, 2 ])
         self.assertIsNone(display_hint)
 
+    def test_ordered_first_tree_stats(self):
+        lines = gdb.execute('boost-tree-stats of_two', False, True).splitlines()
+        self.assertEqual(lines, ['nodes: 2', 'height: 2 (minimal: 2)', 'imbalance ratio: 1.000',
+                                 'nodes per depth:', '     0: 1', '     1: 1'])
+        lines = gdb.execute('boost-tree-stats -max-nodes 1 of_two', False, True).splitlines()
+        self.assertEqual(lines[0], 'nodes: 1 (truncated at -max-nodes)')
+
+    @unittest.skipIf(boost_version < (1, 56, 0), 'hashed index nodes only link to the next node before boost 1.56')
     def test_hashed_first(self):
         string, children, display_hint = self.get_printer_result('hf_two')
         self.assertEqual(sorted(as_array(children, int)), [ 1, 2 ]) # unordered
         self.assertIsNone(display_hint)
 
+    @unittest.skipIf(boost_version < (1, 56, 0), 'hashed index nodes only link to the next node before boost 1.56')
     def test_hashed_first_over2_same_value(self):
         string, children, display_hint = self.get_printer_result('hf_over_two_same_value')
         self.assertEqual(sorted(as_array(children, int)), [ 1, 1, 1, 2, 2, 2, 2, 3, 3, 4]) # unordered
         self.assertIsNone(display_hint)
 
+    def test_hashed_fields_size(self):
+        from boost.multi_index_1_42 import Boost_Multi_Index, _boost_multi_index_fields_size
+        registered = boost.utils._registered_boost_version
+        try:
+            boost.utils._registered_boost_version = (1, 55, 0)
+            self.assertEqual(_boost_multi_index_fields_size('boost::multi_index::hashed_unique'), 1)
+            self.assertFalse(Boost_Multi_Index.index_supported('boost::multi_index::hashed_unique'))
+            boost.utils._registered_boost_version = (1, 56, 0)
+            self.assertEqual(_boost_multi_index_fields_size('boost::multi_index::hashed_unique'), 2)
+            self.assertTrue(Boost_Multi_Index.index_supported('boost::multi_index::hashed_unique'))
+        finally:
+            boost.utils._registered_boost_version = registered
+        self.assertEqual(_boost_multi_index_fields_size('boost::multi_index::sequenced'), 2)
+
+    @unittest.skipIf(boost_version < (1, 59, 0), 'ranked indexes implemented in boost 1.59 and later')
+    def test_random_access_first_empty(self):
+        string, children, display_hint = self.get_printer_result('raf_empty')
+        self.assertTrue(string.startswith('empty'))
+        self.assertEqual(as_array(children, int), [])
+
+    @unittest.skipIf(boost_version < (1, 59, 0), 'ranked indexes implemented in boost 1.59 and later')
+    def test_random_access_first(self):
+        string, children, display_hint = self.get_printer_result('raf_three')
+        self.assertEqual(as_array(children, int), [ 3, 1, 2 ])
+        self.assertIsNone(display_hint)
+
+    @unittest.skipIf(boost_version < (1, 59, 0), 'ranked indexes implemented in boost 1.59 and later')
+    def test_ranked_and_hashed_after_random_access(self):
+        gdb.execute('boost-multi-index raf_three 1,2')
+        try:
+            string, children, display_hint = self.get_printer_result('raf_three')
+        finally:
+            gdb.execute('boost-multi-index -clear')
+        self.assertEqual(as_array(children[:3], int), [ 1, 2, 3 ])
+        self.assertEqual(sorted(as_array(children[3:], int)), [ 1, 2, 3 ]) # unordered
+
+    def test_iter_items(self):
+        self.assertEqual(list(boost.iter_items(gdb.parse_and_eval('of_two'))), [ 1, 2 ])
+        if boost_version >= (1, 56, 0):
+            self.assertEqual(sorted(boost.iter_items(gdb.parse_and_eval('hf_two'))), [ 1, 2 ])
+        self.assertEqual(list(boost.iter_items(gdb.parse_and_eval('of_empty'))), [])
+
+    @unittest.skipIf(boost_version < (1, 56, 0), 'hashed index nodes only link to the next node before boost 1.56')
+    def test_select_several_indexes(self):
+        gdb.execute('boost-multi-index of_two 0,1')
+        try:
+            string, children, display_hint = self.get_printer_result('of_two')
+        finally:
+            gdb.execute('boost-multi-index -clear')
+        self.assertTrue(string.endswith('[idx=0,1]'))
+        self.assertEqual(as_array(children[:2], int), [ 1, 2 ])
+        self.assertEqual(sorted(as_array(children[2:], int)), [ 1, 2 ]) # unordered
+        self.assertEqual([name[:7] for name, value in children], ['[idx=0]'] * 2 + ['[idx=1]'] * 2)
+
+    def test_select_index_by_type(self):
+        gdb.execute('boost-multi-index -type indexed_by<boost::multi_index::sequenced 1')
+        try:
+            string, children, display_hint = self.get_printer_result('sf_two')
+            of_string, of_children, _ = self.get_printer_result('of_two')
+        finally:
+            gdb.execute('boost-multi-index -clear')
+        self.assertTrue(string.endswith('[idx=1]'))
+        self.assertEqual(as_array(children, int), [ 1, 2 ]) # ordered
+        self.assertTrue(of_string.endswith('[idx=0]'))
+
 
 # TODO: More intrusive tests:
 # 1. Non-raw pointers